@@ -0,0 +1,346 @@
+import argparse
+from collections import Counter
+from datetime import datetime
+from dotenv import find_dotenv, load_dotenv
+import json
+import logging
+import os
+import sys
+import time
+import utilities.crew_builder as crew_builder
+import utilities.crew_file as crew_file_format
+from utilities.crew_scheduler import CrewScheduler, get_provider_limits
+from utilities.llm_registry import llm_registry
+from utilities.metrics import start_metrics_exporter
+
+logger = logging.getLogger('batch_runner')
+
+def load_environment():
+
+    _ = load_dotenv(find_dotenv())
+
+    for environment_variable, dotenv_variable in (('NVIDIA_API_KEY', 'NVIDIA_API_Key'), ('OPENAI_API_KEY', 'OpenAI_API_Key')):
+
+        if os.getenv(dotenv_variable):
+
+            os.environ[environment_variable] = os.getenv(dotenv_variable)
+
+def get_crew_file_paths(crews, saved_crews_directory):
+
+    """
+    This function resolves the crews to run into .ancr file paths.
+    Args:
+        crews: Crew file names (with or without the .ancr extension) or paths. All saved crews are used if empty.
+        saved_crews_directory: The saved crews directory.
+    Returns:
+        The list of crew file paths.
+    """
+
+    if not crews:
+
+        return [os.path.join(saved_crews_directory, file) for file in sorted(os.listdir(saved_crews_directory)) if file.endswith(crew_file_format.crew_file_extension)]
+
+    crew_file_paths = []
+
+    for crew in crews:
+
+        if os.path.isfile(crew):
+
+            crew_file_paths.append(crew)
+
+        else:
+
+            crew_file_paths.append(crew_file_format.get_crew_file_path(saved_crews_directory, crew.removesuffix(crew_file_format.crew_file_extension)))
+
+    return crew_file_paths
+
+def get_output_names(crew_file_paths):
+
+    """
+    This function names the outputs of each crew after its path relative to the directory all the crews are in,
+    so crews with the same file name in different directories do not overwrite each other's outputs.
+    Args:
+        crew_file_paths: The list of crew file paths.
+    Returns:
+        The list of output names, without an extension, which may include subdirectories.
+    """
+
+    if not crew_file_paths:
+
+        return []
+
+    crews_directory = os.path.commonpath([os.path.dirname(os.path.abspath(crew_file_path)) for crew_file_path in crew_file_paths])
+
+    output_names = []
+
+    number_of_runs = Counter()
+
+    for crew_file_path in crew_file_paths:
+
+        output_name = os.path.relpath(os.path.abspath(crew_file_path), crews_directory).removesuffix(crew_file_format.crew_file_extension)
+
+        # A crew given more than once is run more than once, and each run gets its own outputs
+
+        number_of_runs[output_name] += 1
+
+        output_names.append(output_name if number_of_runs[output_name] == 1 else f'{output_name}_run_{number_of_runs[output_name]}')
+
+    return output_names
+
+def get_validation_errors(crew_data):
+
+    """
+    This function validates a crew with the same rules as the platform, plus the rules for running without a user.
+    Args:
+        crew_data: The crew's agents_settings, tasks_settings and crew_settings.
+    Returns:
+        The list of validation error messages.
+    """
+
+    invalid_agent_settings_fields, invalid_task_settings_fields, invalid_crew_settings_fields = crew_builder.validate_crew(crew_data['agents_settings'],
+                                                                                                                          crew_data['tasks_settings'],
+                                                                                                                          crew_data['crew_settings'])
+
+    validation_errors = []
+
+    for agent_settings, missing_agent_settings_fields in invalid_agent_settings_fields:
+
+        validation_errors.append(f"Agent {(agent_settings['agent_id']).upper()} is missing the following fields: {', '.join(missing_agent_settings_fields)}")
+
+    for task_settings, missing_task_settings_fields in invalid_task_settings_fields:
+
+        validation_errors.append(f"Agent {(task_settings['agent_id']).upper()} Task {task_settings['task_number']} is missing the following fields: {', '.join(missing_task_settings_fields)}")
+
+    if invalid_crew_settings_fields:
+
+        validation_errors.append(f"Crew is missing the following fields: {', '.join(invalid_crew_settings_fields)}")
+
+    # The scheduler looks up the provider of every LLM, so LLMs that are not in the catalogue are caught before the crew is scheduled
+
+    for agent_settings in crew_data['agents_settings']:
+
+        if not agent_settings.get('agent_llm'):
+
+            validation_errors.append(f"Agent {(agent_settings['agent_id']).upper()} has no LLM")
+
+        elif agent_settings['agent_llm'] not in llm_registry.llm_catalogue:
+
+            validation_errors.append(f"Agent {(agent_settings['agent_id']).upper()} uses the LLM {agent_settings['agent_llm']}, which is not available")
+
+    crew_manager_llm = crew_data['crew_settings'].get('crew_manager_llm')
+
+    if crew_data['crew_settings'].get('crew_process') == 'Hierarchical' and crew_manager_llm and crew_manager_llm not in llm_registry.llm_catalogue:
+
+        validation_errors.append(f'Crew uses the manager LLM {crew_manager_llm}, which is not available')
+
+    for agent_settings in crew_data['agents_settings']:
+
+        if 'User Input Tool' in agent_settings['agent_tools']:
+
+            validation_errors.append(f"Agent {(agent_settings['agent_id']).upper()} uses the User Input Tool, which needs the platform UI")
+
+    for task_settings in crew_data['tasks_settings']:
+
+        if task_settings['task_human_input'] == 'True':
+
+            validation_errors.append(f"Agent {(task_settings['agent_id']).upper()} Task {task_settings['task_number']} requires human input, which needs the platform UI")
+
+    return validation_errors
+
+def get_output_text(crew_run_result):
+
+    if crew_run_result['crew_full_output']:
+
+        return '\n\n'.join([f'## {task_description}\n\n{task_raw_output}' for task_description, task_raw_output in crew_run_result['task_outputs']])
+
+    else:
+
+        return str(crew_run_result['output'])
+
+def load_crew_for_run(crew_file_path):
+
+    """
+    This function loads and validates a saved crew before it is scheduled.
+    Args:
+        crew_file_path: The path of the .ancr file.
+    Returns:
+        A tuple of a dictionary describing the run, including its status and timings in seconds,
+        and the crew data, which is None if the crew cannot run.
+    """
+
+    result = {'crew_file': crew_file_path,
+              'crew_name': None,
+              'status': 'Failed',
+              'errors': [],
+              'load_seconds': None,
+              'queued_seconds': None,
+              'configure_seconds': None,
+              'run_seconds': None,
+              'llm_response_cache_stats': None,
+              'rate_limiter_stats': None,
+              'run_id': None,
+              'output_file': None,
+              'verbose_output_file': None}
+
+    started_at = time.perf_counter()
+
+    try:
+
+        crew_data = crew_file_format.load_crew_file(crew_file_path)
+
+    except Exception as exception:
+
+        result['errors'].append(f'There wan an error loading crew: {str(exception)}')
+
+        return result, None
+
+    result['load_seconds'] = time.perf_counter() - started_at
+
+    result['crew_name'] = crew_data['crew_settings'].get('crew_name')
+
+    validation_errors = get_validation_errors(crew_data)
+
+    if validation_errors:
+
+        result['status'] = 'Invalid'
+
+        result['errors'] = validation_errors
+
+        return result, None
+
+    return result, crew_data
+
+def write_crew_run_outputs(result, scheduled_crew, output_directory, output_name):
+
+    """
+    This function waits for a scheduled crew and writes its output and verbose output to the output directory, as <output_name>.md and <output_name>.log.
+    """
+
+    crew_run_result = scheduled_crew.wait()
+
+    result['status'] = crew_run_result['status']
+
+    result['queued_seconds'] = scheduled_crew.started_at - scheduled_crew.submitted_at if scheduled_crew.started_at else None
+
+    result['configure_seconds'] = crew_run_result.get('configure_seconds')
+
+    result['run_seconds'] = crew_run_result.get('run_seconds')
+
+    result['llm_response_cache_stats'] = crew_run_result.get('llm_response_cache_stats')
+
+    result['rate_limiter_stats'] = crew_run_result.get('rate_limiter_stats')
+
+    # The full profile of the run is in the run profiles file, under this run id
+
+    result['run_id'] = (crew_run_result.get('run_profile') or {}).get('run_id')
+
+    if crew_run_result['error']:
+
+        result['errors'].append(f"There wan an error running crew: {crew_run_result['error']}")
+
+    result['verbose_output_file'] = os.path.join(output_directory, output_name + '.log')
+
+    os.makedirs(os.path.dirname(result['verbose_output_file']), exist_ok = True)
+
+    with open(result['verbose_output_file'], 'w') as verbose_output_file:
+
+        verbose_output_file.write(crew_run_result['verbose_output'])
+
+    if crew_run_result['status'] == 'Succeeded':
+
+        result['output_file'] = os.path.join(output_directory, output_name + '.md')
+
+        with open(result['output_file'], 'w') as output_file:
+
+            output_file.write(get_output_text(crew_run_result))
+
+    return result
+
+def main(arguments = None):
+
+    argument_parser = argparse.ArgumentParser(description = 'Run saved crews without the platform UI.')
+
+    argument_parser.add_argument('crews', nargs = '*', help = 'Crew file names or .ancr paths to run. Runs every saved crew if none are given.')
+
+    argument_parser.add_argument('--saved-crews-directory', default = './saved_crews', help = 'The directory of the saved crews.')
+
+    argument_parser.add_argument('--output-directory', default = './batch_outputs', help = 'The directory the outputs and timings are written to.')
+
+    argument_parser.add_argument('--workers', type = int, default = 0, help = 'The number of crews run at the same time. Defaults to Crew_Scheduler_Workers or the number of cores.')
+
+    argument_parser.add_argument('--priority', choices = CrewScheduler.priorities, default = 'Normal', help = 'The priority the crews are queued with.')
+
+    arguments = argument_parser.parse_args(arguments)
+
+    logging.basicConfig(level = logging.INFO, format = '%(asctime)s - %(levelname)s: %(message)s')
+
+    load_environment()
+
+    start_metrics_exporter()
+
+    batch_started_at = datetime.now()
+
+    output_directory = os.path.join(arguments.output_directory, batch_started_at.strftime('%Y%m%d_%H%M%S'))
+
+    os.makedirs(output_directory, exist_ok = True)
+
+    crew_scheduler = CrewScheduler(max_workers = arguments.workers or int(os.getenv('Crew_Scheduler_Workers', '0')) or None,
+                                   provider_limits = get_provider_limits(os.getenv('Crew_Scheduler_Provider_Limits')))
+
+    results = []
+
+    scheduled_crews = []
+
+    crew_file_paths = get_crew_file_paths(arguments.crews, arguments.saved_crews_directory)
+
+    for crew_file_path, output_name in zip(crew_file_paths, get_output_names(crew_file_paths)):
+
+        result, crew_data = load_crew_for_run(crew_file_path)
+
+        results.append(result)
+
+        if crew_data is not None:
+
+            logger.info(f'Scheduling crew {crew_file_path}')
+
+            try:
+
+                scheduled_crews.append((result, crew_scheduler.submit(crew_data, arguments.priority), output_name))
+
+                continue
+
+            except Exception as exception:
+
+                # A crew that cannot be scheduled fails on its own, and the rest of the batch still runs
+
+                result['errors'].append(f'There wan an error scheduling crew: {str(exception)}')
+
+        logger.info(f"Crew {crew_file_path} {result['status'].lower()}: {'; '.join(result['errors'])}")
+
+    try:
+
+        for result, scheduled_crew, output_name in scheduled_crews:
+
+            write_crew_run_outputs(result, scheduled_crew, output_directory, output_name)
+
+            logger.info(f"Crew {result['crew_file']} {result['status'].lower()}" + (f": {'; '.join(result['errors'])}" if result['errors'] else ''))
+
+    finally:
+
+        crew_scheduler.shutdown()
+
+    summary = {'started_at': batch_started_at.isoformat(),
+               'finished_at': datetime.now().isoformat(),
+               'results': results}
+
+    with open(os.path.join(output_directory, 'summary.json'), 'w') as summary_file:
+
+        json.dump(summary, summary_file, indent = 4)
+
+    logger.info(f'Outputs written to {output_directory}')
+
+    return 0 if all(result['status'] == 'Succeeded' for result in results) else 1
+
+if __name__ == '__main__':
+
+    sys.exit(main())
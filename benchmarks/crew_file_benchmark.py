@@ -0,0 +1,91 @@
+"""
+Compares the original .ancr format (indented JSON) with the current one, with and without compression, on synthetic crews of increasing size.
+
+Usage (from the repository root):
+    python -m benchmarks.crew_file_benchmark --agents 10,100,500 --tasks-per-agent 10 --repeat 5
+
+For each crew and format, the file size and the time to save, load, read the metadata (as the load dialog's catalogue does)
+and load without the large texts (as the crew preview does) are measured.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from benchmarks.platform_benchmark import get_synthetic_crew
+import utilities.crew_file as crew_file_format
+
+def save_legacy_crew_file(crew_file_path, agents_settings, tasks_settings, crew_settings):
+
+    with open(crew_file_path, 'w') as crew_file:
+
+        json.dump({'agents_settings': agents_settings, 'tasks_settings': tasks_settings, 'crew_settings': crew_settings}, crew_file, indent = 4)
+
+def time_in_ms(function, repeat):
+
+    timings = []
+
+    for _ in range(repeat):
+
+        started_at = time.perf_counter()
+
+        function()
+
+        timings.append((time.perf_counter() - started_at) * 1000)
+
+    return round(statistics.median(timings), 3)
+
+def run_benchmark(numbers_of_agents, numbers_of_tasks_per_agent, repeat):
+
+    formats = {'version 1 (indented JSON)': save_legacy_crew_file,
+               'version 2, zlib': lambda *crew: crew_file_format.save_crew_file(*crew, compression = 'zlib'),
+               'version 2, none': lambda *crew: crew_file_format.save_crew_file(*crew, compression = 'none')}
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as saved_crews_directory:
+
+        crew_file_path = crew_file_format.get_crew_file_path(saved_crews_directory, 'benchmark')
+
+        for number_of_agents in numbers_of_agents:
+
+            for tasks_per_agent in numbers_of_tasks_per_agent:
+
+                agents_settings, tasks_settings, crew_settings = get_synthetic_crew(number_of_agents, tasks_per_agent)
+
+                for format_name, save_function in formats.items():
+
+                    save_ms = time_in_ms(lambda: save_function(crew_file_path, agents_settings, tasks_settings, crew_settings), repeat)
+
+                    results.append({'agents': number_of_agents,
+                                    'tasks_per_agent': tasks_per_agent,
+                                    'format': format_name,
+                                    'bytes': os.path.getsize(crew_file_path),
+                                    'save_ms': save_ms,
+                                    'load_ms': time_in_ms(lambda: crew_file_format.load_crew_file(crew_file_path), repeat),
+                                    'metadata_ms': time_in_ms(lambda: crew_file_format.read_crew_file_metadata(crew_file_path), repeat),
+                                    'load_without_texts_ms': time_in_ms(lambda: crew_file_format.load_crew_file(crew_file_path, load_texts = False), repeat)})
+
+    return results
+
+def main(arguments = None):
+
+    argument_parser = argparse.ArgumentParser(description = 'Compare the .ancr crew file formats on synthetic crews.')
+
+    argument_parser.add_argument('--agents', default = '10,100,500', help = 'Comma-separated numbers of agents.')
+
+    argument_parser.add_argument('--tasks-per-agent', default = '10', help = 'Comma-separated numbers of tasks per agent.')
+
+    argument_parser.add_argument('--repeat', type = int, default = 5, help = 'The number of times each operation is timed. The median is reported.')
+
+    arguments = argument_parser.parse_args(arguments)
+
+    print(json.dumps(run_benchmark([int(number) for number in arguments.agents.split(',')],
+                                   [int(number) for number in arguments.tasks_per_agent.split(',')],
+                                   arguments.repeat), indent = 4))
+
+if __name__ == '__main__':
+
+    main()
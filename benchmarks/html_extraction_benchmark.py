@@ -0,0 +1,112 @@
+"""
+Compares the HTML extraction backends of the Web Scraper and Searcher Tool on a local corpus of saved HTML pages.
+
+Usage (from the repository root):
+    python -m benchmarks.html_extraction_benchmark --corpus-directory ./saved_pages --repeat 3
+
+Without a corpus directory, a synthetic corpus of pages with navigation, scripts and repeated footers is generated.
+The original extraction (html.parser and get_text) is measured as a baseline.
+"""
+
+import argparse
+from bs4 import BeautifulSoup
+import custom_tools.html_extraction as html_extraction
+import glob
+import json
+import os
+import time
+
+def extract_text_originally(content):
+
+    return BeautifulSoup(content, 'html.parser').get_text(separator = '\n')
+
+def get_synthetic_corpus(number_of_pages):
+
+    navigation = '<nav><ul>' + ''.join(f'<li><a href="/section/{number}">Section {number}</a></li>' for number in range(60)) + '</ul></nav>'
+
+    script = '<script>' + 'window.analytics.push({event: "view"});' * 200 + '</script><style>' + 'body { margin: 0; }' * 200 + '</style>'
+
+    footer = '<footer>' + '<p>Copyright, terms of use and privacy notice.</p>' * 20 + '</footer>'
+
+    corpus = []
+
+    for page_number in range(number_of_pages):
+
+        paragraphs = ''.join(f'<p>Notice {page_number}.{number}: the    filing deadline for   quarterly disclosures is  the end of the month.</p>\n' for number in range(300))
+
+        table = '<table>' + ''.join(f'<tr><td>Issuer {number}</td><td>{number * 1.5}</td></tr>' for number in range(100)) + '</table>'
+
+        corpus.append((f'synthetic_{page_number}.html', f'<html><head>{script}</head><body>{navigation}<main><h1>Page {page_number}</h1>{paragraphs}{table}</main>{footer}</body></html>'.encode('utf-8')))
+
+    return corpus
+
+def get_corpus(corpus_directory):
+
+    corpus = []
+
+    for page_path in sorted(glob.glob(os.path.join(corpus_directory, '**', '*.htm*'), recursive = True)):
+
+        with open(page_path, 'rb') as page_file:
+
+            corpus.append((os.path.basename(page_path), page_file.read()))
+
+    return corpus
+
+def run_benchmark(corpus, repeat):
+
+    extractors = {'original (html.parser, get_text)': extract_text_originally}
+
+    for name in html_extraction.html_extractors:
+
+        try:
+
+            extractors[name] = html_extraction.get_html_extractor(name)
+
+        except RuntimeError:
+
+            pass
+
+    bytes_in = sum(len(content) for _, content in corpus)
+
+    results = {}
+
+    for name, extract_function in extractors.items():
+
+        started_at = time.perf_counter()
+
+        for _ in range(repeat):
+
+            bytes_out = sum(len(extract_function(content).encode('utf-8')) for _, content in corpus)
+
+        seconds = time.perf_counter() - started_at
+
+        results[name] = {'pages': len(corpus),
+                         'bytes_in': bytes_in,
+                         'bytes_out': bytes_out,
+                         'ms_per_page': round(seconds * 1000 / (len(corpus) * repeat), 2)}
+
+    return results
+
+def main(arguments = None):
+
+    argument_parser = argparse.ArgumentParser(description = 'Compare the HTML extraction backends on a corpus of saved HTML pages.')
+
+    argument_parser.add_argument('--corpus-directory', help = 'A directory of saved .html pages. A synthetic corpus is used if not given.')
+
+    argument_parser.add_argument('--synthetic-pages', type = int, default = 20, help = 'The number of pages in the synthetic corpus.')
+
+    argument_parser.add_argument('--repeat', type = int, default = 3, help = 'The number of times the corpus is extracted by each backend.')
+
+    arguments = argument_parser.parse_args(arguments)
+
+    corpus = get_corpus(arguments.corpus_directory) if arguments.corpus_directory else get_synthetic_corpus(arguments.synthetic_pages)
+
+    if not corpus:
+
+        argument_parser.error(f'No HTML pages found in {arguments.corpus_directory}')
+
+    print(json.dumps(run_benchmark(corpus, arguments.repeat), indent = 4))
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,204 @@
+"""
+Measures the HTTP cache of the Web Scraper and Searcher Tool against a local stand-in server.
+
+Usage (from the repository root):
+    python -m benchmarks.http_cache_benchmark --pages 20 --rounds 5 --latency 0.05
+
+The stand-in serves HTML pages with ETag and Last-Modified headers, answers conditional requests with 304,
+adds a fixed latency to every response and returns 404 for /missing pages.
+"""
+
+import aiohttp
+import argparse
+import asyncio
+from bs4 import BeautifulSoup
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import requests
+import tempfile
+import threading
+import time
+from utilities.async_io_runner import AsyncIORunner
+from utilities.http_cache import HTTPCache
+from utilities.sqlite_store import SQLiteStore
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+
+    latency = 0.05
+
+    last_modified = formatdate(usegmt = True)
+
+    requests_served = {'200': 0, '304': 0, '404': 0}
+
+    def do_GET(self):
+
+        time.sleep(self.latency)
+
+        if self.path.startswith('/missing'):
+
+            self.send_status(404)
+
+            return
+
+        etag = f'"{self.path}"'
+
+        if self.headers.get('If-None-Match') == etag:
+
+            self.send_status(304)
+
+            return
+
+        body = get_page_body(self.path).encode('utf-8')
+
+        self.send_response(200)
+
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+
+        self.send_header('Content-Length', str(len(body)))
+
+        self.send_header('ETag', etag)
+
+        self.send_header('Last-Modified', self.last_modified)
+
+        self.end_headers()
+
+        self.wfile.write(body)
+
+        self.requests_served['200'] += 1
+
+    def send_status(self, status):
+
+        self.send_response(status)
+
+        self.send_header('Content-Length', '0')
+
+        self.end_headers()
+
+        self.requests_served[str(status)] += 1
+
+    def log_message(self, format, *args):
+
+        pass
+
+def get_page_body(path):
+
+    paragraphs = ''.join(f'<p>Paragraph {number} of {path}: market notice, filing deadline and disclosure requirements.</p>' for number in range(200))
+
+    return f'<html><head><script>var tracking = 1;</script></head><body><nav>Home | About</nav><h1>{path}</h1>{paragraphs}</body></html>'
+
+def get_page_text(content):
+
+    return BeautifulSoup(content, 'html.parser').get_text(separator = '\n')
+
+def time_requests(fetch_function, urls, rounds):
+
+    started_at = time.perf_counter()
+
+    for _ in range(rounds):
+
+        for url in urls:
+
+            try:
+
+                fetch_function(url)
+
+            except (requests.RequestException, aiohttp.ClientError):
+
+                pass
+
+    return time.perf_counter() - started_at
+
+async def get_concurrently(http_cache, urls):
+
+    await asyncio.gather(*[http_cache.get(url, get_page_text) for url in urls], return_exceptions = True)
+
+def run_benchmark(pages, rounds, latency):
+
+    StandInRequestHandler.latency = latency
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInRequestHandler)
+
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    urls = [f'{base_url}/page/{number}' for number in range(pages)]
+
+    missing_urls = [f'{base_url}/missing/{number}' for number in range(pages)]
+
+    results = {}
+
+    async_io_runner = AsyncIORunner()
+
+    try:
+
+        with tempfile.TemporaryDirectory() as cache_directory:
+
+            def uncached_fetch(url):
+
+                response = requests.get(url, timeout = 30)
+
+                response.raise_for_status()
+
+                return get_page_text(response.content)
+
+            scenarios = (('uncached', uncached_fetch, urls, None),
+                         ('cached, fresh', None, urls, 3600),
+                         ('cached, revalidated', None, urls, 0),
+                         ('uncached, failing', uncached_fetch, missing_urls, None),
+                         ('cached, failing', None, missing_urls, 3600),
+                         ('cached, concurrent', 'concurrent', urls, 3600))
+
+            for name, fetch_function, scenario_urls, ttl in scenarios:
+
+                http_cache = None
+
+                if ttl is not None:
+
+                    http_cache = HTTPCache(SQLiteStore(f'{cache_directory}/{len(results)}.sqlite', table_name = 'http_responses'), ttl = ttl, async_io_runner = async_io_runner)
+
+                StandInRequestHandler.requests_served.update({'200': 0, '304': 0, '404': 0})
+
+                if fetch_function == 'concurrent':
+
+                    # Every round requests all pages at once, so the first round shows how far the requests overlap
+
+                    seconds = time_requests(lambda urls: async_io_runner.run(get_concurrently(http_cache, urls)), [scenario_urls], rounds)
+
+                else:
+
+                    seconds = time_requests(fetch_function or (lambda url: async_io_runner.run(http_cache.get(url, get_page_text))), scenario_urls, rounds)
+
+                results[name] = {'seconds': round(seconds, 3),
+                                 'requests_per_second': round(len(scenario_urls) * rounds / seconds, 1),
+                                 'responses_served': dict(StandInRequestHandler.requests_served),
+                                 'cache_stats': http_cache.get_stats() if http_cache else None}
+
+    finally:
+
+        async_io_runner.close()
+
+        server.shutdown()
+
+    return results
+
+def main(arguments = None):
+
+    argument_parser = argparse.ArgumentParser(description = 'Measure the HTTP cache against a local stand-in server.')
+
+    argument_parser.add_argument('--pages', type = int, default = 20, help = 'The number of distinct pages requested.')
+
+    argument_parser.add_argument('--rounds', type = int, default = 5, help = 'The number of times every page is requested.')
+
+    argument_parser.add_argument('--latency', type = float, default = 0.05, help = 'The seconds the stand-in server waits before every response.')
+
+    arguments = argument_parser.parse_args(arguments)
+
+    results = run_benchmark(arguments.pages, arguments.rounds, arguments.latency)
+
+    print(json.dumps(results, indent = 4))
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,316 @@
+"""
+Measures what the platform costs around the LLM calls, on synthetic crews of increasing size run against the Mock LLM.
+
+Usage (from the repository root):
+    python -m benchmarks.platform_benchmark --agents 1,10,50,100,200 --tasks-per-agent 1,10 --repeat 3
+
+The paths timed are crew configuration (build_crew and its get_selected_llm and get_selected_tools calls), kickoff,
+the initialize_page render of the Streamlit script, capture_verbose_output throughput and .ancr save and load.
+Results are written as JSON, tagged with the current commit, so runs can be compared across commits.
+"""
+
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# crew_platform sets the provider API keys from the environment when it is imported, and the Mock LLM never uses them
+
+for environment_variable in ('NVIDIA_API_Key', 'OpenAI_API_Key'):
+
+    os.environ.setdefault(environment_variable, 'benchmark')
+
+# The benchmark tools make network requests, so the Mock LLM answers straight away unless told otherwise
+
+os.environ.setdefault('Mock_LLM_Tool_Calls_Per_Task', '0')
+
+from custom_tools.tool_factory import tool_factory
+import utilities.crew_builder as crew_builder
+import utilities.crew_file as crew_file_format
+from utilities.crew_model import CrewModel
+from utilities.llm_registry import llm_registry
+from utilities.verbose_output_stream import VerboseOutputStream
+
+# Tools that are built without network access or credentials
+
+benchmark_tools = ['Andalem Web Scrape and Search Tool', 'YouTube Transcription Tool']
+
+def get_synthetic_crew(number_of_agents, tasks_per_agent):
+
+    """
+    This function returns the agents_settings, tasks_settings and crew_settings of a synthetic sequential crew.
+    """
+
+    agents_settings = []
+
+    tasks_settings = []
+
+    for agent_number in range(number_of_agents):
+
+        agent_id = f'{agent_number:04x}'
+
+        agents_settings.append({'agent_id': agent_id,
+                                'agent_name': f'Agent {agent_number}',
+                                'agent_role': f'Analyst {agent_number}',
+                                'agent_goal': 'Summarise the filings of the companies under coverage. ' * 5,
+                                'agent_backstory': 'An experienced analyst of regulatory filings and market notices. ' * 10,
+                                'agent_verbosity': 'False',
+                                'agent_delegation': 'False',
+                                'agent_tools': benchmark_tools[:agent_number % (len(benchmark_tools) + 1)],
+                                'agent_llm': 'Mock LLM',
+                                'agent_llm_temperature': 0.50,
+                                'agent_max_rpm': 0,
+                                'agent_max_iter': 15,
+                                'agent_memory': 'False',
+                                'agent_llm_cache': 'False'})
+
+        for task_number in range(1, tasks_per_agent + 1):
+
+            tasks_settings.append({'agent_id': agent_id,
+                                   'task_number': task_number,
+                                   'task_human_input': 'False',
+                                   'task_description': f'Review the filing number {task_number} and list its key points. ' * 5,
+                                   'task_expected_output': 'A bullet point list of the key points.'})
+
+    crew_settings = {'crew_name': f'Benchmark {number_of_agents}x{tasks_per_agent}',
+                     'crew_description': 'A synthetic crew used to measure the platform overhead.',
+                     'crew_verbosity': 'False',
+                     'crew_max_rpm': 0,
+                     'crew_memory': 'False',
+                     'crew_full_output': 'False',
+                     'crew_llm_cache': 'False',
+                     'crew_process': 'Sequential',
+                     'crew_manager_llm': '',
+                     'crew_manager_llm_temperature': 0.50}
+
+    return agents_settings, tasks_settings, crew_settings
+
+def time_repeatedly(function, repeat):
+
+    """
+    This function calls a function repeat times.
+    Returns:
+        A dictionary with the minimum and median seconds, and the result of the last call.
+    """
+
+    seconds = []
+
+    for _ in range(repeat):
+
+        started_at = time.perf_counter()
+
+        result = function()
+
+        seconds.append(time.perf_counter() - started_at)
+
+    return {'min_seconds': round(min(seconds), 6), 'median_seconds': round(statistics.median(seconds), 6)}, result
+
+def benchmark_configuration(agents_settings, tasks_settings, crew_settings, repeat):
+
+    def select_llms():
+
+        llm_registry.clear()
+
+        return [crew_builder.get_selected_llm(agent_settings['agent_llm'], agent_settings['agent_llm_temperature'], 'Agent') for agent_settings in agents_settings]
+
+    def select_tools():
+
+        tool_run_scope = tool_factory.new_run_scope()
+
+        return [crew_builder.get_selected_tools(agent_settings['agent_tools'], tool_run_scope) for agent_settings in agents_settings]
+
+    def build_crew():
+
+        llm_registry.clear()
+
+        return crew_builder.build_crew(agents_settings, tasks_settings, crew_settings, tool_factory.new_run_scope())
+
+    get_selected_llm_timings, _ = time_repeatedly(select_llms, repeat)
+
+    get_selected_tools_timings, _ = time_repeatedly(select_tools, repeat)
+
+    build_crew_timings, _ = time_repeatedly(build_crew, repeat)
+
+    return {'get_selected_llm': get_selected_llm_timings,
+            'get_selected_tools': get_selected_tools_timings,
+            'build_crew': build_crew_timings}
+
+def benchmark_kickoff(agents_settings, tasks_settings, crew_settings, repeat):
+
+    def kickoff():
+
+        crew, _, _ = crew_builder.build_crew(agents_settings, tasks_settings, crew_settings, tool_factory.new_run_scope())
+
+        started_at = time.perf_counter()
+
+        crew.kickoff()
+
+        return time.perf_counter() - started_at
+
+    seconds = [kickoff() for _ in range(repeat)]
+
+    return {'min_seconds': round(min(seconds), 6), 'median_seconds': round(statistics.median(seconds), 6), 'seconds_per_task': round(min(seconds) / len(tasks_settings), 6)}
+
+def benchmark_render(agents_settings, tasks_settings, crew_settings, repeat):
+
+    from streamlit.testing.v1 import AppTest
+
+    app_test = AppTest.from_file('crew_platform.py', default_timeout = 600)
+
+    app_test.session_state['crew_model'] = CrewModel(agents_settings, tasks_settings, crew_settings)
+
+    first_run_timings, _ = time_repeatedly(app_test.run, 1)
+
+    if app_test.exception:
+
+        return {'error': str(app_test.exception[0].message)}
+
+    rerun_timings, _ = time_repeatedly(app_test.run, repeat)
+
+    return {'first_run': first_run_timings, 'rerun': rerun_timings}
+
+def benchmark_capture(number_of_lines, repeat):
+
+    from crew_platform import capture_verbose_output
+
+    line = '\x1b[1m\x1b[92m [DEBUG]: == Working Agent: Analyst\x1b[0m reviewing the filing and listing its key points\n'
+
+    def capture():
+
+        with VerboseOutputStream() as verbose_output_stream, capture_verbose_output(verbose_output_stream.write):
+
+            for _ in range(number_of_lines):
+
+                print(line, end = '')
+
+        return verbose_output_stream.get_html()
+
+    timings, _ = time_repeatedly(capture, repeat)
+
+    timings['lines_per_second'] = round(number_of_lines / timings['min_seconds'])
+
+    timings['megabytes_per_second'] = round(number_of_lines * len(line) / timings['min_seconds'] / 1e6, 2)
+
+    return timings
+
+def benchmark_persistence(agents_settings, tasks_settings, crew_settings, repeat):
+
+    with tempfile.TemporaryDirectory() as saved_crews_directory:
+
+        crew_file_path = crew_file_format.get_crew_file_path(saved_crews_directory, 'benchmark')
+
+        save_timings, _ = time_repeatedly(lambda: crew_file_format.save_crew_file(crew_file_path, agents_settings, tasks_settings, crew_settings), repeat)
+
+        load_timings, _ = time_repeatedly(lambda: crew_file_format.load_crew_file(crew_file_path), repeat)
+
+        return {'save': save_timings, 'load': load_timings, 'file_bytes': os.path.getsize(crew_file_path)}
+
+def get_commit():
+
+    try:
+
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True, check = True).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+
+        return None
+
+def run_benchmarks(agent_counts, task_counts, benchmarks, repeat, capture_lines, kickoff_max_tasks):
+
+    results = {'commit': get_commit(),
+               'started_at': datetime.now().isoformat(timespec = 'seconds'),
+               'python_version': platform.python_version(),
+               'platform': platform.platform(),
+               'repeat': repeat,
+               'crews': []}
+
+    if 'capture' in benchmarks:
+
+        results['capture'] = benchmark_capture(capture_lines, repeat)
+
+    for number_of_agents in agent_counts:
+
+        for tasks_per_agent in task_counts:
+
+            agents_settings, tasks_settings, crew_settings = get_synthetic_crew(number_of_agents, tasks_per_agent)
+
+            crew_results = {'agents': number_of_agents, 'tasks_per_agent': tasks_per_agent}
+
+            if 'configuration' in benchmarks:
+
+                crew_results['configuration'] = benchmark_configuration(agents_settings, tasks_settings, crew_settings, repeat)
+
+            if 'kickoff' in benchmarks and len(tasks_settings) <= kickoff_max_tasks:
+
+                crew_results['kickoff'] = benchmark_kickoff(agents_settings, tasks_settings, crew_settings, repeat)
+
+            if 'render' in benchmarks:
+
+                crew_results['render'] = benchmark_render(agents_settings, tasks_settings, crew_settings, repeat)
+
+            if 'persistence' in benchmarks:
+
+                crew_results['persistence'] = benchmark_persistence(agents_settings, tasks_settings, crew_settings, repeat)
+
+            results['crews'].append(crew_results)
+
+            print(json.dumps(crew_results), file = sys.stderr)
+
+    return results
+
+def main(arguments = None):
+
+    all_benchmarks = ('configuration', 'kickoff', 'render', 'capture', 'persistence')
+
+    argument_parser = argparse.ArgumentParser(description = 'Measure the platform overhead on synthetic crews run against the Mock LLM.')
+
+    argument_parser.add_argument('--agents', default = '1,10,50,100,200', help = 'Comma separated numbers of agents per crew.')
+
+    argument_parser.add_argument('--tasks-per-agent', default = '1,10', help = 'Comma separated numbers of tasks per agent.')
+
+    argument_parser.add_argument('--benchmarks', default = ','.join(all_benchmarks), help = f'Comma separated benchmarks to run, out of {", ".join(all_benchmarks)}.')
+
+    argument_parser.add_argument('--repeat', type = int, default = 3, help = 'The number of times each path is timed.')
+
+    argument_parser.add_argument('--capture-lines', type = int, default = 20000, help = 'The number of verbose output lines captured.')
+
+    argument_parser.add_argument('--kickoff-max-tasks', type = int, default = 200, help = 'The largest number of tasks a crew may have to be kicked off.')
+
+    argument_parser.add_argument('--output-file', help = 'The JSON file the results are written to. Defaults to ./benchmarks/results/platform_<commit>_<timestamp>.json.')
+
+    arguments = argument_parser.parse_args(arguments)
+
+    benchmarks = [benchmark.strip() for benchmark in arguments.benchmarks.split(',')]
+
+    unknown_benchmarks = set(benchmarks) - set(all_benchmarks)
+
+    if unknown_benchmarks:
+
+        argument_parser.error(f'Unknown benchmarks: {", ".join(sorted(unknown_benchmarks))}')
+
+    results = run_benchmarks([int(number) for number in arguments.agents.split(',')],
+                             [int(number) for number in arguments.tasks_per_agent.split(',')],
+                             benchmarks,
+                             arguments.repeat,
+                             arguments.capture_lines,
+                             arguments.kickoff_max_tasks)
+
+    output_file = arguments.output_file or os.path.join('./benchmarks/results', f'platform_{results["commit"] or "unknown"}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok = True)
+
+    with open(output_file, 'w') as results_file:
+
+        json.dump(results, results_file, indent = 4)
+
+    print(output_file)
+
+if __name__ == '__main__':
+
+    main()
@@ -1,107 +1,87 @@
-from ansi2html import Ansi2HTMLConverter
-from contextlib import contextmanager, redirect_stdout, redirect_stderr
-from crewai import Agent, Crew, Process, Task
-from crewai_tools import ScrapeWebsiteTool, SeleniumScrapingTool, SerperDevTool, WebsiteSearchTool
-from custom_tools.custom_tools import AndalemWebScrapeAndSearchTool, UserInputTool, YouTubeTranscriptionTool
+from contextlib import contextmanager
+from custom_tools.tool_factory import tool_factory
 from dotenv import find_dotenv, load_dotenv
-from io import StringIO
-from langchain_community.llms import ollama
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
-from langchain_openai import ChatOpenAI
-import logging
 import os
 import streamlit as st
 from streamlit import _bottom
-import sys
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from textual_resources.input_field_tooltips import InputFieldTooltips
 from textual_resources.openai_exceptions import OpenAIExceptions
+from utilities.ansi_rendering import ansi_stylesheet, render_ansi
+import utilities.crew_autosave as crew_autosave
+import utilities.crew_builder as crew_builder
+from utilities.crew_catalogue import get_crew_catalogue
+import utilities.crew_jobs as crew_jobs
+from utilities.crew_jobs import crew_job_registry
+from utilities.crew_model import CrewModel
 from utilities.custom_styles import CustomStyles
 import utilities.dialogs as dialogs 
+from utilities.llm_registry import llm_registry
+from utilities.llm_response_cache import get_llm_response_cache_stats, get_llm_response_cache_stats_since
+import utilities.log_pipeline as log_pipeline
+import utilities.metrics as metrics
+from utilities.rate_limiter import get_rate_limiter, get_rate_limiter_stats_since
+from utilities.run_profiler import profile_run
 from utilities.streamlit_tweaker import st_tweaker
-import uuid
+from utilities.verbose_output_stream import VerboseOutputStream
+import time
 
 _ = load_dotenv(find_dotenv())
 app_name = os.getenv('App_Name')
 app_version = os.getenv('App_Version')
+verbose_output_max_lines = int(os.getenv('Verbose_Output_Max_Lines', '2000'))
 
 os.environ['NVIDIA_API_KEY'] = os.getenv('NVIDIA_API_Key')
 os.environ['OPENAI_API_KEY'] = os.getenv('OpenAI_API_Key')
 
-def initialize_app():
+def get_number_of_active_sessions():
 
-  st.session_state.custom_style = CustomStyles.custom_style
+  # The session manager is not part of the public API, so the gauge is left empty if it cannot be read
 
-  st.session_state.agent_tooltips = InputFieldTooltips.agent_tooltips
+  try:
 
-  st.session_state.task_tooltips = InputFieldTooltips.task_tooltips
+    return runtime.get_instance()._session_mgr.num_active_sessions() if runtime.exists() else None
 
-  st.session_state.crew_tooltips = InputFieldTooltips.crew_tooltips
+  except AttributeError:
 
-  if 'logger' not in st.session_state:
+    return None
+
+metrics.active_sessions.set_function(get_number_of_active_sessions)
 
-    st.session_state.logger = logging.getLogger(__name__)
-    st.session_state.logger.setLevel(logging.ERROR)
-    st.session_state.logger.propagate = False
+metrics.start_metrics_exporter()
 
-    logging_formatter = logging.Formatter('%(asctime)s - %(levelname)s: %(message)s') 
+def initialize_app():
 
-    logging_file_handler = logging.FileHandler('./logs/platform_log.log')
-    logging_file_handler.setLevel(logging.ERROR)
-    logging_file_handler.setFormatter(logging_formatter) 
+  st.session_state.custom_style = CustomStyles.custom_style
 
-    logging_stdout_handler = logging.StreamHandler(sys.stdout)
-    logging_stdout_handler.setLevel(logging.ERROR)
-    logging_stdout_handler.setFormatter(logging_formatter)
+  st.session_state.agent_tooltips = InputFieldTooltips.agent_tooltips
 
-    if not st.session_state.logger.hasHandlers():
+  st.session_state.task_tooltips = InputFieldTooltips.task_tooltips
 
-      st.session_state.logger.addHandler(logging_file_handler)
-      st.session_state.logger.addHandler(logging_stdout_handler)  
+  st.session_state.crew_tooltips = InputFieldTooltips.crew_tooltips
 
-  if 'agents_settings' not in st.session_state:
+  # Records are stamped with the session, and written by the log pipeline's background thread shared by every session
 
-    st.session_state.agents_settings = []
+  log_pipeline.set_session_id(get_script_run_ctx().session_id if get_script_run_ctx() else None)
 
-  if 'tasks_settings' not in st.session_state:
+  if 'logger' not in st.session_state:
 
-    st.session_state.tasks_settings = []  
+    st.session_state.logger = log_pipeline.get_logger(__name__)
 
-  if 'crew_settings' not in st.session_state:
+  if 'crew_model' not in st.session_state:
 
-    st.session_state.crew_settings = {}
+    st.session_state.crew_model = CrewModel()
 
   st.session_state.saved_crews_directory = './saved_crews'
+
+  if 'crew_autosaver' not in st.session_state:
+
+    st.session_state.crew_autosaver = crew_autosave.get_crew_autosaver(st.session_state.saved_crews_directory)
   
-  st.session_state.tools_choices = ['Andalem Web Scrape and Search Tool',
-                                    'DuckDuckGo Search Tool',
-                                    'Google Serper Search Tool',
-                                    'Selenium Scrape Tool',
-                                    'User Input Tool',
-                                    'Web Page Scrape Tool',
-                                    'Website Search Tool',
-                                    'YouTube Transcription Tool']
+  st.session_state.tools_choices = list(tool_factory.tool_catalogue.keys())
   
-  st.session_state.llm_choices = ['DBRX 132B',
-                                  'Gemma 7B',
-                                  'Llama 3 8B',
-                                  'Llama 3 8B Dolphin',
-                                  'Mistral 7B',
-                                  'Mistral 7B Dolphin',
-                                  'Mixtral 8 X 7B',
-                                  'Mixtral 8 X 7B Dolphin',
-                                  'NVIDIA Llama 3 70B Instruct',
-                                  'NVIDIA Mistral Large',
-                                  'NVIDIA Mixtral 8 X 22B Instruct',
-                                  'NVIDIA Nemotron 4 340B Instruct',
-                                  'OpenAI GPT 3.5 Turbo',
-                                  'OpenAI GPT 3.5 Turbo 0125',
-                                  'OpenAI GPT 4',
-                                  'OpenAI GPT 4O',
-                                  'Openhermes',
-                                  'Phi 3 Mini 3.8B',
-                                  'WizardLM 2 7B',
-                                  'Zephyr 7B']
+  st.session_state.llm_choices = list(llm_registry.llm_catalogue.keys())
   
   if 'show_verbose_output_on_ui' not in st.session_state:
 
@@ -114,6 +94,18 @@ def initialize_app():
   if 'crew_saved' not in st.session_state:
 
     st.session_state['crew_saved'] = False
+
+  if 'run_crew_in_background' not in st.session_state:
+
+    st.session_state['run_crew_in_background'] = True
+
+  if 'crew_job_id' not in st.session_state:
+
+    st.session_state['crew_job_id'] = None
+
+    if 'crew_job' in st.query_params and crew_job_registry.get(st.query_params['crew_job']):
+
+      st.session_state['crew_job_id'] = st.query_params['crew_job']
         
 def initialize_page():
 
@@ -124,6 +116,8 @@ def initialize_page():
 
   st.markdown(st.session_state.custom_style, unsafe_allow_html = True)
 
+  st.markdown(ansi_stylesheet, unsafe_allow_html = True)
+
   st_tweaker.image('./app_images/andalem-logo-with-motto.png', cls = 'app-logo', width = 245)
 
   st.write(f'<span class="app-name">{app_name} {app_version}</span>', unsafe_allow_html = True)
@@ -143,25 +137,21 @@ def initialize_page():
               on_click = add_agent,
               key = 'add_agent_button')
 
-  if len(st.session_state.agents_settings) > 0:
-
-    st.write(f'<span class="number-of-agents">Number of Agents in Crew: {len(st.session_state.agents_settings)}</span>', unsafe_allow_html = True)
-
-  for agent_settings in st.session_state.agents_settings:
+  crew_model = st.session_state.crew_model
 
-    agent_tasks_settings = []
+  if len(crew_model) > 0:
 
-    for task_settings in st.session_state.tasks_settings:
+    st.write(f'<span class="number-of-agents">Number of Agents in Crew: {len(crew_model)}</span>', unsafe_allow_html = True)
 
-      if task_settings['agent_id'] == agent_settings['agent_id']:
+  autosave_status_container = st.empty()
 
-        agent_tasks_settings.append(task_settings)
+  for agent_id in list(crew_model.agents):
 
-    load_agent_settings(agent_settings, agent_tasks_settings)
+    show_agent_panel(agent_id)
 
-  if len(st.session_state.agents_settings) > 0: 
+  if len(crew_model) > 0: 
 
-    load_crew_settings(st.session_state.crew_settings)
+    show_crew_settings_panel()
 
     output_preference_section_columns =  st.columns((1, 1, 1, 1), gap = 'small')
 
@@ -171,12 +161,38 @@ def initialize_page():
                   value = True,
                   key = 'show_verbose_output_on_ui')
 
+    with output_preference_section_columns[1]:
+
+      st.checkbox('Run Crew in Background',
+                  value = True,
+                  key = 'run_crew_in_background')
+
+  if st.session_state.get('remove_dialog_request'):
+
+    dialogs.show_remove_dialog(*st.session_state.pop('remove_dialog_request'))
+
   st.session_state.work_process_container = st.empty() 
 
   st.session_state.user_input_container = st.empty()
 
   st.session_state.output_container = st.empty()
 
+  if st.session_state['crew_job_id']:
+
+    crew_job = crew_job_registry.get(st.session_state['crew_job_id'])
+
+    if crew_job is None:
+
+      dismiss_crew_job()
+
+    elif crew_job.is_finished():
+
+      show_crew_job_result(crew_job.job_id)
+
+    else:
+
+      show_crew_job_progress(crew_job.job_id)
+
   bottom_section_columns = _bottom.columns((1, 1, 1, 1), gap = 'small')
   
   with bottom_section_columns[0]:
@@ -185,7 +201,7 @@ def initialize_page():
                  use_container_width = True, 
                  key = 'run_crew_button'):
       
-      if len(st.session_state.agents_settings) > 0:
+      if len(crew_model) > 0:
         
         validate()
 
@@ -199,13 +215,13 @@ def initialize_page():
                  use_container_width = True, 
                  key = 'save_crew_button'): 
       
-      if len(st.session_state.agents_settings) > 0:
+      if len(crew_model) > 0:
 
         try:
 
-          os.makedirs(st.session_state.saved_crews_directory, exist_ok = True)
+          crew_catalogue = get_crew_catalogue(st.session_state.saved_crews_directory)
 
-          saved_crews_directory_files = os.listdir(st.session_state.saved_crews_directory)
+          dialogs.show_save_crew_dialog(crew_catalogue, st.session_state['current_crew'])        
     
         except Exception as exception:
 
@@ -213,8 +229,6 @@ def initialize_page():
 
           st.session_state.logger.error(f'There wan an error reading saved crews directory: {str(exception)}') 
 
-        dialogs.show_save_crew_dialog(saved_crews_directory_files, st.session_state.saved_crews_directory, st.session_state['current_crew'])        
-
       else:
 
         dialogs.show_error_dialog('There is no crew to save! Add at least one agent.')
@@ -226,7 +240,7 @@ def initialize_page():
                  use_container_width = True, 
                  key = 'remove_crew_button'):
 
-      if len(st.session_state.agents_settings) > 0:
+      if len(crew_model) > 0:
 
         dialogs.show_remove_dialog('Crew', None, None, 'Are you sure you wish to remove this crew?')
 
@@ -242,9 +256,9 @@ def initialize_page():
       
       try:
 
-        os.makedirs(st.session_state.saved_crews_directory, exist_ok = True)
+        crew_catalogue = get_crew_catalogue(st.session_state.saved_crews_directory)
 
-        saved_crews_directory_files = os.listdir(st.session_state.saved_crews_directory)
+        dialogs.show_load_crew_dialog(crew_catalogue) 
   
       except Exception as exception:
 
@@ -252,11 +266,83 @@ def initialize_page():
 
         st.session_state.logger.error(f'There wan an error reading saved crews directory: {str(exception)}') 
 
-      dialogs.show_load_crew_dialog(saved_crews_directory_files, st.session_state.saved_crews_directory) 
+  autosave_crew()
+
+  autosave_status = st.session_state.crew_autosaver.get_status()
+
+  if autosave_status and st.session_state['current_crew'] and len(crew_model) > 0:
+
+    autosave_status_container.caption(autosave_status)
+
+def autosave_crew():
+
+  # The crew as edited in this run is compared with what was last written, and saved in the background if it changed
+
+  crew_model = st.session_state.crew_model
+
+  st.session_state.crew_autosaver.update(st.session_state['current_crew'],
+                                         crew_model.agents_settings,
+                                         crew_model.tasks_settings,
+                                         crew_model.crew_settings)
+
+def is_fragment_run():
+
+  script_run_context = get_script_run_ctx()
+
+  return bool(script_run_context and getattr(script_run_context, 'fragment_ids_this_run', None))
+
+# Editing an agent or the crew settings reruns only its panel, not the page, its styles, logo and other panels.
+# Whatever the panels depend on across each other, like the number of agents that decides whether delegation can be allowed,
+# only changes through the Add Agent button or the dialogs, which rerun the whole page
+
+@st.experimental_fragment
+def show_agent_panel(agent_id):
+
+  crew_model = st.session_state.crew_model
+
+  agent_settings = crew_model.get_agent(agent_id)
+
+  if agent_settings is None:
+
+    return
+
+  load_agent_settings(agent_settings, crew_model.get_agent_tasks(agent_id))
+
+  # The page autosaves the crew at the end of a full run, so a panel only does when it reruns on its own
+
+  if is_fragment_run():
+
+    autosave_crew()
+
+@st.experimental_fragment
+def show_crew_settings_panel():
+
+  crew_model = st.session_state.crew_model
+
+  if len(crew_model) == 0:
+
+    return
+
+  load_crew_settings(crew_model.crew_settings)
+
+  if is_fragment_run():
+
+    autosave_crew()
+
+def request_remove_dialog(remove_type, agent_id, task_number, message):
+
+  # A dialog opened inside a panel's fragment would rerun the panel, not the dialog, when clicked,
+  # so the page is rerun to open it outside the panels
+
+  st.session_state['remove_dialog_request'] = (remove_type, agent_id, task_number, message)
+
+  st.rerun()
 
 def add_agent():
 
-  agent_id = generate_unique_agent_id()
+  crew_model = st.session_state.crew_model
+
+  agent_id = crew_model.generate_agent_id()
 
   agent_settings = {'agent_id': agent_id, 
                     'agent_name': """""", 
@@ -270,9 +356,10 @@ def add_agent():
                     'agent_llm_temperature': 0.50, 
                     'agent_max_rpm': 50,
                     'agent_max_iter': 15,
-                    'agent_memory': 'False'}
+                    'agent_memory': 'False',
+                    'agent_llm_cache': 'Auto'}
   
-  if len(st.session_state.agents_settings) == 0:
+  if len(crew_model) == 0:
 
     crew_settings = {'crew_name': """""",
                      'crew_description': """""",
@@ -280,19 +367,20 @@ def add_agent():
                      'crew_max_rpm': 50,
                      'crew_memory': 'False',
                      'crew_full_output': 'True',
+                     'crew_llm_cache': 'True',
                      'crew_process': 'Sequential',
                      'crew_manager_llm': '',
                      'crew_manager_llm_temperature': 0.50,} 
     
-    st.session_state.crew_settings = crew_settings 
+    crew_model.crew_settings = crew_settings 
 
-  st.session_state.agents_settings.append(agent_settings)
+  crew_model.add_agent(agent_settings)
 
   add_task(agent_id)
 
 def add_task(agent_id):
 
-  task_number = generate_task_number(agent_id)
+  task_number = st.session_state.crew_model.generate_task_number(agent_id)
 
   task_settings = {'agent_id': agent_id,
                    'task_number': task_number,
@@ -300,39 +388,7 @@ def add_task(agent_id):
                    'task_description': """""",
                    'task_expected_output': """"""} 
   
-  st.session_state.tasks_settings.append(task_settings)
-
-def generate_unique_agent_id():
-
-  unique_id = uuid.uuid4()
-
-  agent_id = ((str(unique_id).replace('-', '')))[:4]
-
-  existing_agent_ids = []
-
-  for agent_settings in st.session_state.agents_settings:
-
-    existing_agent_ids.append(agent_settings['agent_id'])
-
-  if agent_id in existing_agent_ids:
-
-    generate_unique_agent_id()
-
-  else:
-
-    return agent_id
-  
-def generate_task_number(agent_id):
-
-  agent_tasks = []
-
-  for task_settings in st.session_state.tasks_settings:
-
-    if task_settings['agent_id'] == agent_id:
-
-      agent_tasks.append(task_settings)
-
-  return len(agent_tasks) + 1    
+  st.session_state.crew_model.add_task(task_settings)
 
 def load_agent_settings(agent_settings, agent_tasks_settings):
 
@@ -396,13 +452,7 @@ def load_agent_settings(agent_settings, agent_tasks_settings):
           
         with row_4_columns[1]:
 
-          if len(st.session_state.agents_settings) == 1: 
-
-            for agent in st.session_state.agents_settings:
-                    
-              if agent['agent_id'] == str(agent_id):
-
-                agent['agent_delegation'] = 'False'
+          if len(st.session_state.crew_model) == 1: 
 
             agent_settings['agent_delegation'] = 'False'
         
@@ -429,7 +479,7 @@ def load_agent_settings(agent_settings, agent_tasks_settings):
                                                        help = st.session_state.agent_tooltips['agent_tools'],
                                                        key = f'agent_{agent_id}_tools')
         
-        row_6_columns =  st.columns((1, 1), gap = 'small')
+        row_6_columns =  st.columns((1, 1, 1), gap = 'small')
 
         with row_6_columns[0]:
         
@@ -449,6 +499,14 @@ def load_agent_settings(agent_settings, agent_tasks_settings):
                                                               help = st.session_state.agent_tooltips['agent_llm_temperature'],
                                                               key = f'agent_{agent_id}_llm_temperature') 
 
+        with row_6_columns[2]:
+
+          agent_settings['agent_llm_cache'] = st.selectbox('Response Cache: *', 
+                                                           options = ('Auto', 'False', 'True'), 
+                                                           index = ('Auto', 'False', 'True').index(agent_settings.get('agent_llm_cache', 'Auto')), 
+                                                           help = st.session_state.agent_tooltips['agent_llm_cache'],
+                                                           key = f'agent_{agent_id}_llm_cache') 
+
         row_7_columns =  st.columns((1, 1, 1), gap = 'small') 
 
         with row_7_columns[0]:
@@ -532,7 +590,7 @@ def load_agent_settings(agent_settings, agent_tasks_settings):
                            use_container_width = True,
                            key =f'remove_{agent_id}_task_{task_number}'):
                 
-                dialogs.show_remove_dialog('Task', agent_id, task_number, 'Are you sure you wish to remove this task?')
+                request_remove_dialog('Task', agent_id, task_number, 'Are you sure you wish to remove this task?')
 
     agent_control_columns =  st.columns((1, 1, 2, 2), gap = 'small')      
 
@@ -543,7 +601,7 @@ def load_agent_settings(agent_settings, agent_tasks_settings):
                    use_container_width = True,
                    key = f'remove_{agent_id}'):
         
-        dialogs.show_remove_dialog('Agent', agent_id, None, 'Are you sure you wish to remove this agent?')   
+        request_remove_dialog('Agent', agent_id, None, 'Are you sure you wish to remove this agent?')   
 
 def load_crew_settings(crew_settings):
 
@@ -587,7 +645,7 @@ def load_crew_settings(crew_settings):
                                                       help = st.session_state.crew_tooltips['crew_max_rpm'],
                                                       key = 'crew_max_rpm')
       
-    row_4_columns =  st.columns((1, 1), gap = 'small')
+    row_4_columns =  st.columns((1, 1, 1), gap = 'small')
 
     with row_4_columns[0]:
 
@@ -605,6 +663,14 @@ def load_crew_settings(crew_settings):
                                                        help = st.session_state.crew_tooltips['crew_full_output'],
                                                        key = 'crew_full_output')
 
+    with row_4_columns[2]:
+
+      crew_settings['crew_llm_cache'] = st.selectbox('LLM Response Cache: *', 
+                                                     options = ('False', 'True'), 
+                                                     index = ('False', 'True').index(crew_settings.get('crew_llm_cache', 'True')), 
+                                                     help = st.session_state.crew_tooltips['crew_llm_cache'],
+                                                     key = 'crew_llm_cache')
+
     row_5_columns =  st.columns((1, 1, 1), gap = 'small')
 
     with row_5_columns[0]:
@@ -629,8 +695,6 @@ def load_crew_settings(crew_settings):
 
       else:
 
-        st.session_state.crew_settings['crew_manager_llm'] = None
-
         crew_settings['crew_manager_llm'] = None
 
         crew_settings['crew_manager_llm'] = st.selectbox('Manager LLM: *', 
@@ -656,8 +720,6 @@ def load_crew_settings(crew_settings):
 
       else:
 
-        st.session_state.crew_settings['crew_manager_llm_temperature'] = 0.50
-
         crew_settings['crew_manager_llm_temperature'] = 0.50
 
         crew_settings['crew_manager_llm_temperature'] = st.slider('Temperature: *', 
@@ -671,122 +733,60 @@ def load_crew_settings(crew_settings):
 
 def validate():
 
-  required_agent_settings_fields = ['agent_name', 'agent_role', 'agent_goal', 'agent_backstory'] 
+  crew_model = st.session_state.crew_model
 
-  required_task_settings_fields = ['task_description', 'task_expected_output']
-  
-  required_crew_settings_fields = ['crew_name', 'crew_description']
-  
-  if st.session_state.crew_settings['crew_process'] == 'Hierarchical':
+  invalid_agent_settings_fields, invalid_task_settings_fields, invalid_crew_settings_fields = crew_builder.validate_crew(crew_model.agents_settings, 
+                                                                                                                        crew_model.tasks_settings, 
+                                                                                                                        crew_model.crew_settings)
 
-    required_crew_settings_fields.append('crew_manager_llm')
+  if len(invalid_agent_settings_fields) > 0 or len(invalid_task_settings_fields) > 0 or len(invalid_crew_settings_fields) > 0:
 
-  invalid_agent_settings_fields = []
+    dialogs.show_validation_dialog(invalid_agent_settings_fields, invalid_task_settings_fields, invalid_crew_settings_fields) 
 
-  for agent_settings in st.session_state.agents_settings:
+  elif st.session_state['run_crew_in_background'] and not crew_builder.requires_user_input(crew_model.agents_settings, crew_model.tasks_settings):
 
-    missing_agent_settings_fields = [((field.replace('_', ' ')).title()).replace('Llm', 'LLM') for field in required_agent_settings_fields if not agent_settings.get(field)]
+    start_crew_job()
 
-    if missing_agent_settings_fields:
-          
-      invalid_agent_settings_fields.append((agent_settings, missing_agent_settings_fields))
+  else:
 
-  invalid_task_settings_fields = []
+    run_crew()   
 
-  for task_settings in st.session_state.tasks_settings:
+def run_crew():
 
-    missing_task_settings_fields = [((field.replace('_', ' ')).title()).replace('Llm', 'LLM') for field in required_task_settings_fields if not task_settings.get(field)]
+  crew_model = st.session_state.crew_model
 
-    if missing_task_settings_fields:
-          
-      invalid_task_settings_fields.append((task_settings, missing_task_settings_fields))
+  with st.session_state.output_container:
 
-  invalid_crew_settings_fields = [((field.replace('_', ' ')).title()).replace('Llm', 'LLM') for field in required_crew_settings_fields if not st.session_state.crew_settings.get(field)]
+    with st.session_state.output_container.expander('Output', expanded = True):
 
-  if len(invalid_agent_settings_fields) > 0 or len(invalid_task_settings_fields) > 0 or len(invalid_crew_settings_fields) > 0:
+      with st.spinner('Configuring crew. Please wait . . .'):
 
-    dialogs.show_validation_dialog(invalid_agent_settings_fields, invalid_task_settings_fields, invalid_crew_settings_fields) 
+        try:
 
-  else:
+          crew, tasks, crew_full_output = crew_builder.build_crew(crew_model.agents_settings,
+                                                                  crew_model.tasks_settings,
+                                                                  crew_model.crew_settings,
+                                                                  tool_factory.new_run_scope())
 
-    run_crew()   
+        except Exception as exception:
 
-def run_crew():
+          dialogs.show_error_dialog('There wan an error configuring the crew! Check the log for details')
 
-  with st.session_state.output_container:
+          st.session_state.logger.error(f'There wan an error configuring crew: {str(exception)}')
 
-    with st.session_state.output_container.expander('Output', expanded = True):
+          return
+        
+      with st.spinner('Running crew. Please wait . . .'), profile_run(crew_model.crew_settings.get('crew_name')) as run_profile:
 
-      with st.spinner('Configuring crew. Please wait . . .'):
+        llm_response_cache_stats = get_llm_response_cache_stats()
 
-        agents = []
-
-        tasks = []
-
-        for agent_settings in st.session_state.agents_settings:
-
-          agent_id = agent_settings['agent_id'] 
-          agent_name = agent_settings['agent_name']
-          agent_role = agent_settings['agent_role']
-          agent_goal = agent_settings['agent_goal'] 
-          agent_backstory = agent_settings['agent_backstory'] 
-          agent_verbosity = get_selected_boolean(agent_settings['agent_verbosity'])
-          agent_delegation = get_selected_boolean(agent_settings['agent_delegation'])
-          agent_tools = [] if not agent_settings['agent_tools'] else get_selected_tools(agent_settings['agent_tools'])
-          agent_llm_temperature = agent_settings['agent_llm_temperature'] 
-          agent_llm = get_selected_llm(agent_settings['agent_llm'], agent_llm_temperature, 'Agent')
-          agent_max_rpm = get_max_rpm(agent_settings['agent_max_rpm'])
-          agent_max_iter = agent_settings['agent_max_iter']
-          agent_memory = get_selected_boolean(agent_settings['agent_memory'])
-
-          globals()['agent_' + str(agent_id)] = Agent(role = agent_role,
-                                                      goal = agent_goal,
-                                                      backstory = agent_backstory,
-                                                      verbose = agent_verbosity,
-                                                      allow_delegation = agent_delegation,
-                                                      tools = agent_tools,
-                                                      llm = agent_llm,
-                                                      max_rpm = agent_max_rpm,
-                                                      max_iter = agent_max_iter,
-                                                      memory = agent_memory)
-          
-          agents.append(globals()['agent_' + str(agent_id)])
+        rate_limiter_stats = get_rate_limiter().get_stats()
 
-        for task_settings in st.session_state.tasks_settings:
+        metrics.inline_crews_running.inc()
 
-          task_agent_id = task_settings['agent_id']
-          task_number = task_settings['task_number']
-          task_human_input = get_selected_boolean(task_settings['task_human_input'])
-          task_description = task_settings['task_description']
-          task_expected_output = task_settings['task_expected_output'] 
+        started_at = time.perf_counter()
 
-          globals()['agent_' + str(task_agent_id) + '_task_' + str(task_number)] = Task(human_input = task_human_input,
-                                                                                        description = task_description,
-                                                                                        agent = globals()['agent_' + str(task_agent_id)],
-                                                                                        expected_output = task_expected_output)
-          
-          tasks.append(globals()['agent_' + str(task_agent_id) + '_task_' + str(task_number)])
-
-        crew_name = st.session_state.crew_settings['crew_name']
-        crew_description = st.session_state.crew_settings['crew_description']
-        crew_verbosity = get_selected_boolean(st.session_state.crew_settings['crew_verbosity'])
-        crew_max_rpm = get_max_rpm(st.session_state.crew_settings['crew_max_rpm'])
-        crew_memory = get_selected_boolean(st.session_state.crew_settings['crew_memory'])
-        crew_full_output = get_selected_boolean(st.session_state.crew_settings['crew_full_output']) 
-        crew_process = get_selected_process(st.session_state.crew_settings['crew_process'])        
-        crew_manager_llm_temperature = st.session_state.crew_settings['crew_manager_llm_temperature']
-        crew_manager_llm = get_selected_llm(st.session_state.crew_settings['crew_manager_llm'], crew_manager_llm_temperature, 'Manager') 
-
-        crew = Crew(agents = agents,
-                    tasks = tasks,
-                    verbose = crew_verbosity,
-                    max_rpm = crew_max_rpm,
-                    memory = crew_memory,
-                    full_output = crew_full_output,
-                    process = crew_process,
-                    manager_llm = crew_manager_llm)
-        
-      with st.spinner('Running crew. Please wait . . .'):
+        crew_run_status = 'Failed'
 
         try:
 
@@ -796,7 +796,7 @@ def run_crew():
 
               with st.expander('Work Process', expanded = True):
 
-                with capture_verbose_output(lambda output: display_verbose_output(output)):
+                with create_verbose_output_stream() as verbose_output_stream, capture_verbose_output(verbose_output_stream.write):
 
                   output = crew.kickoff()
 
@@ -828,190 +828,232 @@ def run_crew():
 
               st.markdown(get_final_output(output), unsafe_allow_html = True)
 
+          crew_run_status = 'Succeeded'
+
         except Exception as exception:
 
-          error_message = None
+          show_crew_run_error(str(exception), OpenAIExceptions.get_error_message(exception))
 
-          for error_type, message in OpenAIExceptions.error_messages.items():
-              
-            if isinstance(exception, error_type):
-                
-              error_message = message
+          output = None             
 
-              break
-              
-          if error_message:
+        finally:
 
-            dialogs.show_error_dialog(error_message)
+          metrics.inline_crews_running.dec()
 
-            st.session_state.logger.error(f'There wan an error running crew: {str(exception)}')
+          metrics.crew_runs.inc(mode = 'inline', status = crew_run_status)
 
-          else:
-              
-            dialogs.show_error_dialog('There wan an error running the crew! Check the log for details')
+          metrics.crew_run_seconds.observe(time.perf_counter() - started_at, mode = 'inline')
 
-            st.session_state.logger.error(f'There wan an error running crew: {str(exception)}') 
+      show_llm_response_cache_stats(get_llm_response_cache_stats_since(llm_response_cache_stats))
 
-          output = None             
+      show_rate_limiter_stats(get_rate_limiter_stats_since(rate_limiter_stats))
 
-def get_selected_boolean(selected_boolean):
+      show_run_profile(run_profile.get_report())
 
-  if selected_boolean == 'True':
+def show_crew_run_error(error, error_message, log_context = None):
+      
+  if error_message:
 
-    return True
+    dialogs.show_error_dialog(error_message)
+
+    st.session_state.logger.error(f'There wan an error running crew: {error}', extra = log_context)
 
   else:
+      
+    dialogs.show_error_dialog('There wan an error running the crew! Check the log for details')
 
-    return False 
-  
-def get_selected_tools(selected_tools):
+    st.session_state.logger.error(f'There wan an error running crew: {error}', extra = log_context) 
 
-  try:
+def start_crew_job():
 
-    tools = {'Andalem Web Scrape and Search Tool': AndalemWebScrapeAndSearchTool(),
-             'DuckDuckGo Search Tool': DuckDuckGoSearchRun(),
-             'Google Serper Search Tool': SerperDevTool(),
-             'Selenium Scrape Tool': SeleniumScrapingTool(),
-             'User Input Tool': UserInputTool(),
-             'Web Page Scrape Tool': ScrapeWebsiteTool(),
-             'Website Search Tool': WebsiteSearchTool(),
-             'YouTube Transcription Tool': YouTubeTranscriptionTool()}
+  crew_job = crew_job_registry.get(st.session_state['crew_job_id']) if st.session_state['crew_job_id'] else None
 
-    agent_tools = []
+  if crew_job is not None and not crew_job.is_finished():
 
-    if selected_tools:
+    dialogs.show_error_dialog('A crew is already running in the background! Wait for it to finish before running another.')
 
-      for tool in selected_tools:
+    return
 
-        agent_tools.append(tools[tool])
+  crew_model = st.session_state.crew_model
 
-    return agent_tools
-  
-  except Exception as exception:
+  crew_job = crew_job_registry.submit(crew_model.agents_settings, 
+                                      crew_model.tasks_settings, 
+                                      crew_model.crew_settings,
+                                      verbose_output_max_lines)
 
-    dialogs.show_error_dialog('There wan an error loading tool! Check the log for details')
+  st.session_state['crew_job_id'] = crew_job.job_id
 
-    st.session_state.logger.error(f'There wan an error loading tool: {str(exception)}')
+  st.query_params['crew_job'] = crew_job.job_id
 
-def get_selected_llm(selected_llm, selected_temperature, type):
+  st.rerun()
 
-  nvidia_base_url = 'https://integrate.api.nvidia.com/v1'
+@st.experimental_fragment(run_every = 1)
+def show_crew_job_progress(job_id):
 
-  try:
+  crew_job = crew_job_registry.get(job_id)
 
-    llms = {'DBRX 132B': ollama.Ollama(model = 'dbrx', temperature = selected_temperature),
-            'Gemma 7B': ollama.Ollama(model = 'gemma', temperature = selected_temperature),
-            'Llama 3 8B': ollama.Ollama(model = 'llama3', temperature = selected_temperature),
-            'Llama 3 8B Dolphin': ollama.Ollama(model = 'dolphin-llama3', temperature = selected_temperature),
-            'Mistral 7B': ollama.Ollama(model = 'mistral', temperature = selected_temperature),
-            'Mistral 7B Dolphin': ollama.Ollama(model = 'dolphin-mistral', temperature = selected_temperature),
-            'Mixtral 8 X 7B': ollama.Ollama(model = 'mixtral', temperature = selected_temperature),
-            'Mixtral 8 X 7B Dolphin': ollama.Ollama(model = 'dolphin-mixtral', temperature = selected_temperature),
-            'NVIDIA Llama 3 70B Instruct': ChatNVIDIA(model = 'meta/llama3-70b-instruct', temperature = selected_temperature, base_url = nvidia_base_url),
-            'NVIDIA Mistral Large': ChatNVIDIA(model = 'mistralai/mistral-large', temperature = selected_temperature, base_url = nvidia_base_url),
-            'NVIDIA Mixtral 8 X 22B Instruct': ChatNVIDIA(model = 'mistralai/mixtral-8x22b-instruct-v0.1', temperature = selected_temperature, base_url = nvidia_base_url),
-            'NVIDIA Nemotron 4 340B Instruct': ChatNVIDIA(model = 'nvidia/nemotron-4-340b-instruct', temperature = selected_temperature, base_url = nvidia_base_url),
-            'OpenAI GPT 3.5 Turbo': ChatOpenAI(model_name = 'gpt-3.5-turbo', temperature = selected_temperature),
-            'OpenAI GPT 3.5 Turbo 0125': ChatOpenAI(model_name = 'gpt-3.5-turbo-0125', temperature = selected_temperature),
-            'OpenAI GPT 4': ChatOpenAI(model_name = 'gpt-4', temperature = selected_temperature),
-            'OpenAI GPT 4O': ChatOpenAI(model_name = 'gpt-4o', temperature = selected_temperature), 
-            'Openhermes': ollama.Ollama(model = 'openhermes', temperature = selected_temperature),                
-            'Phi 3 Mini 3.8B': ollama.Ollama(model = 'phi3', temperature = selected_temperature),
-            'WizardLM 2 7B': ollama.Ollama(model = 'wizardlm2', temperature = selected_temperature),
-            'Zephyr 7B': ollama.Ollama(model = 'zephyr', temperature = selected_temperature)}
-    
-    if type == 'Agent':
+  if crew_job is None or crew_job.is_finished():
 
-      llm_type = 'agent'
- 
-      agent_llm = llms[selected_llm]
+    st.rerun()
 
-      return agent_llm
-    
-    else:
+  st.info(f'{crew_job.status} crew {crew_job.crew_name} in the background ({crew_job.get_elapsed_seconds():.0f}s). You can keep editing while it runs.')
 
-      llm_type = 'manager'
+  verbose_output = crew_job.read_verbose_output()
 
-      if st.session_state.crew_settings['crew_process'] == 'Sequential' or selected_llm == '' or None:
+  if st.session_state['show_verbose_output_on_ui']:
 
-        return None
+    with st.expander('Work Process', expanded = True):
 
-      else:  
- 
-        manager_llm = llms[selected_llm]
+      st.markdown(verbose_output, unsafe_allow_html = True)
 
-        return manager_llm
-  
-  except Exception as exception:
+@st.experimental_fragment
+def show_crew_job_result(job_id):
 
-    dialogs.show_error_dialog(f'There wan an error loading {llm_type} LLM! Check the log for details')
+  crew_job = crew_job_registry.get(job_id)
 
-    st.session_state.logger.error(f'There wan an error loading {llm_type} LLM: {str(exception)}')
+  # Dismissing the output only reruns this fragment, which is then left empty
 
-def get_max_rpm(max_rpm):
+  if crew_job is None:
 
-  if max_rpm == 0:
+    return
 
-    return None
-  
-  else:
+  verbose_output = crew_job.read_verbose_output()
 
-    return max_rpm
-  
-def get_selected_process(selected_process):
+  if st.session_state['show_verbose_output_on_ui']:
 
-  if selected_process == 'Hierarchical':
+    with st.expander('Work Process', expanded = False):
 
-    return Process.hierarchical
-  
-  else:
+      st.markdown(verbose_output, unsafe_allow_html = True)
+
+  with st.expander('Output', expanded = True):
+
+    st.caption(f'Crew {crew_job.crew_name} {crew_job.status.lower()} in {crew_job.get_elapsed_seconds():.0f}s')
+
+    crew_job_result = crew_job.result
+
+    if crew_job.status == 'Succeeded':
+
+      if crew_job_result['crew_full_output']:
 
-    return Process.sequential
+        for task_description, task_raw_output in crew_job_result['task_outputs']:
+
+          st.markdown(get_final_output(task_description), unsafe_allow_html = True)
+
+          st.markdown(get_final_output(task_raw_output), unsafe_allow_html = True)
+
+      else:
+
+        st.markdown(get_final_output(crew_job_result['output']), unsafe_allow_html = True)
+
+    if crew_job_result.get('llm_response_cache_stats'):
+
+      show_llm_response_cache_stats(crew_job_result['llm_response_cache_stats'])
+
+    if crew_job_result.get('rate_limiter_stats'):
+
+      show_rate_limiter_stats(crew_job_result['rate_limiter_stats'])
+
+    if crew_job_result.get('run_profile'):
+
+      show_run_profile(crew_job_result['run_profile'])
+
+    st.button('Dismiss Output',
+              on_click = dismiss_crew_job,
+              key = 'dismiss_crew_job_button')
+
+  if crew_job.status == 'Failed' and not crew_job.error_reported:
+
+    crew_job.error_reported = True
+
+    # The run happened in a worker process, so its crew name and run ID are added to the record here
+
+    show_crew_run_error(crew_job_result.get('error'),
+                        crew_job_result.get('error_message'),
+                        {'crew_name': crew_job.crew_name, 'run_id': (crew_job_result.get('run_profile') or {}).get('run_id')})
+
+def dismiss_crew_job():
+
+  if st.session_state['crew_job_id']:
+
+    crew_job_registry.remove(st.session_state['crew_job_id'])
+
+  st.session_state['crew_job_id'] = None
+
+  if 'crew_job' in st.query_params:
+
+    del st.query_params['crew_job']
 
 @contextmanager
 def capture_verbose_output(output_function):
 
-  with StringIO() as stdout, StringIO() as stderr, redirect_stdout(stdout), redirect_stderr(stderr):
-        
-    original_stdout_write = stdout.write
+  # Only this thread's output is captured, so crews running in the background keep their own output
 
-    original_stderr_write = stderr.write
-    
-    def redirect_output(string):
-        
-      redirected_output = original_stdout_write(string)
+  crew_jobs.register_output_sink(output_function)
 
-      output_function(string)
+  try:
 
-      return redirected_output
-    
-    def redirect_error_output(string):
-        
-      redirected_output = original_stderr_write(string)
+    yield
 
-      output_function(string)
+  finally:
 
-      return redirected_output
-    
-    stdout.write = redirect_output
+    crew_jobs.unregister_output_sink()
 
-    stderr.write = redirect_error_output
-    
-    yield
+def create_verbose_output_stream():
 
-def display_verbose_output(output):
+  verbose_output_container = st.empty()
 
-  original_output = Ansi2HTMLConverter()
+  script_run_context = get_script_run_ctx()
 
-  converted_output = original_output.convert(output, full = True)
+  # Output is rendered into one element that grows, and pending output is flushed on a timer thread attached to this script run
 
-  st.markdown(converted_output, unsafe_allow_html = True)
+  return VerboseOutputStream(lambda verbose_output: verbose_output_container.markdown(verbose_output, unsafe_allow_html = True),
+                             max_lines = verbose_output_max_lines,
+                             timer_initializer = lambda timer: add_script_run_ctx(timer, script_run_context))
 
-def get_final_output(output):
+def show_llm_response_cache_stats(llm_response_cache_stats):
+
+  if llm_response_cache_stats['hits'] or llm_response_cache_stats['misses']:
+
+    st.caption(f'LLM response cache: {llm_response_cache_stats["hits"]} hits, {llm_response_cache_stats["misses"]} misses')
+
+def show_rate_limiter_stats(rate_limiter_stats):
+
+  if rate_limiter_stats['delayed_requests']:
+
+    st.caption(f'Rate limiter: {rate_limiter_stats["delayed_requests"]} requests queued for {rate_limiter_stats["waited_seconds"]:.1f}s in total')
 
-  original_output = Ansi2HTMLConverter()
+def show_run_profile(run_profile):
+
+  st.caption(f'Run {run_profile["run_id"]}: {run_profile["wall_seconds"]:.1f}s, '
+             f'{sum(agent["llm_calls"] for agent in run_profile["by_agent"])} LLM calls, '
+             f'{sum(agent["tool_calls"] for agent in run_profile["by_agent"])} tool calls')
+
+  # Expanders cannot be nested in the Output expander, so the breakdown opens in a popover
+
+  with st.popover('Run Profile'):
+
+    agents_tab, models_tab, tools_tab, tasks_tab = st.tabs(['Agents', 'Models', 'Tools', 'Tasks'])
+
+    for tab, rows in ((agents_tab, run_profile['by_agent']),
+                      (models_tab, run_profile['by_model']),
+                      (tools_tab, run_profile['by_tool']),
+                      (tasks_tab, run_profile['tasks'])):
+
+      with tab:
+
+        if rows:
+
+          st.dataframe([{field: round(value, 3) if isinstance(value, float) else value for field, value in row.items()} for row in rows],
+                       use_container_width = True,
+                       hide_index = True)
+
+        else:
+
+          st.caption('Nothing recorded')
+
+def get_final_output(output):
 
-  converted_output = original_output.convert(output, full = True)
+  converted_output = render_ansi(output)
 
   return converted_output
 
@@ -1,12 +1,24 @@
+import aiohttp
 import asyncio
 from bs4 import BeautifulSoup
 from crewai_tools import BaseTool
+import custom_tools.html_extraction as html_extraction
+import json
+import os
+import random
 import re
 import requests
 import streamlit as st
+import textwrap
+import threading
+import time
 from typing import List
+from utilities.async_io_runner import get_async_io_runner
+from utilities.http_cache import HostRequestLimiter, get_http_cache
+import utilities.metrics as metrics
+from utilities.sqlite_store import SQLiteStore
 from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled, YouTubeTranscriptApi 
-from youtube_transcript_api._errors import VideoUnavailable
+from youtube_transcript_api._errors import VideoUnavailable, YouTubeRequestFailed
 
 class AndalemWebScrapeAndSearchTool(BaseTool): 
  
@@ -14,16 +26,27 @@ class AndalemWebScrapeAndSearchTool(BaseTool):
  
     description: str = """ 
     This tool is used to scrape web pages and perform web searches. 
-    The input should be a URL string for scraping or a search query string. 
+    The input should be a URL string for scraping, a list of URL strings to scrape together or a search query string. 
     :param url: str, URL to scrape. 
     :param query: str, search query to perform a web search. 
+    :param urls: list of str, URLs to scrape in one call. The status, latency and text of each URL is returned. 
     """ 
  
-    async def _run(self, url: str = None, query: str = None) -> str: 
+    def _run(self, url: str = None, query: str = None, urls: List[str] = None) -> str: 
+
+        # Agents call tools synchronously, so the call waits for the coroutine on the shared event loop
+
+        return get_async_io_runner().run(self._arun(url, query, urls))
+
+    async def _arun(self, url: str = None, query: str = None, urls: List[str] = None) -> str: 
 
         try: 
 
-            if url: 
+            if urls: 
+
+                return await self.scrape_websites(urls) 
+
+            elif url: 
 
                 content = await self.scrape_website(url) 
 
@@ -41,23 +64,70 @@ class AndalemWebScrapeAndSearchTool(BaseTool):
             
         except Exception as exception: 
 
+            metrics.tool_errors.inc(tool = self.name, operation = 'run')
+
             return f'An error occurred: {exception}' 
  
     async def scrape_website(self, url: str) -> str: 
 
         try: 
 
-            response = requests.get(url) 
-
-            response.raise_for_status() 
-            
-            soup = BeautifulSoup(response.content, 'html.parser') 
-
-            return soup.get_text(separator = '\n') 
+            return await get_http_cache().get(url, self.get_page_text, namespace = 'page_text') 
         
-        except requests.RequestException as exception: 
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exception: 
+
+            metrics.tool_errors.inc(tool = self.name, operation = 'scrape')
 
             return f'Failed to scrape the website: {exception}' 
+
+    async def scrape_websites(self, urls: List[str]) -> str: 
+
+        """
+        This function scrapes several websites concurrently.
+        At most Web_Scrape_Max_Parallel URLs are fetched at a time, and requests to the same host are limited
+        to Web_Scrape_Requests_Per_Host at a time, started at least Web_Scrape_Host_Delay seconds apart.
+        Args:
+            urls: The URLs to scrape, as a list or a string separated by commas or whitespace.
+        Returns:
+            The URL, status, latency and text of every website, in the order given.
+        """
+
+        if isinstance(urls, str):
+
+            urls = re.split(r'[\s,]+', urls)
+
+        urls = list(dict.fromkeys(url for url in urls if url))
+
+        parallel_limit = asyncio.Semaphore(int(os.getenv('Web_Scrape_Max_Parallel', '8')))
+
+        host_request_limiter = HostRequestLimiter(requests_per_host = int(os.getenv('Web_Scrape_Requests_Per_Host', '2')),
+                                                  host_delay = float(os.getenv('Web_Scrape_Host_Delay', '0.5')))
+
+        async def scrape_website_result(url):
+
+            async with parallel_limit:
+
+                started_at = time.perf_counter()
+
+                try:
+
+                    text = await get_http_cache().get(url, self.get_page_text, namespace = 'page_text', host_request_limiter = host_request_limiter)
+
+                    status = 'Succeeded'
+
+                except (aiohttp.ClientError, asyncio.TimeoutError) as exception:
+
+                    metrics.tool_errors.inc(tool = self.name, operation = 'scrape')
+
+                    text = ''
+
+                    status = f'Failed ({exception or type(exception).__name__})'
+
+                return f'URL: {url}\nStatus: {status}\nLatency: {time.perf_counter() - started_at:.2f}s\n\n{text}'
+
+        results = await asyncio.gather(*[scrape_website_result(url) for url in urls])
+
+        return '\n\n----------\n\n'.join(results)
  
     async def perform_web_search(self, query: str) -> List[str]: 
 
@@ -67,23 +137,29 @@ class AndalemWebScrapeAndSearchTool(BaseTool):
  
         try: 
 
-            response = requests.get(search_url, headers = headers) 
+            return await get_http_cache().get(search_url, self.get_search_results, namespace = 'search_results', headers = headers) 
+        
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exception: 
+
+            metrics.tool_errors.inc(tool = self.name, operation = 'search')
 
-            response.raise_for_status() 
+            return f'Failed to perform web search: {exception}'
 
-            soup = BeautifulSoup(response.content, 'html.parser') 
+    def get_page_text(self, content: bytes) -> str:
 
-            results = []
+        return html_extraction.extract_text(content) 
 
-            for content in soup.find_all('div', 'h1', 'h2', 'h3', class_ = 'article'): 
+    def get_search_results(self, content: bytes) -> List[str]:
 
-                results.append(content.get_text()) 
+        soup = BeautifulSoup(content, 'html.parser') 
 
-            return results 
-        
-        except requests.RequestException as exception: 
+        results = []
 
-            return f'Failed to perform web search: {exception}'
+        for content in soup.find_all('div', 'h1', 'h2', 'h3', class_ = 'article'): 
+
+            results.append(content.get_text()) 
+
+        return results 
 
 class UserInputTool(BaseTool):
 
@@ -114,91 +190,250 @@ class UserInputTool(BaseTool):
 
                 return user_input        
             
+youtube_video_id_pattern = re.compile(r'(?:v=|be/|/watch\?v=|\?feature=youtu.be/|/embed/)([\w-]+)')
+
+youtube_bare_video_id_pattern = re.compile(r'^[\w-]{11}$')
+
+# A rough number of characters per token that avoids loading a tokenizer for every model
+
+characters_per_token = 4
+
 class YouTubeTranscriptionTool(BaseTool):
 
     name: str = "YouTube Transcription Tool"
 
     description: str = """
     This tool is used to get transcripts from the given URL.
-    The input should be a YouTube URL string.
+    The input should be a YouTube URL string, or a list of YouTube URLs or video IDs to transcribe together.
     :param youtube_url: str, YouTube URL to retrieve transcripts from.
+    :param language: str, optional language code of the transcript, 'en' by default.
+    :param youtube_urls: list of str, YouTube URLs or video IDs to retrieve transcripts from in one call.
+    :param max_tokens: int, optional number of tokens after which each transcript is split into parts.
+    :param part: int, optional part of each transcript to return when it is split, 1 by default.
     """
 
-    async def _run(self, youtube_url: str) -> str:
+    def _run(self, youtube_url: str = None, language: str = 'en', youtube_urls: List[str] = None, max_tokens: int = None, part: int = 1) -> str:
 
-        try:
+        return get_async_io_runner().run(self._arun(youtube_url, language, youtube_urls, max_tokens, part))
 
-            video_id = self.get_youtube_video_id(youtube_url)
+    async def _arun(self, youtube_url: str = None, language: str = 'en', youtube_urls: List[str] = None, max_tokens: int = None, part: int = 1) -> str:
 
-            if not video_id:
+        max_tokens = max_tokens or int(os.getenv('YouTube_Transcript_Max_Tokens', '0'))
 
-                return 'Invalid YouTube URL'
+        if youtube_urls:
 
-            transcript = await self.get_transcript_with_retries(video_id)
+            return await self.transcribe_videos(youtube_urls, language or 'en', max_tokens, part or 1)
 
-            combined_transcript = ' '.join([item.get('text', '') for item in transcript])
+        elif youtube_url:
+
+            _, status, transcript_text = await self.transcribe_video(youtube_url, language or 'en', max_tokens, part or 1)
+
+            return transcript_text if status == 'Succeeded' else status
+
+        else:
+
+            return 'Invalid input: Either a YouTube URL or a list of YouTube URLs must be provided.'
+
+    async def transcribe_video(self, youtube_url: str, language: str, max_tokens: int, part: int) -> tuple:
+
+        """
+        This function transcribes one video.
+        Returns:
+            A tuple of the video ID, the status and the requested part of the transcript.
+        """
+
+        video_id = self.get_youtube_video_id(youtube_url)
+
+        if not video_id:
+
+            return None, 'Invalid YouTube URL', ''
+
+        try:
+
+            transcript = await self.get_transcript(video_id, language)
 
-            return combined_transcript
-        
         except (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable) as exception:
 
-            return f'No transcripts available: {exception}'
+            return video_id, f'No transcripts available: {exception}', ''
         
         except Exception as exception:
 
-            return f'An error occurred while fetching the transcript: {exception}'
+            metrics.tool_errors.inc(tool = self.name, operation = 'transcribe')
+
+            return video_id, f'An error occurred while fetching the transcript: {exception}', ''
+
+        combined_transcript = ' '.join([item.get('text', '') for item in transcript])
+
+        return video_id, 'Succeeded', self.get_transcript_part(combined_transcript, max_tokens, part)
+
+    async def transcribe_videos(self, youtube_urls: List[str], language: str, max_tokens: int, part: int) -> str:
+
+        """
+        This function transcribes several videos concurrently, at most YouTube_Transcript_Max_Parallel at a time.
+        Args:
+            youtube_urls: The YouTube URLs or video IDs, as a list or a string separated by commas or whitespace.
+            language: The language code of the transcripts.
+            max_tokens: The number of tokens after which each transcript is split into parts, or 0 to return whole transcripts.
+            part: The part of each transcript to return.
+        Returns:
+            The video ID, status and transcript of every video, in the order given.
+        """
+
+        if isinstance(youtube_urls, str):
+
+            youtube_urls = re.split(r'[\s,]+', youtube_urls)
+
+        youtube_urls = list(dict.fromkeys(youtube_url for youtube_url in youtube_urls if youtube_url))
+
+        parallel_limit = asyncio.Semaphore(int(os.getenv('YouTube_Transcript_Max_Parallel', '8')))
+
+        async def transcribe_video_result(youtube_url):
+
+            async with parallel_limit:
+
+                video_id, status, transcript_text = await self.transcribe_video(youtube_url, language, max_tokens, part)
+
+            return f'Video: {video_id or youtube_url}\nStatus: {status}\n\n{transcript_text}'.rstrip()
+
+        results = await asyncio.gather(*[transcribe_video_result(youtube_url) for youtube_url in youtube_urls])
+
+        return '\n\n----------\n\n'.join(results)
+
+    def get_transcript_part(self, transcript_text: str, max_tokens: int, part: int) -> str:
+
+        """
+        This function splits a transcript into parts of about max_tokens tokens at word boundaries and returns one of them,
+        headed by its position so the agent can ask for the next part.
+        """
+
+        if not max_tokens or len(transcript_text) <= max_tokens * characters_per_token:
+
+            return transcript_text
+
+        transcript_parts = textwrap.wrap(transcript_text, width = max_tokens * characters_per_token)
+
+        if part > len(transcript_parts):
+
+            return f'[The transcript only has {len(transcript_parts)} parts]'
+
+        if part < len(transcript_parts):
+
+            return f'[Part {part} of {len(transcript_parts)}. Ask for part {part + 1} to continue.]\n{transcript_parts[part - 1]}'
+
+        return f'[Part {part} of {len(transcript_parts)}]\n{transcript_parts[part - 1]}'
 
     def get_youtube_video_id(self, url: str) -> str:
 
         """
         This function extracts the video ID from a YouTube URL.
         Args:
-            url: The YouTube URL as a string.
+            url: The YouTube URL, or a video ID, as a string.
         Returns:
             The extracted video ID as a string, or None if the URL is invalid.
         """
 
-        pattern = r'(?:v=|be/|/watch\?v=|\?feature=youtu.be/|/embed/)([\w-]+)'
+        url = url.strip()
 
-        match = re.search(pattern, url)
+        match = youtube_video_id_pattern.search(url)
 
         if match:
 
             return match.group(1)
         
+        elif youtube_bare_video_id_pattern.match(url):
+
+            return url
+
         else:
 
             return None
 
-    async def get_transcript_with_retries(self, video_id: str, max_retries: int = 10) -> list:
+    async def get_transcript(self, video_id: str, language: str) -> list:
 
         """
-        This function fetches the transcript with retries and exponential backoff.
+        This function returns the transcript of a video in a language, from the transcript cache when possible.
         Args:
             video_id: The YouTube video ID.
+            language: The language code of the transcript.
+        Returns:
+            The transcript as a list of dictionaries.
+        """
+
+        async_io_runner = get_async_io_runner()
+
+        transcript_store = get_transcript_store()
+
+        key = f'{video_id}:{language}'
+
+        cached_transcript = await async_io_runner.run_blocking(transcript_store.get, key)
+
+        if cached_transcript is not None:
+
+            return json.loads(cached_transcript)
+
+        transcript = await self.get_transcript_with_retries(video_id, language)
+
+        await async_io_runner.run_blocking(transcript_store.set, key, json.dumps(transcript))
+
+        return transcript
+
+    async def get_transcript_with_retries(self, video_id: str, language: str, max_retries: int = 4, max_backoff: float = 8, deadline: float = 30) -> list:
+
+        """
+        This function fetches the transcript off the event loop, retrying transient errors with capped, jittered exponential backoff.
+        Errors such as disabled or missing transcripts are raised straight away.
+        Args:
+            video_id: The YouTube video ID.
+            language: The language code of the transcript.
             max_retries: Maximum number of retries.
+            max_backoff: Maximum number of seconds to wait before a retry.
+            deadline: Number of seconds after which no further retry is started.
         Returns:
             The transcript as a list of dictionaries.
         """
 
         retries = 0
 
-        backoff = 1
+        give_up_at = time.monotonic() + deadline
 
-        while retries < max_retries:
+        while True:
 
             try:
 
-                return YouTubeTranscriptApi.get_transcript(video_id)
+                return await get_async_io_runner().run_blocking(YouTubeTranscriptApi.get_transcript, video_id, (language,))
             
-            except Exception as exception:
+            except (YouTubeRequestFailed, requests.ConnectionError, requests.Timeout):
+
+                backoff = random.uniform(0, min(max_backoff, 2 ** retries))
 
                 retries += 1
 
-                if retries == max_retries:
+                if retries > max_retries or time.monotonic() + backoff > give_up_at:
 
-                    raise exception
+                    raise
                 
                 await asyncio.sleep(backoff)
 
-                backoff *= 2           
\ No newline at end of file
+transcript_store = None
+
+transcript_store_lock = threading.Lock()
+
+def get_transcript_store() -> SQLiteStore:
+
+    """
+    This function returns the process-wide YouTube transcript store, configured from the YouTube_Transcript_Cache_TTL (seconds)
+    environment variable when it is first used.
+    """
+
+    global transcript_store
+
+    with transcript_store_lock:
+
+        if transcript_store is None:
+
+            transcript_store = SQLiteStore('./cache/youtube_transcripts.sqlite',
+                                           table_name = 'transcripts',
+                                           max_entries = 2000,
+                                           ttl = float(os.getenv('YouTube_Transcript_Cache_TTL', str(30 * 24 * 60 * 60))))
+
+        return transcript_store           
\ No newline at end of file
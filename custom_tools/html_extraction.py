@@ -0,0 +1,121 @@
+from bs4 import BeautifulSoup
+import itertools
+import os
+import re
+
+try:
+
+    import lxml.html
+
+except ImportError:
+
+    lxml = None
+
+# Elements that hold code, layout or page furniture rather than the content of the page
+
+boilerplate_tags = ('script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe', 'nav', 'aside')
+
+# Headers and footers are page furniture at the top level of a page, but inside an article or a section they hold its title, byline or notes
+
+page_furniture_tags = ('header', 'footer')
+
+content_tags = ('article', 'main', 'section')
+
+block_tags = ('p', 'div', 'section', 'article', 'main', 'br', 'li', 'dt', 'dd', 'tr', 'td', 'th', 'table', 'ul', 'ol', 'pre', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'title')
+
+whitespace_pattern = re.compile(r'\s+')
+
+def clean_lines(text: str) -> str:
+
+    """
+    This function collapses the whitespace of every line and drops empty lines and lines that repeat the line before them, such as repeated link texts or disclaimers.
+    Lines repeated further apart, such as the rows of a table, are kept.
+    """
+
+    lines = (whitespace_pattern.sub(' ', line).strip() for line in text.splitlines())
+
+    return '\n'.join(line for line, _ in itertools.groupby(line for line in lines if line))
+
+def extract_text_with_lxml(content: bytes) -> str:
+
+    try:
+
+        document = lxml.html.document_fromstring(content)
+
+    except lxml.etree.ParserError:
+
+        return ''
+
+    for element in list(document.iter(*boilerplate_tags)):
+
+        element.drop_tree()
+
+    for element in list(document.iter(*page_furniture_tags)):
+
+        if not any(ancestor.tag in content_tags for ancestor in element.iterancestors()):
+
+            element.drop_tree()
+
+    # The text of adjacent elements is joined without a separator, so block elements are put on lines of their own
+
+    for element in document.iter(*block_tags):
+
+        element.text = '\n' + (element.text or '')
+
+        element.tail = '\n' + (element.tail or '')
+
+    return clean_lines(document.text_content())
+
+def extract_text_with_beautifulsoup(content: bytes) -> str:
+
+    soup = BeautifulSoup(content, 'html.parser')
+
+    for element in soup.find_all(boilerplate_tags):
+
+        element.decompose()
+
+    for element in soup.find_all(page_furniture_tags):
+
+        # Elements inside an element that was already removed are removed with it
+
+        if not element.decomposed and element.find_parent(content_tags) is None:
+
+            element.decompose()
+
+    # Inserting line breaks around block elements doubles the time html.parser takes, so every text node is put on its own line instead
+
+    return clean_lines(soup.get_text(separator = '\n'))
+
+html_extractors = {'lxml': extract_text_with_lxml,
+                   'beautifulsoup': extract_text_with_beautifulsoup}
+
+def get_html_extractor(name: str = None):
+
+    """
+    This function returns the named extraction function, or the one set by HTML_Extraction_Backend.
+    lxml is used by default when it is installed, as it parses pages several times faster than html.parser.
+    """
+
+    name = name or os.getenv('HTML_Extraction_Backend') or ('lxml' if lxml is not None else 'beautifulsoup')
+
+    if name == 'lxml' and lxml is None:
+
+        raise RuntimeError('The lxml HTML extraction backend requires the lxml package')
+
+    return html_extractors[name]
+
+def extract_text(content: bytes) -> str:
+
+    """
+    This function extracts the readable text of an HTML page.
+    Args:
+        content: The HTML page as bytes.
+    Returns:
+        The text of the page without scripts, styles and navigation, with one block of text per line.
+    """
+
+    if not content.strip():
+
+        return ''
+
+    return get_html_extractor()(content)
@@ -0,0 +1,93 @@
+from crewai_tools import ScrapeWebsiteTool, SeleniumScrapingTool, SerperDevTool, WebsiteSearchTool
+from custom_tools.custom_tools import AndalemWebScrapeAndSearchTool, UserInputTool, YouTubeTranscriptionTool
+from langchain_community.tools import DuckDuckGoSearchRun
+import threading
+from typing import List
+import utilities.metrics as metrics
+import utilities.run_profiler as run_profiler
+
+class ToolFactory:
+
+    """
+    A process-wide factory that builds tools only when an agent selects them.
+    Shared tools hold no per-run state and are built once for every agent, crew run and session.
+    Run tools hold state (a browser, a RAG store or the session's UI containers) and are built once per crew run.
+    """
+
+    shared_scope = 'shared'
+
+    run_scope = 'run'
+
+    tool_catalogue = {'Andalem Web Scrape and Search Tool': (AndalemWebScrapeAndSearchTool, shared_scope),
+                      'DuckDuckGo Search Tool': (DuckDuckGoSearchRun, shared_scope),
+                      'Google Serper Search Tool': (SerperDevTool, shared_scope),
+                      'Selenium Scrape Tool': (SeleniumScrapingTool, run_scope),
+                      'User Input Tool': (UserInputTool, run_scope),
+                      'Web Page Scrape Tool': (ScrapeWebsiteTool, shared_scope),
+                      'Website Search Tool': (WebsiteSearchTool, run_scope),
+                      'YouTube Transcription Tool': (YouTubeTranscriptionTool, shared_scope)}
+
+    def __init__(self):
+
+        self.shared_tools = {}
+
+        self.lock = threading.Lock()
+
+    def new_run_scope(self) -> 'ToolRunScope':
+
+        return ToolRunScope(self)
+
+    def get_shared_tool(self, tool_name: str):
+
+        with self.lock:
+
+            if tool_name not in self.shared_tools:
+
+                self.shared_tools[tool_name] = self.build_tool(tool_name)
+
+            return self.shared_tools[tool_name]
+
+    def build_tool(self, tool_name: str):
+
+        tool_class, _ = self.tool_catalogue[tool_name]
+
+        tool = tool_class()
+
+        # Tools are pydantic models, so the wrapper is set on the instance without validation.
+        # Calls are counted in the metrics and timed in the profile of the run in progress
+
+        object.__setattr__(tool, '_run', metrics.count_tool_run(tool_name, run_profiler.profile_tool_run(tool_name, tool._run)))
+
+        return tool
+
+class ToolRunScope:
+
+    """
+    The tools of a single crew run. Run tools are built on first selection and shared by the agents of that run only.
+    """
+
+    def __init__(self, tool_factory: ToolFactory):
+
+        self.tool_factory = tool_factory
+
+        self.run_tools = {}
+
+    def get_tool(self, tool_name: str):
+
+        _, tool_scope = self.tool_factory.tool_catalogue[tool_name]
+
+        if tool_scope == ToolFactory.shared_scope:
+
+            return self.tool_factory.get_shared_tool(tool_name)
+
+        if tool_name not in self.run_tools:
+
+            self.run_tools[tool_name] = self.tool_factory.build_tool(tool_name)
+
+        return self.run_tools[tool_name]
+
+    def get_tools(self, selected_tools: List[str]) -> list:
+
+        return [self.get_tool(tool_name) for tool_name in selected_tools]
+
+tool_factory = ToolFactory()
@@ -0,0 +1,194 @@
+import argparse
+import json
+import re
+import sys
+import time
+import urllib.request
+
+sample_pattern = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(.*)\})?\s+(\S+)$')
+
+label_pattern = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+unescape_pattern = re.compile(r'\\(.)')
+
+def read_metrics(source, timeout = 10):
+
+    """
+    This function reads metrics in the Prometheus text format from a URL or a file.
+    """
+
+    if source.startswith(('http://', 'https://')):
+
+        with urllib.request.urlopen(source, timeout = timeout) as response:
+
+            return response.read().decode('utf-8')
+
+    with open(source, 'r') as metrics_file:
+
+        return metrics_file.read()
+
+def parse_metrics(metrics_text):
+
+    """
+    This function parses metrics in the Prometheus text format.
+    Returns:
+        A tuple of a dictionary of metric names to their type, and a list of (sample name, labels, value) samples.
+    Raises:
+        ValueError: If a line is not valid.
+    """
+
+    metric_types = {}
+
+    samples = []
+
+    for line_number, line in enumerate(metrics_text.splitlines(), start = 1):
+
+        if not line.strip() or line.startswith('# HELP'):
+
+            continue
+
+        if line.startswith('# TYPE'):
+
+            _, _, name, metric_type = line.split(maxsplit = 3)
+
+            metric_types[name] = metric_type
+
+            continue
+
+        if line.startswith('#'):
+
+            continue
+
+        sample_match = sample_pattern.match(line)
+
+        if sample_match is None:
+
+            raise ValueError(f'Line {line_number} is not a valid sample: {line}')
+
+        labels = {name: unescape_pattern.sub(lambda match: '\n' if match.group(1) == 'n' else match.group(1), value) for name, value in label_pattern.findall(sample_match.group(3) or '')}
+
+        samples.append((sample_match.group(1), labels, float(sample_match.group(4))))
+
+    return metric_types, samples
+
+def get_sample_key(sample_name, labels):
+
+    return sample_name + ('{' + ','.join(f'{name}="{value}"' for name, value in sorted(labels.items())) + '}' if labels else '')
+
+def check_histograms(metric_types, samples):
+
+    """
+    This function checks that the buckets of every histogram are cumulative and end with the count of observations.
+    Returns:
+        A list of the problems found.
+    """
+
+    problems = []
+
+    histograms = {}
+
+    for sample_name, labels, value in samples:
+
+        for suffix in ('_bucket', '_count'):
+
+            metric_name = sample_name.removesuffix(suffix)
+
+            if sample_name.endswith(suffix) and metric_types.get(metric_name) == 'histogram':
+
+                series_key = get_sample_key(metric_name, {name: label_value for name, label_value in labels.items() if name != 'le'})
+
+                histogram = histograms.setdefault(series_key, {'buckets': [], 'count': None})
+
+                if suffix == '_bucket':
+
+                    histogram['buckets'].append((float(labels['le']), value))
+
+                else:
+
+                    histogram['count'] = value
+
+    for series_key, histogram in histograms.items():
+
+        bucket_counts = [bucket_count for _, bucket_count in sorted(histogram['buckets'])]
+
+        if any(later < earlier for earlier, later in zip(bucket_counts, bucket_counts[1:])):
+
+            problems.append(f'{series_key}: the buckets are not cumulative')
+
+        if bucket_counts and bucket_counts[-1] != histogram['count']:
+
+            problems.append(f'{series_key}: the +Inf bucket does not match the count')
+
+    return problems
+
+def main(arguments = None):
+
+    argument_parser = argparse.ArgumentParser(description = 'Scrape and check the metrics of the platform, served on Metrics_Port or written to Metrics_File.')
+
+    argument_parser.add_argument('source', nargs = '?', default = 'http://127.0.0.1:9464/metrics', help = 'The metrics URL or file.')
+
+    argument_parser.add_argument('--interval', type = float, default = 0, help = 'Seconds between scrapes. Counters are then shown as rates per second.')
+
+    argument_parser.add_argument('--count', type = int, default = 1, help = 'The number of scrapes.')
+
+    argument_parser.add_argument('--filter', default = '', help = 'Only show samples whose name contains this text.')
+
+    argument_parser.add_argument('--json', action = 'store_true', help = 'Print the samples as JSON lines.')
+
+    arguments = argument_parser.parse_args(arguments)
+
+    previous_values = {}
+
+    previous_scraped_at = None
+
+    for scrape_number in range(arguments.count):
+
+        if scrape_number:
+
+            time.sleep(arguments.interval)
+
+        scraped_at = time.time()
+
+        metric_types, samples = parse_metrics(read_metrics(arguments.source))
+
+        problems = check_histograms(metric_types, samples)
+
+        for problem in problems:
+
+            print(f'Invalid histogram {problem}', file = sys.stderr)
+
+        for sample_name, labels, value in samples:
+
+            if arguments.filter not in sample_name:
+
+                continue
+
+            sample_key = get_sample_key(sample_name, labels)
+
+            rate = None
+
+            if previous_scraped_at is not None and sample_key in previous_values and metric_types.get(sample_name) != 'gauge':
+
+                rate = (value - previous_values[sample_key]) / (scraped_at - previous_scraped_at)
+
+            if arguments.json:
+
+                print(json.dumps({'scraped_at': scraped_at, 'name': sample_name, 'labels': labels, 'value': value, 'rate': rate}))
+
+            else:
+
+                print(f'{sample_key} {value:g}' + (f' ({rate:+.3g}/s)' if rate else ''))
+
+            previous_values[sample_key] = value
+
+        previous_scraped_at = scraped_at
+
+        if not arguments.json and scrape_number < arguments.count - 1:
+
+            print()
+
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+
+    sys.exit(main())
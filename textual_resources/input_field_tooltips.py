@@ -11,7 +11,8 @@ class InputFieldTooltips:
                      'agent_llm_temperature': 'The agent Large Language Model\'s configuration to determine whether the output is more random and creative or more predictable', 
                      'agent_max_rpm': 'The maximum number of requests per minute the agent can perform. \'0\' means no limit',
                      'agent_max_iter': 'The maximum number of iterations the agent can perform before giving its best answer',
-                     'agent_memory': 'The configuration for storing execution memories (Entity, Long-Term and Short-Term memory)'}
+                     'agent_memory': 'The configuration for storing execution memories (Entity, Long-Term and Short-Term memory)',
+                     'agent_llm_cache': 'The configuration to reuse stored responses to identical prompts. \'Auto\' only reuses responses when the temperature is 0'}
    
    task_tooltips = {'task_human_input': 'The configuration to indicate if the task requires human feedback at the end',
                     'task_description': 'A clear and concise statement of what the specific task entails',
@@ -23,6 +24,7 @@ class InputFieldTooltips:
                     'crew_max_rpm': 'The maximum number of requests per minute the crew can perform. \'0\' means no limit',
                     'crew_memory': 'The configuration for storing execution memories (Entity, Long-Term and Short-Term memory)',
                     'crew_full_output': 'The configuration to set whether the crew should return the full output of all tasks or just the final output',
+                    'crew_llm_cache': 'The configuration to allow the agents to reuse stored Large Language Model responses to identical prompts',
                     'crew_process': 'The process flow (Hierarchical or Sequential) the crew follows',
                     'crew_manager_llm': 'The Large Language Model used by the manager agent in a hierarchical process (Only required when using a hierarchical process)',
                     'crew_manager_llm_temperature': 'The manager Large Language Model\'s configuration to determine whether the output is more random and creative or more predictable (Only required when using a hierarchical process)'}
\ No newline at end of file
@@ -12,4 +12,15 @@ class OpenAIExceptions:
                       openai.PermissionDeniedError: 'Permission denied error! Check the log for details',
                       openai.RateLimitError: 'Rate limit error! Check the log for details',
                       openai.UnprocessableEntityError: 'Unable to process request error! Check the log for details',
-                      openai.APIError: 'API error! Check the log for details'}    
\ No newline at end of file
+                      openai.APIError: 'API error! Check the log for details'}
+
+    @classmethod
+    def get_error_message(cls, exception):
+
+        for error_type, message in cls.error_messages.items():
+
+            if isinstance(exception, error_type):
+
+                return message
+
+        return None
\ No newline at end of file
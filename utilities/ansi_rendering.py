@@ -0,0 +1,77 @@
+from ansi2html import Ansi2HTMLConverter
+import html
+import re
+import threading
+
+converter = Ansi2HTMLConverter()
+
+converter_lock = threading.Lock()
+
+# The 256 color palette makes up over 90% of the stylesheet and is not used by crew output, so only the basic styles are kept
+
+ansi_stylesheet = '\n'.join([line for line in converter.produce_headers().splitlines() if not re.match(r'\.(ansi|inv)(38|48)-', line)])
+
+ansi_style_pattern = re.compile(r'\x1b\[([0-9;]*)m')
+
+def has_ansi_escapes(text):
+
+    return '\x1b' in text
+
+def convert_ansi(text):
+
+    """
+    This function converts text to inline HTML spans, skipping the conversion when the text has no ANSI escape codes.
+    The spans rely on ansi_stylesheet being on the page.
+    Args:
+        text: The text to convert.
+    Returns:
+        The converted text as HTML without a document or stylesheet.
+    """
+
+    if not has_ansi_escapes(text):
+
+        return html.escape(text, quote = False)
+
+    with converter_lock:
+
+        return converter.convert(text, full = False)
+
+def get_open_ansi_style(text, open_style = ''):
+
+    """
+    This function returns the ANSI style escape codes still in effect at the end of text.
+    Prefixing them to the next piece of text lets it be converted on its own without losing a color started earlier.
+    Args:
+        text: The text whose escape codes are applied.
+        open_style: The escape codes in effect before text.
+    Returns:
+        The escape codes in effect after text, or an empty string when every style was reset.
+    """
+
+    for match in ansi_style_pattern.finditer(text):
+
+        codes = match.group(1).split(';')
+
+        reset_indices = [index for index, code in enumerate(codes) if code in ('', '0')]
+
+        if reset_indices:
+
+            open_style = ''
+
+            codes = codes[reset_indices[-1] + 1:]
+
+        if codes:
+
+            open_style += '\x1b[' + ';'.join(codes) + 'm'
+
+    # Styles that are never reset would otherwise pile up, so only the latest escape codes are kept
+
+    while len(open_style) > 256:
+
+        open_style = open_style[open_style.index('\x1b', 1):]
+
+    return open_style
+
+def render_ansi(text):
+
+    return '<pre class="ansi2html-content">' + convert_ansi(str(text)) + '</pre>'
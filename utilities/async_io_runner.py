@@ -0,0 +1,127 @@
+import aiohttp
+import asyncio
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+class AsyncIORunner:
+
+    """
+    Runs coroutines on one event loop in a background thread, so synchronous callers such as tools run by agents
+    can share a pooled HTTP client and their I/O overlaps.
+    Blocking third-party calls are moved off the loop onto a bounded thread pool.
+    """
+
+    def __init__(self, connection_limit: int = 100, connection_limit_per_host: int = 8, connect_timeout: float = 10, read_timeout: float = 30, blocking_workers: int = 16):
+
+        self.connection_limit = connection_limit
+
+        self.connection_limit_per_host = connection_limit_per_host
+
+        self.connect_timeout = connect_timeout
+
+        self.read_timeout = read_timeout
+
+        self.executor = ThreadPoolExecutor(max_workers = blocking_workers, thread_name_prefix = 'async-io-blocking')
+
+        self.loop = asyncio.new_event_loop()
+
+        self.loop.set_default_executor(self.executor)
+
+        self.thread = threading.Thread(target = self.loop.run_forever, name = 'async-io-runner', daemon = True)
+
+        self.thread.start()
+
+        self.session = None
+
+    def run(self, coroutine, timeout: float = None):
+
+        """
+        This function runs a coroutine on the event loop and waits for its result.
+        Args:
+            coroutine: The coroutine to run.
+            timeout: The optional number of seconds to wait for the result.
+        Returns:
+            The result of the coroutine.
+        """
+
+        if threading.current_thread() is self.thread:
+
+            coroutine.close()
+
+            raise RuntimeError('AsyncIORunner.run cannot be called from a coroutine running on its own event loop')
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    async def run_blocking(self, function, *args):
+
+        return await self.loop.run_in_executor(self.executor, function, *args)
+
+    def get_session(self) -> aiohttp.ClientSession:
+
+        # The session must be created on the loop it is used from, so this is only called by coroutines run by this runner
+
+        if self.session is None or self.session.closed:
+
+            connector = aiohttp.TCPConnector(limit = self.connection_limit,
+                                             limit_per_host = self.connection_limit_per_host,
+                                             ttl_dns_cache = 300)
+
+            timeout = aiohttp.ClientTimeout(sock_connect = self.connect_timeout,
+                                            sock_read = self.read_timeout)
+
+            self.session = aiohttp.ClientSession(connector = connector, timeout = timeout)
+
+        return self.session
+
+    async def close_session(self):
+
+        if self.session is not None and not self.session.closed:
+
+            await self.session.close()
+
+    def close(self):
+
+        if self.loop.is_running():
+
+            try:
+
+                self.run(self.close_session(), timeout = 5)
+
+            except Exception:
+
+                pass
+
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+            self.thread.join(timeout = 5)
+
+        self.executor.shutdown(wait = False)
+
+async_io_runner = None
+
+async_io_runner_lock = threading.Lock()
+
+def get_async_io_runner() -> AsyncIORunner:
+
+    """
+    This function returns the process-wide runner, configured from the Async_HTTP_Connection_Limit, Async_HTTP_Connection_Limit_Per_Host,
+    Async_HTTP_Connect_Timeout, Async_HTTP_Read_Timeout (seconds) and Async_IO_Blocking_Workers environment variables when it is first used.
+    """
+
+    global async_io_runner
+
+    with async_io_runner_lock:
+
+        if async_io_runner is None:
+
+            async_io_runner = AsyncIORunner(connection_limit = int(os.getenv('Async_HTTP_Connection_Limit', '100')),
+                                            connection_limit_per_host = int(os.getenv('Async_HTTP_Connection_Limit_Per_Host', '8')),
+                                            connect_timeout = float(os.getenv('Async_HTTP_Connect_Timeout', '10')),
+                                            read_timeout = float(os.getenv('Async_HTTP_Read_Timeout', '30')),
+                                            blocking_workers = int(os.getenv('Async_IO_Blocking_Workers', '16')))
+
+            atexit.register(async_io_runner.close)
+
+        return async_io_runner
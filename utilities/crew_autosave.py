@@ -0,0 +1,352 @@
+import atexit
+from collections import Counter
+import copy
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from utilities.crew_catalogue import get_crew_catalogue
+import utilities.crew_file as crew_file_format
+import utilities.log_pipeline as log_pipeline
+import weakref
+
+crew_autosavers = weakref.WeakSet()
+
+crew_file_locks = {}
+
+crew_file_locks_lock = threading.Lock()
+
+def get_fingerprints(agents_settings, tasks_settings, crew_settings):
+
+    """
+    This function returns a digest of each agent, task and the crew settings, keyed by what they are,
+    plus the order of the agents and tasks, so the parts of a crew that changed can be found without keeping a copy of it.
+    """
+
+    fingerprints = {('crew',): get_digest(crew_settings),
+                    ('order',): get_digest([[agent_settings.get('agent_id') for agent_settings in agents_settings],
+                                            [[task_settings.get('agent_id'), task_settings.get('task_number')] for task_settings in tasks_settings]])}
+
+    for agent_settings in agents_settings:
+
+        fingerprints[('agent', agent_settings.get('agent_id'))] = get_digest(agent_settings)
+
+    for task_settings in tasks_settings:
+
+        fingerprints[('task', task_settings.get('agent_id'), task_settings.get('task_number'))] = get_digest(task_settings)
+
+    return fingerprints
+
+def get_digest(settings):
+
+    return hashlib.blake2b(json.dumps(settings, sort_keys = True, default = str).encode('utf-8'), digest_size = 16).digest()
+
+def get_changes(fingerprints, saved_fingerprints):
+
+    return {key for key in fingerprints.keys() | saved_fingerprints.keys() if fingerprints.get(key) != saved_fingerprints.get(key)}
+
+def get_crew_file_lock(crew_file_path):
+
+    """
+    This function returns the process-wide lock of a crew file, shared by every session that saves it.
+    """
+
+    with crew_file_locks_lock:
+
+        return crew_file_locks.setdefault(os.path.abspath(crew_file_path), threading.Lock())
+
+def save_crew_file_version(saved_crews_directory, crew_file_name, agents_settings, tasks_settings, crew_settings, number_of_versions = 5):
+
+    """
+    This function saves a crew file, keeping its previous contents in a ring of versions
+    in the .versions directory of the saved crews directory, as <crew>.1.ancr (the latest) to <crew>.<number_of_versions>.ancr.
+    """
+
+    crew_file_path = crew_file_format.get_crew_file_path(saved_crews_directory, crew_file_name)
+
+    os.makedirs(saved_crews_directory, exist_ok = True)
+
+    # Sessions saving the same crew at once would rotate the versions over each other, so the rotation and the save are done by one session at a time
+
+    with get_crew_file_lock(crew_file_path):
+
+        if number_of_versions > 0 and os.path.isfile(crew_file_path):
+
+            versions_directory = os.path.join(saved_crews_directory, '.versions')
+
+            os.makedirs(versions_directory, exist_ok = True)
+
+            for version_number in range(number_of_versions - 1, 0, -1):
+
+                version_path = crew_file_format.get_crew_file_path(versions_directory, f'{crew_file_name}.{version_number}')
+
+                if os.path.exists(version_path):
+
+                    os.replace(version_path, crew_file_format.get_crew_file_path(versions_directory, f'{crew_file_name}.{version_number + 1}'))
+
+            shutil.copyfile(crew_file_path, crew_file_format.get_crew_file_path(versions_directory, f'{crew_file_name}.1'))
+
+        crew_file_format.save_crew_file(crew_file_path, agents_settings, tasks_settings, crew_settings)
+
+class CrewAutosaver:
+
+    """
+    Saves the crew being edited in a session to its crew file in the background.
+    Each change restarts a delay of delay seconds before the crew is written, and a crew that keeps changing is written at least every max_delay seconds.
+    Only crews that differ from what was last written are saved, through a temporary file, and the previous contents are kept as versions.
+    Crews that have not been saved under a file name yet are not autosaved.
+    """
+
+    def __init__(self, saved_crews_directory: str, delay: float = 5, max_delay: float = 30, number_of_versions: int = 5):
+
+        self.saved_crews_directory = saved_crews_directory
+
+        self.delay = delay
+
+        self.max_delay = max_delay
+
+        self.number_of_versions = number_of_versions
+
+        self.crew_file_name = ''
+
+        self.saved_fingerprints = None
+
+        self.pending_crew = None
+
+        self.changes = set()
+
+        self.first_changed_at = None
+
+        self.last_saved_at = None
+
+        self.number_of_saves = 0
+
+        self.timer = None
+
+        self.lock = threading.RLock()
+
+        crew_autosavers.add(self)
+
+    def update(self, crew_file_name, agents_settings, tasks_settings, crew_settings):
+
+        """
+        This function is called with the crew after every run of the script, and schedules a save if the crew changed since it was last written.
+        """
+
+        if self.delay <= 0:
+
+            return
+
+        fingerprints = get_fingerprints(agents_settings, tasks_settings, crew_settings)
+
+        with self.lock:
+
+            if crew_file_name != self.crew_file_name or self.saved_fingerprints is None:
+
+                # Pending changes are written to the crew they were made to before another crew is tracked
+
+                self.flush()
+
+                if crew_file_name != self.crew_file_name:
+
+                    self.crew_file_name = crew_file_name
+
+                    self.last_saved_at = None
+
+                self.saved_fingerprints = fingerprints
+
+                return
+
+            if not crew_file_name:
+
+                return
+
+            changes = get_changes(fingerprints, self.saved_fingerprints)
+
+            if not changes:
+
+                # The crew is back to what was last written
+
+                self.cancel()
+
+                return
+
+            if self.pending_crew is not None and self.pending_crew['fingerprints'] == fingerprints:
+
+                return
+
+            # The crew is copied, since its settings keep being edited by the script while it waits to be written
+
+            self.pending_crew = {'crew_file_name': crew_file_name,
+                                 'agents_settings': copy.deepcopy(agents_settings),
+                                 'tasks_settings': copy.deepcopy(tasks_settings),
+                                 'crew_settings': copy.deepcopy(crew_settings),
+                                 'fingerprints': fingerprints}
+
+            self.changes = changes
+
+            now = time.monotonic()
+
+            self.first_changed_at = self.first_changed_at or now
+
+            self.start_timer(max(0, min(self.delay, self.first_changed_at + self.max_delay - now)))
+
+    def start_timer(self, delay):
+
+        if self.timer is not None:
+
+            self.timer.cancel()
+
+        self.timer = threading.Timer(delay, self.flush)
+
+        self.timer.daemon = True
+
+        self.timer.start()
+
+    def cancel(self):
+
+        with self.lock:
+
+            if self.timer is not None:
+
+                self.timer.cancel()
+
+                self.timer = None
+
+            self.pending_crew = None
+
+            self.changes = set()
+
+            self.first_changed_at = None
+
+    def flush(self):
+
+        """
+        This function writes the pending changes, if any, straight away.
+        """
+
+        with self.lock:
+
+            pending_crew = self.pending_crew
+
+            self.cancel()
+
+            if pending_crew is None:
+
+                return
+
+            try:
+
+                self.write(pending_crew)
+
+            except Exception as exception:
+
+                log_pipeline.get_logger(__name__).error(f"There wan an error autosaving crew {pending_crew['crew_file_name']}: {str(exception)}")
+
+    def write(self, crew):
+
+        save_crew_file_version(self.saved_crews_directory,
+                               crew['crew_file_name'],
+                               crew['agents_settings'],
+                               crew['tasks_settings'],
+                               crew['crew_settings'],
+                               number_of_versions = self.number_of_versions)
+
+        get_crew_catalogue(self.saved_crews_directory).update_crew(crew['crew_file_name'])
+
+        if crew['crew_file_name'] == self.crew_file_name:
+
+            self.saved_fingerprints = crew['fingerprints']
+
+        self.last_saved_at = time.time()
+
+        self.number_of_saves += 1
+
+    def save(self, crew_file_name, agents_settings, tasks_settings, crew_settings):
+
+        """
+        This function saves the crew under a file name straight away, as the save dialog does, and tracks it from then on.
+        """
+
+        with self.lock:
+
+            self.flush()
+
+            self.crew_file_name = crew_file_name
+
+            self.write({'crew_file_name': crew_file_name,
+                        'agents_settings': agents_settings,
+                        'tasks_settings': tasks_settings,
+                        'crew_settings': crew_settings,
+                        'fingerprints': get_fingerprints(agents_settings, tasks_settings, crew_settings)})
+
+    def reset(self, crew_file_name):
+
+        """
+        This function tracks a crew that was just loaded from its file, without saving it.
+        The crew as first shown is taken as written, since the page fills in the settings older crew files lack.
+        """
+
+        with self.lock:
+
+            self.flush()
+
+            self.crew_file_name = crew_file_name
+
+            self.saved_fingerprints = None
+
+            self.last_saved_at = None
+
+    def get_status(self):
+
+        """
+        This function describes the changes waiting to be written, or when the crew was last saved.
+        """
+
+        with self.lock:
+
+            if self.pending_crew is not None:
+
+                number_of_changes = Counter(key[0] for key in self.changes)
+
+                changes = [f"{number_of_changes[change_type]} {change_type}{'s' if number_of_changes[change_type] > 1 else ''}" for change_type in ('agent', 'task') if number_of_changes[change_type]]
+
+                if number_of_changes['crew']:
+
+                    changes.append('crew settings')
+
+                if number_of_changes['order'] and not changes:
+
+                    changes.append('the order of agents and tasks')
+
+                return f"Autosaving changes to {', '.join(changes)} . . ."
+
+            if self.last_saved_at is not None:
+
+                return f"Saved at {time.strftime('%H:%M:%S', time.localtime(self.last_saved_at))}"
+
+            return None
+
+def flush_crew_autosavers():
+
+    # Changes still waiting for their delay are written before the process exits
+
+    for crew_autosaver in list(crew_autosavers):
+
+        crew_autosaver.flush()
+
+atexit.register(flush_crew_autosavers)
+
+def get_crew_autosaver(saved_crews_directory: str) -> CrewAutosaver:
+
+    """
+    This function returns an autosaver for a session, configured from the Crew_Autosave_Delay (5 seconds by default, 0 to turn autosave off),
+    Crew_Autosave_Max_Delay (30 seconds by default) and Crew_Autosave_Versions (5 by default) environment variables.
+    """
+
+    return CrewAutosaver(saved_crews_directory,
+                         delay = float(os.getenv('Crew_Autosave_Delay', '5')),
+                         max_delay = float(os.getenv('Crew_Autosave_Max_Delay', '30')),
+                         number_of_versions = int(os.getenv('Crew_Autosave_Versions', '5')))
@@ -0,0 +1,260 @@
+from crewai import Agent, Crew, Process, Task
+from custom_tools.tool_factory import tool_factory
+from typing import Optional
+from utilities.llm_registry import llm_registry
+import utilities.run_profiler as run_profiler
+
+required_agent_settings_fields = ['agent_name', 'agent_role', 'agent_goal', 'agent_backstory']
+
+required_task_settings_fields = ['task_description', 'task_expected_output']
+
+required_crew_settings_fields = ['crew_name', 'crew_description']
+
+class ProfiledTask(Task):
+
+    """
+    A task that is timed in the profile of the run in progress, and attributes the LLM and tool calls made while it runs to its agent.
+    In hierarchical crews, the callbacks of the manager's LLM are put back before the manager runs the task.
+    """
+
+    manager_llm_callbacks: Optional[list] = None
+
+    def execute(self, agent = None, *args, **kwargs):
+
+        # crewAI builds the manager agent at kickoff, which replaces the callbacks of its LLM
+
+        if agent is not None and agent is not self.agent and self.manager_llm_callbacks is not None:
+
+            restore_llm_callbacks(agent.llm, self.manager_llm_callbacks)
+
+        agent = agent or self.agent
+
+        with run_profiler.profile_task(agent.role if agent else None, self.description):
+
+            return super().execute(agent, *args, **kwargs)
+
+def restore_llm_callbacks(llm, llm_callbacks):
+
+    """
+    This function puts the metrics, profiling and rate limiting handlers the registry gave an LLM back in front of its callbacks,
+    since crewAI replaces the callbacks of an LLM that has a model name with its token counter when it builds an agent.
+    """
+
+    llm.callbacks = llm_callbacks + [callback for callback in llm.callbacks or [] if callback not in llm_callbacks]
+
+def get_field_label(field):
+
+    return ((field.replace('_', ' ')).title()).replace('Llm', 'LLM')
+
+def validate_crew(agents_settings, tasks_settings, crew_settings):
+
+    """
+    This function checks the crew for missing required fields.
+    Args:
+        agents_settings: The list of agent settings.
+        tasks_settings: The list of task settings.
+        crew_settings: The crew settings.
+    Returns:
+        A tuple of the invalid agent settings, invalid task settings and missing crew fields.
+    """
+
+    crew_settings_fields = list(required_crew_settings_fields)
+
+    if crew_settings.get('crew_process') == 'Hierarchical':
+
+        crew_settings_fields.append('crew_manager_llm')
+
+    invalid_agent_settings_fields = []
+
+    for agent_settings in agents_settings:
+
+        missing_agent_settings_fields = [get_field_label(field) for field in required_agent_settings_fields if not agent_settings.get(field)]
+
+        if missing_agent_settings_fields:
+
+            invalid_agent_settings_fields.append((agent_settings, missing_agent_settings_fields))
+
+    invalid_task_settings_fields = []
+
+    for task_settings in tasks_settings:
+
+        missing_task_settings_fields = [get_field_label(field) for field in required_task_settings_fields if not task_settings.get(field)]
+
+        if missing_task_settings_fields:
+
+            invalid_task_settings_fields.append((task_settings, missing_task_settings_fields))
+
+    invalid_crew_settings_fields = [get_field_label(field) for field in crew_settings_fields if not crew_settings.get(field)]
+
+    return invalid_agent_settings_fields, invalid_task_settings_fields, invalid_crew_settings_fields
+
+def requires_user_input(agents_settings, tasks_settings):
+
+    """
+    This function checks whether running the crew needs a user at the platform UI,
+    either through the User Input Tool or a task that requires human input.
+    """
+
+    return any('User Input Tool' in agent_settings['agent_tools'] for agent_settings in agents_settings) or \
+           any(task_settings['task_human_input'] == 'True' for task_settings in tasks_settings)
+
+def build_crew(agents_settings, tasks_settings, crew_settings, tool_run_scope = None):
+
+    """
+    This function configures the crew from its settings.
+    Args:
+        agents_settings: The list of agent settings.
+        tasks_settings: The list of task settings.
+        crew_settings: The crew settings.
+        tool_run_scope: The tool scope of the run. A new one is created if not given.
+    Returns:
+        A tuple of the crew, its tasks and whether the crew returns its full output.
+    """
+
+    if tool_run_scope is None:
+
+        tool_run_scope = tool_factory.new_run_scope()
+
+    agents = {}
+
+    tasks = []
+
+    for agent_settings in agents_settings:
+
+        agent_llm = get_selected_llm(agent_settings['agent_llm'], 
+                                     agent_settings['agent_llm_temperature'], 
+                                     'Agent', 
+                                     get_selected_llm_cache(agent_settings.get('agent_llm_cache', 'Auto'), crew_settings, agent_settings['agent_llm_temperature']))
+
+        agent_llm_callbacks = list(agent_llm.callbacks or [])
+
+        agents[agent_settings['agent_id']] = Agent(role = agent_settings['agent_role'],
+                                                   goal = agent_settings['agent_goal'],
+                                                   backstory = agent_settings['agent_backstory'],
+                                                   verbose = get_selected_boolean(agent_settings['agent_verbosity']),
+                                                   allow_delegation = get_selected_boolean(agent_settings['agent_delegation']),
+                                                   tools = get_selected_tools(agent_settings['agent_tools'], tool_run_scope),
+                                                   llm = agent_llm,
+                                                   max_rpm = get_max_rpm(agent_settings['agent_max_rpm']),
+                                                   max_iter = agent_settings['agent_max_iter'],
+                                                   memory = get_selected_boolean(agent_settings['agent_memory']))
+
+        restore_llm_callbacks(agents[agent_settings['agent_id']].llm, agent_llm_callbacks)
+
+    for task_settings in tasks_settings:
+
+        tasks.append(ProfiledTask(human_input = get_selected_boolean(task_settings['task_human_input']),
+                                  description = task_settings['task_description'],
+                                  agent = agents[task_settings['agent_id']],
+                                  expected_output = task_settings['task_expected_output']))
+
+    crew_full_output = get_selected_boolean(crew_settings['crew_full_output'])
+
+    crew_manager_llm = None
+
+    crew_manager_llm_callbacks = None
+
+    if crew_settings['crew_process'] == 'Hierarchical':
+
+        crew_manager_llm = get_selected_llm(crew_settings['crew_manager_llm'], 
+                                            crew_settings['crew_manager_llm_temperature'], 
+                                            'Manager', 
+                                            get_selected_llm_cache('Auto', crew_settings, crew_settings['crew_manager_llm_temperature']))
+
+        crew_manager_llm_callbacks = list(crew_manager_llm.callbacks or []) if crew_manager_llm is not None else None
+
+    crew = Crew(agents = list(agents.values()),
+                tasks = tasks,
+                verbose = get_selected_boolean(crew_settings['crew_verbosity']),
+                max_rpm = get_max_rpm(crew_settings['crew_max_rpm']),
+                memory = get_selected_boolean(crew_settings['crew_memory']),
+                full_output = crew_full_output,
+                process = get_selected_process(crew_settings['crew_process']),
+                manager_llm = crew_manager_llm)
+
+    if crew_manager_llm_callbacks is not None:
+
+        restore_llm_callbacks(crew.manager_llm, crew_manager_llm_callbacks)
+
+        for task in tasks:
+
+            task.manager_llm_callbacks = crew_manager_llm_callbacks
+
+    return crew, tasks, crew_full_output
+
+def get_selected_boolean(selected_boolean):
+
+    if selected_boolean == 'True':
+
+        return True
+
+    else:
+
+        return False
+
+def get_selected_tools(selected_tools, tool_run_scope):
+
+    if not selected_tools:
+
+        return []
+
+    try:
+
+        return tool_run_scope.get_tools(selected_tools)
+
+    except Exception as exception:
+
+        raise RuntimeError(f'There wan an error loading tool: {str(exception)}') from exception
+
+def get_selected_llm(selected_llm, selected_temperature, type, use_response_cache = False):
+
+    llm_type = 'agent' if type == 'Agent' else 'manager'
+
+    if type != 'Agent' and not selected_llm:
+
+        return None
+
+    try:
+
+        return llm_registry.get_llm(selected_llm, selected_temperature, use_response_cache)
+
+    except Exception as exception:
+
+        raise RuntimeError(f'There wan an error loading {llm_type} LLM: {str(exception)}') from exception
+
+def get_selected_llm_cache(selected_llm_cache, crew_settings, selected_temperature):
+
+    """
+    This function decides whether an LLM uses the response cache.
+    The crew setting switches caching off for the whole crew, and 'Auto' caches only deterministic (temperature 0) LLMs.
+    """
+
+    if not get_selected_boolean(crew_settings.get('crew_llm_cache', 'True')):
+
+        return False
+
+    if selected_llm_cache == 'Auto':
+
+        return float(selected_temperature) == 0
+
+    return get_selected_boolean(selected_llm_cache)
+
+def get_max_rpm(max_rpm):
+
+    if max_rpm == 0:
+
+        return None
+
+    else:
+
+        return max_rpm
+
+def get_selected_process(selected_process):
+
+    if selected_process == 'Hierarchical':
+
+        return Process.hierarchical
+
+    else:
+
+        return Process.sequential
@@ -0,0 +1,236 @@
+import os
+import sqlite3
+import threading
+import time
+import utilities.crew_file as crew_file_format
+
+class CrewCatalogue:
+
+    """
+    An index of the saved crews in a directory, kept in an SQLite database, with each crew's name, description,
+    number of agents and tasks, LLMs used, modification time and size.
+    The index is refreshed incrementally: a full directory scan only happens when the directory's modification time changes
+    or refresh_interval seconds have passed, and only files whose modification time or size changed are read again.
+    """
+
+    def __init__(self, saved_crews_directory: str, database_path: str = './cache/crew_catalogue.sqlite', refresh_interval: float = 30):
+
+        self.saved_crews_directory = saved_crews_directory
+
+        self.directory_key = os.path.abspath(saved_crews_directory)
+
+        self.database_path = database_path
+
+        self.refresh_interval = refresh_interval
+
+        self.local = threading.local()
+
+        self.refresh_lock = threading.Lock()
+
+        self.directory_mtime = None
+
+        self.refreshed_at = 0
+
+        os.makedirs(saved_crews_directory, exist_ok = True)
+
+        database_directory = os.path.dirname(database_path)
+
+        if database_directory:
+
+            os.makedirs(database_directory, exist_ok = True)
+
+        with self.get_connection() as connection:
+
+            connection.execute('CREATE TABLE IF NOT EXISTS crews (directory TEXT, file_name TEXT, crew_name TEXT, crew_description TEXT, number_of_agents INTEGER, '
+                               'number_of_tasks INTEGER, llms TEXT, mtime REAL, size INTEGER, error TEXT, PRIMARY KEY (directory, file_name))')
+
+            connection.execute('CREATE INDEX IF NOT EXISTS crews_mtime ON crews (directory, mtime)')
+
+    def get_connection(self):
+
+        # SQLite connections cannot be shared between threads, so each thread opens its own
+
+        connection = getattr(self.local, 'connection', None)
+
+        if connection is None:
+
+            connection = sqlite3.connect(self.database_path, timeout = 30)
+
+            connection.execute('PRAGMA journal_mode=WAL')
+
+            self.local.connection = connection
+
+        return connection
+
+    def refresh(self, force: bool = False):
+
+        """
+        This function brings the index up to date with the saved crews directory.
+        Args:
+            force: Whether to scan the directory even if it looks unchanged.
+        """
+
+        with self.refresh_lock:
+
+            directory_mtime = os.stat(self.saved_crews_directory).st_mtime
+
+            if not force and directory_mtime == self.directory_mtime and time.time() - self.refreshed_at < self.refresh_interval:
+
+                return
+
+            with os.scandir(self.saved_crews_directory) as directory_entries:
+
+                crew_files = {directory_entry.name: directory_entry.stat() for directory_entry in directory_entries
+                              if directory_entry.name.endswith(crew_file_format.crew_file_extension) and directory_entry.is_file()}
+
+            connection = self.get_connection()
+
+            indexed_crew_files = {file_name: (mtime, size) for file_name, mtime, size in connection.execute('SELECT file_name, mtime, size FROM crews WHERE directory = ?', (self.directory_key,))}
+
+            changed_crew_files = [file_name for file_name, file_stat in crew_files.items() if indexed_crew_files.get(file_name) != (file_stat.st_mtime, file_stat.st_size)]
+
+            rows = [self.get_row(file_name, crew_files[file_name]) for file_name in changed_crew_files]
+
+            with connection:
+
+                connection.executemany('INSERT OR REPLACE INTO crews VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+                connection.executemany('DELETE FROM crews WHERE directory = ? AND file_name = ?', [(self.directory_key, file_name) for file_name in indexed_crew_files if file_name not in crew_files])
+
+            self.directory_mtime = directory_mtime
+
+            self.refreshed_at = time.time()
+
+    def get_row(self, file_name: str, file_stat):
+
+        try:
+
+            # Only the header line of a crew file in the current format is read
+
+            crew_metadata = crew_file_format.read_crew_file_metadata(os.path.join(self.saved_crews_directory, file_name))
+
+        except Exception as exception:
+
+            # Unreadable files stay listed, so they can still be overwritten, and are read again once they change
+
+            return (self.directory_key, file_name, None, None, 0, 0, '', file_stat.st_mtime, file_stat.st_size, str(exception))
+
+        return (self.directory_key,
+                file_name,
+                crew_metadata['crew_name'],
+                crew_metadata['crew_description'],
+                crew_metadata['number_of_agents'],
+                crew_metadata['number_of_tasks'],
+                '|'.join(crew_metadata['llms']),
+                file_stat.st_mtime,
+                file_stat.st_size,
+                None)
+
+    def update_crew(self, crew_file_name: str):
+
+        """
+        This function indexes a crew file straight after it is saved, without waiting for the next scan.
+        """
+
+        file_name = crew_file_name + crew_file_format.crew_file_extension
+
+        row = self.get_row(file_name, os.stat(os.path.join(self.saved_crews_directory, file_name)))
+
+        with self.get_connection() as connection:
+
+            connection.execute('INSERT OR REPLACE INTO crews VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+
+    def crew_exists(self, crew_file_name: str) -> bool:
+
+        return os.path.isfile(crew_file_format.get_crew_file_path(self.saved_crews_directory, crew_file_name))
+
+    def list_crews(self, search: str = '', llm: str = None, offset: int = 0, limit: int = 20):
+
+        """
+        This function lists a page of the saved crews, sorted by file name.
+        Args:
+            search: Text to look for in the file name, crew name or crew description.
+            llm: Only list crews with an agent or manager using this LLM.
+            offset: The number of crews to skip.
+            limit: The number of crews to return.
+        Returns:
+            A tuple of the crews, as dictionaries, and the number of crews matching the search and LLM.
+        """
+
+        self.refresh()
+
+        conditions = ['directory = ?']
+
+        parameters = [self.directory_key]
+
+        if search:
+
+            escaped_search = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+            conditions.append("(file_name LIKE ? ESCAPE '\\' OR crew_name LIKE ? ESCAPE '\\' OR crew_description LIKE ? ESCAPE '\\')")
+
+            parameters.extend([escaped_search] * 3)
+
+        if llm:
+
+            conditions.append("('|' || llms || '|') LIKE ?")
+
+            parameters.append(f'%|{llm}|%')
+
+        where_clause = ' AND '.join(conditions)
+
+        connection = self.get_connection()
+
+        total = connection.execute(f'SELECT COUNT(*) FROM crews WHERE {where_clause}', parameters).fetchone()[0]
+
+        rows = connection.execute(f'SELECT file_name, crew_name, crew_description, number_of_agents, number_of_tasks, llms, mtime, error FROM crews WHERE {where_clause} '
+                                  'ORDER BY file_name LIMIT ? OFFSET ?', parameters + [limit, offset]).fetchall()
+
+        crews = [{'crew_file_name': file_name.removesuffix(crew_file_format.crew_file_extension),
+                  'crew_name': crew_name,
+                  'crew_description': crew_description,
+                  'number_of_agents': number_of_agents,
+                  'number_of_tasks': number_of_tasks,
+                  'llms': llms.split('|') if llms else [],
+                  'mtime': mtime,
+                  'error': error} for file_name, crew_name, crew_description, number_of_agents, number_of_tasks, llms, mtime, error in rows]
+
+        return crews, total
+
+    def get_llms(self):
+
+        """
+        This function returns every LLM used by the saved crews.
+        """
+
+        self.refresh()
+
+        llms = set()
+
+        for (crew_llms,) in self.get_connection().execute("SELECT DISTINCT llms FROM crews WHERE directory = ? AND llms != ''", (self.directory_key,)):
+
+            llms.update(crew_llms.split('|'))
+
+        return sorted(llms)
+
+crew_catalogues = {}
+
+crew_catalogues_lock = threading.Lock()
+
+def get_crew_catalogue(saved_crews_directory: str) -> CrewCatalogue:
+
+    """
+    This function returns the process-wide catalogue of a saved crews directory, shared by every session.
+    The index is kept in the database set by Crew_Catalogue_Path (./cache/crew_catalogue.sqlite by default),
+    and the directory is scanned again at least every Crew_Catalogue_Refresh_Interval seconds (30 by default).
+    """
+
+    with crew_catalogues_lock:
+
+        if saved_crews_directory not in crew_catalogues:
+
+            crew_catalogues[saved_crews_directory] = CrewCatalogue(saved_crews_directory,
+                                                                   database_path = os.getenv('Crew_Catalogue_Path', './cache/crew_catalogue.sqlite'),
+                                                                   refresh_interval = float(os.getenv('Crew_Catalogue_Refresh_Interval', '30')))
+
+        return crew_catalogues[saved_crews_directory]
@@ -0,0 +1,321 @@
+import json
+import os
+import uuid
+import zlib
+
+crew_file_extension = '.ancr'
+
+# Version 1 files are the original indented JSON files. Version 2 files start with a JSON header line, followed by the settings and texts sections
+
+crew_file_version = 2
+
+crew_file_format_name = 'ancr'
+
+# Settings that can be long are stored apart from the others, in the texts section, so the settings can be read without them
+
+large_text_fields = ('agent_goal', 'agent_backstory', 'task_description', 'task_expected_output')
+
+compressions = ('zlib', 'none')
+
+def get_crew_file_path(saved_crews_directory, crew_file_name):
+
+    return os.path.join(saved_crews_directory, str(crew_file_name) + crew_file_extension)
+
+def get_crew_metadata(agents_settings, tasks_settings, crew_settings):
+
+    """
+    This function returns what listing and previewing a crew needs, without its agents and tasks.
+    """
+
+    llms = {agent_settings.get('agent_llm') for agent_settings in agents_settings}
+
+    if crew_settings.get('crew_process') == 'Hierarchical':
+
+        llms.add(crew_settings.get('crew_manager_llm'))
+
+    return {'crew_name': crew_settings.get('crew_name'),
+            'crew_description': crew_settings.get('crew_description'),
+            'number_of_agents': len(agents_settings),
+            'number_of_tasks': len(tasks_settings),
+            'llms': sorted(filter(None, llms))}
+
+def compress_section(section, compression):
+
+    return zlib.compress(section, 1) if compression == 'zlib' else section
+
+def decompress_section(section, compression):
+
+    return zlib.decompress(section) if compression == 'zlib' else section
+
+def encode_settings(settings_list, texts):
+
+    """
+    This function moves the large texts of a list of settings dictionaries to texts, a bytearray,
+    and replaces them by their UTF-8 [offset, length] in it.
+    """
+
+    encoded_settings_list = []
+
+    for settings in settings_list:
+
+        encoded_settings = dict(settings)
+
+        for field in large_text_fields:
+
+            if isinstance(settings.get(field), str):
+
+                encoded_text = settings[field].encode('utf-8')
+
+                encoded_settings[field] = [len(texts), len(encoded_text)]
+
+                texts += encoded_text
+
+        encoded_settings_list.append(encoded_settings)
+
+    return encoded_settings_list
+
+def decode_settings(settings_list, load_text):
+
+    for settings in settings_list:
+
+        for field in large_text_fields:
+
+            if isinstance(settings.get(field), list):
+
+                settings[field] = load_text(*settings[field])
+
+    return settings_list
+
+def save_crew_file(crew_file_path, agents_settings, tasks_settings, crew_settings, compression = None):
+
+    """
+    This function saves a crew file in the current format.
+    Args:
+        crew_file_path: The path of the .ancr file.
+        agents_settings: The settings of the agents.
+        tasks_settings: The settings of the tasks.
+        crew_settings: The settings of the crew.
+        compression: 'zlib' or 'none'. Defaults to the Crew_File_Compression environment variable, or 'zlib'.
+    """
+
+    compression = compression or os.getenv('Crew_File_Compression', 'zlib')
+
+    if compression not in compressions:
+
+        raise ValueError(f'Unknown crew file compression: {compression}')
+
+    texts = bytearray()
+
+    settings = {'agents_settings': encode_settings(agents_settings, texts),
+                'tasks_settings': encode_settings(tasks_settings, texts),
+                'crew_settings': encode_settings([crew_settings], texts)}
+
+    settings_section = compress_section(json.dumps(settings, separators = (',', ':')).encode('utf-8'), compression)
+
+    texts_section = compress_section(bytes(texts), compression)
+
+    header = {'format': crew_file_format_name,
+              'version': crew_file_version,
+              'compression': compression,
+              'metadata': get_crew_metadata(agents_settings, tasks_settings, crew_settings),
+              'sections': {'settings': [0, len(settings_section)],
+                           'texts': [len(settings_section), len(texts_section)]}}
+
+    # The file is written next to its final path and moved into place, so a crash never leaves a partly written crew.
+    # Each save has its own temporary file, since sessions of the same process can save the same crew at once
+
+    temporary_crew_file_path = f'{crew_file_path}.{uuid.uuid4().hex}.tmp'
+
+    try:
+
+        with open(temporary_crew_file_path, 'xb') as crew_file:
+
+            crew_file.write(json.dumps(header, separators = (',', ':')).encode('utf-8') + b'\n')
+
+            crew_file.write(settings_section)
+
+            crew_file.write(texts_section)
+
+            crew_file.flush()
+
+            os.fsync(crew_file.fileno())
+
+        os.replace(temporary_crew_file_path, crew_file_path)
+
+    except BaseException:
+
+        if os.path.exists(temporary_crew_file_path):
+
+            os.remove(temporary_crew_file_path)
+
+        raise
+
+class CrewFileReader:
+
+    """
+    Reads a crew file a section at a time. Opening a file only reads its header line,
+    so its metadata can be listed without reading the settings, and the settings can be read without the large texts.
+    Version 1 files have no header, and are read whole when opened.
+    """
+
+    def __init__(self, crew_file_path):
+
+        self.crew_file_path = crew_file_path
+
+        self.legacy_crew_data = None
+
+        self.texts = None
+
+        with open(crew_file_path, 'rb') as crew_file:
+
+            header_line = crew_file.readline()
+
+            try:
+
+                self.header = json.loads(header_line)
+
+            except json.JSONDecodeError:
+
+                self.header = None
+
+            if not isinstance(self.header, dict) or self.header.get('format') != crew_file_format_name:
+
+                crew_file.seek(0)
+
+                self.legacy_crew_data = json.loads(crew_file.read())
+
+                self.header = {'version': 1,
+                               'compression': 'none',
+                               'metadata': get_crew_metadata(self.legacy_crew_data['agents_settings'], self.legacy_crew_data['tasks_settings'], self.legacy_crew_data['crew_settings'])}
+
+            self.body_offset = len(header_line)
+
+        if self.header['version'] > crew_file_version:
+
+            raise ValueError(f'The crew file is version {self.header["version"]}, and this platform reads up to version {crew_file_version}')
+
+    @property
+    def version(self):
+
+        return self.header['version']
+
+    @property
+    def metadata(self):
+
+        return self.header['metadata']
+
+    def read_section(self, crew_file, section_name):
+
+        section_offset, section_length = self.header['sections'][section_name]
+
+        crew_file.seek(self.body_offset + section_offset)
+
+        return decompress_section(crew_file.read(section_length), self.header['compression'])
+
+    def load_text(self, offset, length):
+
+        # The texts section is read and decompressed once, when the first text is needed
+
+        if self.texts is None:
+
+            with open(self.crew_file_path, 'rb') as crew_file:
+
+                self.texts = self.read_section(crew_file, 'texts')
+
+        return self.texts[offset:offset + length].decode('utf-8')
+
+    def load(self, load_texts = True):
+
+        """
+        This function reads the settings of the crew.
+        Args:
+            load_texts: Whether to read the large texts. If not, they are left as LazyText objects that read them when converted to strings.
+        Returns:
+            A dictionary with the agents_settings, tasks_settings and crew_settings of the crew.
+        """
+
+        if self.legacy_crew_data is not None:
+
+            return {'agents_settings': self.legacy_crew_data['agents_settings'],
+                    'tasks_settings': self.legacy_crew_data['tasks_settings'],
+                    'crew_settings': self.legacy_crew_data['crew_settings']}
+
+        with open(self.crew_file_path, 'rb') as crew_file:
+
+            settings = json.loads(self.read_section(crew_file, 'settings'))
+
+            if load_texts and self.texts is None:
+
+                self.texts = self.read_section(crew_file, 'texts')
+
+        load_text = self.load_text if load_texts else lambda offset, length: LazyText(self, offset, length)
+
+        return {'agents_settings': decode_settings(settings['agents_settings'], load_text),
+                'tasks_settings': decode_settings(settings['tasks_settings'], load_text),
+                'crew_settings': decode_settings(settings['crew_settings'], load_text)[0]}
+
+class LazyText:
+
+    """
+    A large text of a crew file that is only read when it is converted to a string.
+    """
+
+    def __init__(self, crew_file_reader, offset, length):
+
+        self.crew_file_reader = crew_file_reader
+
+        self.offset = offset
+
+        self.length = length
+
+        self.text = None
+
+    def __str__(self):
+
+        if self.text is None:
+
+            self.text = self.crew_file_reader.load_text(self.offset, self.length)
+
+        return self.text
+
+def load_crew_file(crew_file_path, load_texts = True):
+
+    """
+    This function loads a saved crew file of any version.
+    Args:
+        crew_file_path: The path of the .ancr file.
+        load_texts: Whether to read the large texts straight away. See CrewFileReader.load.
+    Returns:
+        A dictionary with the agents_settings, tasks_settings and crew_settings of the crew.
+    """
+
+    return CrewFileReader(crew_file_path).load(load_texts)
+
+def read_crew_file_metadata(crew_file_path):
+
+    """
+    This function reads the crew name, description, number of agents and tasks and LLMs of a saved crew.
+    Only the header line is read from files in the current format.
+    """
+
+    return CrewFileReader(crew_file_path).metadata
+
+def migrate_crew_file(crew_file_path):
+
+    """
+    This function rewrites a crew file of an older version in the current format.
+    Returns:
+        Whether the file was migrated.
+    """
+
+    crew_file_reader = CrewFileReader(crew_file_path)
+
+    if crew_file_reader.version == crew_file_version:
+
+        return False
+
+    crew_data = crew_file_reader.load()
+
+    save_crew_file(crew_file_path, crew_data['agents_settings'], crew_data['tasks_settings'], crew_data['crew_settings'])
+
+    return True
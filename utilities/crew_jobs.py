@@ -0,0 +1,199 @@
+import copy
+import queue
+import sys
+import threading
+import time
+from utilities.crew_scheduler import get_crew_scheduler
+from utilities.verbose_output_stream import VerboseOutputStream
+import uuid
+
+class ThreadOutputRouter:
+
+    """
+    A stand-in for sys.stdout or sys.stderr that sends the writes of registered threads to their own sink.
+    Writes from every other thread go to the original stream.
+    """
+
+    def __init__(self, stream):
+
+        self.stream = stream
+
+        self.sinks = {}
+
+    def write(self, string):
+
+        sink = self.sinks.get(threading.get_ident())
+
+        if sink is None:
+
+            return self.stream.write(string)
+
+        sink(string)
+
+        return len(string)
+
+    def flush(self):
+
+        self.stream.flush()
+
+    def __getattr__(self, name):
+
+        return getattr(self.stream, name)
+
+output_routers_lock = threading.Lock()
+
+def install_output_routers():
+
+    with output_routers_lock:
+
+        if not isinstance(sys.stdout, ThreadOutputRouter):
+
+            sys.stdout = ThreadOutputRouter(sys.stdout)
+
+        if not isinstance(sys.stderr, ThreadOutputRouter):
+
+            sys.stderr = ThreadOutputRouter(sys.stderr)
+
+def register_output_sink(sink):
+
+    install_output_routers()
+
+    sys.stdout.sinks[threading.get_ident()] = sink
+
+    sys.stderr.sinks[threading.get_ident()] = sink
+
+def unregister_output_sink():
+
+    sys.stdout.sinks.pop(threading.get_ident(), None)
+
+    sys.stderr.sinks.pop(threading.get_ident(), None)
+
+class CrewJob:
+
+    """
+    A crew run on the crew scheduler's process pool.
+    The crew settings are copied when the job is created, so the crew being edited can change while the job runs.
+    """
+
+    def __init__(self, agents_settings, tasks_settings, crew_settings, crew_scheduler, priority = 'High', verbose_output_max_lines = 2000):
+
+        self.job_id = uuid.uuid4().hex
+
+        crew_spec = {'agents_settings': copy.deepcopy(agents_settings),
+                     'tasks_settings': copy.deepcopy(tasks_settings),
+                     'crew_settings': copy.deepcopy(crew_settings)}
+
+        self.crew_name = crew_spec['crew_settings'].get('crew_name')
+
+        self.progress_queue = crew_scheduler.new_progress_queue()
+
+        self.verbose_output = VerboseOutputStream(max_lines = verbose_output_max_lines)
+
+        self.verbose_output_lock = threading.Lock()
+
+        self.error_reported = False
+
+        self.created_at = time.time()
+
+        self.scheduled_crew = crew_scheduler.submit(crew_spec, priority, self.progress_queue)
+
+    @property
+    def status(self):
+
+        return self.scheduled_crew.status
+
+    @property
+    def result(self):
+
+        return self.scheduled_crew.result or {}
+
+    @property
+    def finished_at(self):
+
+        return self.scheduled_crew.finished_at
+
+    def is_finished(self):
+
+        return self.scheduled_crew.done_event.is_set()
+
+    def get_elapsed_seconds(self):
+
+        if self.scheduled_crew.started_at is None:
+
+            return 0.0
+
+        return (self.scheduled_crew.finished_at or time.time()) - self.scheduled_crew.started_at
+
+    def read_verbose_output(self):
+
+        """
+        This function converts the verbose output queued by the worker since the last read.
+        Returns:
+            The HTML of the verbose output kept so far.
+        """
+
+        with self.verbose_output_lock:
+
+            while True:
+
+                try:
+
+                    self.verbose_output.write(self.progress_queue.get_nowait())
+
+                except queue.Empty:
+
+                    break
+
+            self.verbose_output.flush(final = self.is_finished())
+
+            return self.verbose_output.get_html()
+
+class CrewJobRegistry:
+
+    """
+    A process-wide registry of crew jobs, so a session can reattach to its job after a browser refresh.
+    Jobs from every session share the crew scheduler's process pool.
+    Finished jobs are kept for max_age seconds.
+    """
+
+    def __init__(self, max_age: float = 3600):
+
+        self.max_age = max_age
+
+        self.jobs = {}
+
+        self.lock = threading.Lock()
+
+    def submit(self, agents_settings, tasks_settings, crew_settings, verbose_output_max_lines = 2000) -> CrewJob:
+
+        job = CrewJob(agents_settings, tasks_settings, crew_settings, get_crew_scheduler(), verbose_output_max_lines = verbose_output_max_lines)
+
+        with self.lock:
+
+            self.prune()
+
+            self.jobs[job.job_id] = job
+
+        return job
+
+    def get(self, job_id):
+
+        with self.lock:
+
+            return self.jobs.get(job_id)
+
+    def remove(self, job_id):
+
+        with self.lock:
+
+            self.jobs.pop(job_id, None)
+
+    def prune(self):
+
+        now = time.time()
+
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.is_finished() and now - job.finished_at > self.max_age]:
+
+            del self.jobs[job_id]
+
+crew_job_registry = CrewJobRegistry()
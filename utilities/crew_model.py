@@ -0,0 +1,165 @@
+import utilities.log_pipeline as log_pipeline
+import uuid
+
+class CrewModel:
+
+    """
+    The crew being edited in a session, with its agents keyed by agent ID and its tasks keyed by agent ID and task number,
+    so agents and tasks are added, removed and looked up without scanning the crew.
+    Tasks keep the order they were added in across agents, which is the order a sequential crew runs them in.
+    The settings dictionaries are shared with the page, which edits them in place.
+    """
+
+    def __init__(self, agents_settings = None, tasks_settings = None, crew_settings = None):
+
+        self.load(agents_settings or [], tasks_settings or [], crew_settings or {})
+
+    def load(self, agents_settings, tasks_settings, crew_settings):
+
+        """
+        This function replaces the crew with the agents_settings, tasks_settings and crew_settings of a crew file.
+        """
+
+        self.agents = {}
+
+        self.tasks = {}
+
+        self.agent_tasks = {}
+
+        self.next_task_numbers = {}
+
+        for agent_settings in agents_settings:
+
+            self.add_agent(agent_settings)
+
+        for task_settings in tasks_settings:
+
+            # Crews saved when removing an agent could leave some of its tasks behind may have tasks of agents that no longer exist, which are skipped so the crew still opens
+
+            if str(task_settings['agent_id']) not in self.agents:
+
+                log_pipeline.get_logger(__name__).warning(f"Task {task_settings['task_number']} of agent {task_settings['agent_id']} was skipped, since the crew has no such agent")
+
+                continue
+
+            # Crews saved when task numbers could be reused after a task was removed may repeat a task number, so repeated numbers are replaced
+
+            if int(task_settings['task_number']) in self.agent_tasks.get(str(task_settings['agent_id']), {}):
+
+                task_settings['task_number'] = self.generate_task_number(task_settings['agent_id'])
+
+            self.add_task(task_settings)
+
+        self.crew_settings = crew_settings
+
+    def clear(self):
+
+        self.load([], [], {})
+
+    def __len__(self):
+
+        return len(self.agents)
+
+    @property
+    def agents_settings(self):
+
+        return list(self.agents.values())
+
+    @property
+    def tasks_settings(self):
+
+        return list(self.tasks.values())
+
+    def to_crew_data(self):
+
+        """
+        This function returns the crew in the shape of a crew file.
+        """
+
+        return {'agents_settings': self.agents_settings, 'tasks_settings': self.tasks_settings, 'crew_settings': self.crew_settings}
+
+    def get_agent(self, agent_id):
+
+        return self.agents.get(str(agent_id))
+
+    def get_agent_tasks(self, agent_id):
+
+        return list(self.agent_tasks.get(str(agent_id), {}).values())
+
+    def add_agent(self, agent_settings):
+
+        agent_id = str(agent_settings['agent_id'])
+
+        if agent_id in self.agents:
+
+            raise ValueError(f'There is already an agent with the ID {agent_id}')
+
+        self.agents[agent_id] = agent_settings
+
+        self.agent_tasks[agent_id] = {}
+
+        self.next_task_numbers[agent_id] = 1
+
+    def remove_agent(self, agent_id):
+
+        """
+        This function removes an agent and its tasks.
+        """
+
+        agent_id = str(agent_id)
+
+        del self.agents[agent_id]
+
+        del self.next_task_numbers[agent_id]
+
+        for task_number in self.agent_tasks.pop(agent_id):
+
+            del self.tasks[(agent_id, task_number)]
+
+    def add_task(self, task_settings):
+
+        agent_id, task_number = str(task_settings['agent_id']), int(task_settings['task_number'])
+
+        if agent_id not in self.agents:
+
+            raise ValueError(f'There is no agent with the ID {agent_id}')
+
+        if task_number in self.agent_tasks[agent_id]:
+
+            raise ValueError(f'Agent {agent_id} already has a task {task_number}')
+
+        self.tasks[(agent_id, task_number)] = task_settings
+
+        self.agent_tasks[agent_id][task_number] = task_settings
+
+        self.next_task_numbers[agent_id] = max(self.next_task_numbers[agent_id], task_number + 1)
+
+    def remove_task(self, agent_id, task_number):
+
+        agent_id, task_number = str(agent_id), int(task_number)
+
+        del self.tasks[(agent_id, task_number)]
+
+        del self.agent_tasks[agent_id][task_number]
+
+    def generate_agent_id(self):
+
+        """
+        This function returns a short agent ID that is not used by the crew.
+        """
+
+        while True:
+
+            agent_id = uuid.uuid4().hex[:4]
+
+            if agent_id not in self.agents:
+
+                return agent_id
+
+    def generate_task_number(self, agent_id):
+
+        """
+        This function returns the number of the next task of an agent, after its highest task number, so numbers are not reused after a task is removed.
+        """
+
+        return self.next_task_numbers[str(agent_id)]
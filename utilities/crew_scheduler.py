@@ -0,0 +1,442 @@
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stdout, redirect_stderr
+import multiprocessing
+import os
+from textual_resources.openai_exceptions import OpenAIExceptions
+import threading
+import time
+import utilities.crew_builder as crew_builder
+from utilities.llm_registry import llm_registry
+from utilities.llm_response_cache import get_llm_response_cache_stats, get_llm_response_cache_stats_since
+import utilities.metrics as metrics
+from utilities.rate_limiter import get_rate_limiter, get_rate_limiter_stats_since
+from utilities.run_profiler import profile_run
+
+class QueueWriter:
+
+    """
+    A file-like object that sends every write to a queue and keeps a copy of the text written.
+    """
+
+    def __init__(self, progress_queue = None):
+
+        self.progress_queue = progress_queue
+
+        self.chunks = []
+
+    def write(self, string):
+
+        self.chunks.append(string)
+
+        if self.progress_queue is not None:
+
+            self.progress_queue.put(string)
+
+        return len(string)
+
+    def flush(self):
+
+        pass
+
+    def getvalue(self):
+
+        return ''.join(self.chunks)
+
+def run_crew_spec(crew_spec, progress_queue = None):
+
+    """
+    This function configures and runs a crew in a worker process.
+    Args:
+        crew_spec: A dictionary with the agents_settings, tasks_settings and crew_settings of the crew.
+        progress_queue: An optional queue the verbose output is streamed to.
+    Returns:
+        A dictionary with the status, output, task outputs, verbose output, error, timings in seconds, LLM response cache hits and misses, rate limiter waits, profile and metrics of the run.
+    """
+
+    result = {'status': 'Failed',
+              'output': None,
+              'crew_full_output': False,
+              'task_outputs': [],
+              'verbose_output': '',
+              'error': None,
+              'error_message': None,
+              'configure_seconds': None,
+              'run_seconds': None,
+              'llm_response_cache_stats': None,
+              'rate_limiter_stats': None,
+              'run_profile': None,
+              'metrics': None}
+
+    verbose_output = QueueWriter(progress_queue)
+
+    # Worker processes are reused, so only what this run adds to the metrics is sent back to be merged into the scheduler's process
+
+    metrics_snapshot = metrics.metrics_registry.get_snapshot()
+
+    with redirect_stdout(verbose_output), redirect_stderr(verbose_output), profile_run(crew_spec['crew_settings'].get('crew_name')) as run_profile:
+
+        try:
+
+            started_at = time.perf_counter()
+
+            crew, tasks, result['crew_full_output'] = crew_builder.build_crew(crew_spec['agents_settings'], crew_spec['tasks_settings'], crew_spec['crew_settings'])
+
+            result['configure_seconds'] = time.perf_counter() - started_at
+
+            started_at = time.perf_counter()
+
+            llm_response_cache_stats = get_llm_response_cache_stats()
+
+            rate_limiter_stats = get_rate_limiter().get_stats()
+
+            result['output'] = str(crew.kickoff())
+
+            result['run_seconds'] = time.perf_counter() - started_at
+
+            result['llm_response_cache_stats'] = get_llm_response_cache_stats_since(llm_response_cache_stats)
+
+            result['rate_limiter_stats'] = get_rate_limiter_stats_since(rate_limiter_stats)
+
+            if result['crew_full_output']:
+
+                result['task_outputs'] = [(task.output.description, task.output.raw_output) for task in tasks]
+
+            result['status'] = 'Succeeded'
+
+        except Exception as exception:
+
+            result['error'] = str(exception)
+
+            result['error_message'] = OpenAIExceptions.get_error_message(exception)
+
+    result['run_profile'] = run_profile.get_report()
+
+    result['metrics'] = metrics.metrics_registry.get_snapshot_since(metrics_snapshot)
+
+    result['verbose_output'] = verbose_output.getvalue()
+
+    return result
+
+def get_crew_providers(crew_spec):
+
+    """
+    This function returns the set of LLM providers a crew uses, including the manager LLM of a hierarchical crew.
+    """
+
+    providers = {llm_registry.get_provider(agent_settings['agent_llm']) for agent_settings in crew_spec['agents_settings']}
+
+    crew_settings = crew_spec['crew_settings']
+
+    if crew_settings.get('crew_process') == 'Hierarchical' and crew_settings.get('crew_manager_llm'):
+
+        providers.add(llm_registry.get_provider(crew_settings['crew_manager_llm']))
+
+    return providers
+
+class ScheduledCrew:
+
+    def __init__(self, crew_spec, priority, progress_queue = None):
+
+        self.crew_spec = crew_spec
+
+        self.priority = priority
+
+        self.providers = get_crew_providers(crew_spec)
+
+        self.progress_queue = progress_queue
+
+        self.status = 'Queued'
+
+        self.result = None
+
+        self.submitted_at = time.time()
+
+        self.started_at = None
+
+        self.finished_at = None
+
+        self.done_event = threading.Event()
+
+    def wait(self, timeout = None):
+
+        self.done_event.wait(timeout)
+
+        return self.result
+
+class CrewScheduler:
+
+    """
+    Runs crews on a bounded process pool.
+    Queued crews start in priority order, and a crew only starts while every LLM provider it uses is below its concurrent run limit.
+    A provider limit of None means the provider is only bounded by the pool size.
+    """
+
+    priorities = ('High', 'Normal', 'Low')
+
+    default_provider_limits = {'Mock': None,
+                               'Ollama': None,
+                               'NVIDIA': 2,
+                               'OpenAI': 2}
+
+    def __init__(self, max_workers: int = None, provider_limits: dict = None):
+
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+        self.provider_limits = dict(self.default_provider_limits, **(provider_limits or {}))
+
+        self.queues = {priority: deque() for priority in self.priorities}
+
+        self.running = 0
+
+        self.running_per_provider = Counter()
+
+        self.condition = threading.Condition()
+
+        self.multiprocessing_context = multiprocessing.get_context('spawn')
+
+        self.executor = None
+
+        self.manager = None
+
+        self.dispatcher = None
+
+        self.is_shut_down = False
+
+        self.export_metrics()
+
+    def export_metrics(self):
+
+        metrics.scheduled_crews_running.set_function(lambda: self.get_stats()['running'])
+
+        metrics.scheduled_crews_queued.set_function(lambda: self.get_stats()['queued'])
+
+        metrics.scheduled_crews_running_per_provider.set_function(lambda: self.get_stats()['running_per_provider'])
+
+    def submit(self, crew_spec, priority: str = 'Normal', progress_queue = None) -> ScheduledCrew:
+
+        if priority not in self.priorities:
+
+            raise ValueError(f'Unknown priority: {priority}')
+
+        scheduled_crew = ScheduledCrew(crew_spec, priority, progress_queue)
+
+        with self.condition:
+
+            if self.is_shut_down:
+
+                raise RuntimeError('The crew scheduler has been shut down')
+
+            if self.dispatcher is None:
+
+                self.executor = ProcessPoolExecutor(max_workers = self.max_workers, mp_context = self.multiprocessing_context)
+
+                self.dispatcher = threading.Thread(target = self.dispatch, name = 'crew-scheduler', daemon = True)
+
+                self.dispatcher.start()
+
+            self.queues[priority].append(scheduled_crew)
+
+            self.condition.notify_all()
+
+        return scheduled_crew
+
+    def new_progress_queue(self):
+
+        """
+        This function returns a queue that worker processes can stream verbose output to.
+        """
+
+        with self.condition:
+
+            if self.manager is None:
+
+                self.manager = self.multiprocessing_context.Manager()
+
+            return self.manager.Queue()
+
+    def dispatch(self):
+
+        with self.condition:
+
+            while not self.is_shut_down:
+
+                scheduled_crew = self.get_next_crew()
+
+                if scheduled_crew is None:
+
+                    self.condition.wait()
+
+                    continue
+
+                self.start_crew(scheduled_crew)
+
+    def get_next_crew(self):
+
+        if self.running >= self.max_workers:
+
+            return None
+
+        for priority in self.priorities:
+
+            for scheduled_crew in self.queues[priority]:
+
+                if self.has_capacity(scheduled_crew.providers):
+
+                    self.queues[priority].remove(scheduled_crew)
+
+                    return scheduled_crew
+
+        return None
+
+    def has_capacity(self, providers):
+
+        for provider in providers:
+
+            provider_limit = self.provider_limits.get(provider)
+
+            if provider_limit is not None and self.running_per_provider[provider] >= provider_limit:
+
+                return False
+
+        return True
+
+    def start_crew(self, scheduled_crew):
+
+        self.running += 1
+
+        self.running_per_provider.update(scheduled_crew.providers)
+
+        scheduled_crew.status = 'Running'
+
+        scheduled_crew.started_at = time.time()
+
+        executor = self.executor
+
+        try:
+
+            future = executor.submit(run_crew_spec, scheduled_crew.crew_spec, scheduled_crew.progress_queue)
+
+        except Exception as exception:
+
+            # The pool is broken once a worker dies, e.g. killed for running out of memory. The crew fails, and the counters are rolled back,
+            # instead of the dispatcher thread dying and leaving every queued crew waiting
+
+            future = Future()
+
+            future.set_exception(exception)
+
+            self.finish_crew(scheduled_crew, future, executor)
+
+            return
+
+        future.add_done_callback(lambda future: self.finish_crew(scheduled_crew, future, executor))
+
+    def replace_broken_executor(self, broken_executor):
+
+        # Crews finishing with the same broken pool replace it only once
+
+        with self.condition:
+
+            if self.executor is broken_executor and not self.is_shut_down:
+
+                broken_executor.shutdown(wait = False)
+
+                self.executor = ProcessPoolExecutor(max_workers = self.max_workers, mp_context = self.multiprocessing_context)
+
+    def finish_crew(self, scheduled_crew, future, executor = None):
+
+        try:
+
+            scheduled_crew.result = future.result()
+
+        except Exception as exception:
+
+            scheduled_crew.result = {'status': 'Failed', 'error': str(exception), 'error_message': None, 'verbose_output': ''}
+
+            if isinstance(exception, BrokenProcessPool) and executor is not None:
+
+                self.replace_broken_executor(executor)
+
+        with self.condition:
+
+            self.running -= 1
+
+            self.running_per_provider.subtract(scheduled_crew.providers)
+
+            self.condition.notify_all()
+
+        scheduled_crew.finished_at = time.time()
+
+        scheduled_crew.status = scheduled_crew.result['status']
+
+        metrics.metrics_registry.merge(scheduled_crew.result.get('metrics'))
+
+        metrics.crew_runs.inc(mode = 'scheduled', status = scheduled_crew.status)
+
+        metrics.crew_run_seconds.observe(scheduled_crew.finished_at - scheduled_crew.started_at, mode = 'scheduled')
+
+        scheduled_crew.done_event.set()
+
+    def get_stats(self):
+
+        with self.condition:
+
+            return {'queued': {priority: len(self.queues[priority]) for priority in self.priorities},
+                    'running': self.running,
+                    'running_per_provider': {provider: count for provider, count in self.running_per_provider.items() if count > 0}}
+
+    def shutdown(self, wait: bool = True):
+
+        with self.condition:
+
+            self.is_shut_down = True
+
+            self.condition.notify_all()
+
+        if self.executor is not None:
+
+            self.executor.shutdown(wait = wait)
+
+        if self.manager is not None:
+
+            self.manager.shutdown()
+
+def get_provider_limits(provider_limits_setting):
+
+    """
+    This function parses provider limits such as 'OpenAI=2,NVIDIA=4,Ollama=none'.
+    """
+
+    provider_limits = {}
+
+    for provider_limit in filter(None, [item.strip() for item in (provider_limits_setting or '').split(',')]):
+
+        provider, limit = [part.strip() for part in provider_limit.split('=', 1)]
+
+        provider_limits[provider] = None if limit.lower() == 'none' else int(limit)
+
+    return provider_limits
+
+crew_scheduler = None
+
+crew_scheduler_lock = threading.Lock()
+
+def get_crew_scheduler():
+
+    """
+    This function returns the process-wide crew scheduler, configured from the Crew_Scheduler_Workers
+    and Crew_Scheduler_Provider_Limits environment variables when it is first used.
+    """
+
+    global crew_scheduler
+
+    with crew_scheduler_lock:
+
+        if crew_scheduler is None:
+
+            crew_scheduler = CrewScheduler(max_workers = int(os.getenv('Crew_Scheduler_Workers', '0')) or None,
+                                           provider_limits = get_provider_limits(os.getenv('Crew_Scheduler_Provider_Limits')))
+
+        return crew_scheduler
@@ -1,7 +1,10 @@
-import json
+import math
 import os
 import re
 import streamlit as st
+import utilities.crew_file as crew_file_format
+
+crew_catalogue_page_size = int(os.getenv('Crew_Catalogue_Page_Size', '20'))
 
 @st.experimental_dialog('Error!')  
 def show_error_dialog(message):
@@ -40,15 +43,15 @@ def show_validation_dialog(invalid_agent_settings_fields, invalid_task_settings_
         st.rerun()       
 
 @st.experimental_dialog('Save Crew') 
-def show_save_crew_dialog(files, saved_crews_directory, current_crew_file_name):
+def show_save_crew_dialog(crew_catalogue, current_crew_file_name):
 
-    crew_files = [f"📜 {file.replace('.ancr', '')}" for file in files if os.path.isfile(os.path.join(saved_crews_directory, file)) and file.endswith('.ancr')]
+    crews = get_crew_catalogue_page(crew_catalogue, 'save_crew')
 
     with st.container(height = 150, border = True): 
 
-        for crew_file in crew_files:
+        for crew in crews:
 
-            st.write(crew_file)
+            st.write(f"📜 {crew['crew_file_name']}")
 
     file_name = st.text_input('File Name:', 
                               current_crew_file_name,
@@ -81,7 +84,7 @@ def show_save_crew_dialog(files, saved_crews_directory, current_crew_file_name):
 
             else:
 
-                if crew_file_name in [file.replace('.ancr', '') for file in files if os.path.isfile(os.path.join(saved_crews_directory, file)) and file.endswith('.ancr')] and not overwrite_existing:
+                if crew_catalogue.crew_exists(crew_file_name) and not overwrite_existing:
 
                     with error_message_container:
 
@@ -89,21 +92,18 @@ def show_save_crew_dialog(files, saved_crews_directory, current_crew_file_name):
 
                 else:       
 
-                    agents_tasks_and_crew_settings = {'agents_settings': st.session_state.agents_settings,
-                                                      'tasks_settings': st.session_state.tasks_settings,
-                                                      'crew_settings': st.session_state.crew_settings}
-                    
                     try: 
 
-                        crew_data = json.dumps(agents_tasks_and_crew_settings, indent = 4)
-
-                        with open(os.path.join(st.session_state.saved_crews_directory, str(crew_file_name) + '.ancr'), 'w') as crew_file:
+                        # The crew is written now, its previous contents kept as a version, and autosaved from then on
 
-                            crew_file.write(crew_data)
+                        st.session_state.crew_autosaver.save(crew_file_name,
+                                                             st.session_state.crew_model.agents_settings,
+                                                             st.session_state.crew_model.tasks_settings,
+                                                             st.session_state.crew_model.crew_settings)
 
-                            st.session_state['current_crew'] = crew_file_name 
+                        st.session_state['current_crew'] = crew_file_name 
 
-                            st.session_state['crew_saved'] = True
+                        st.session_state['crew_saved'] = True
 
                         st.rerun() 
 
@@ -134,11 +134,7 @@ def show_remove_dialog(remove_type, agent_id, task_number, message):
 
             if remove_type == 'Crew':
                
-                st.session_state.agents_settings.clear()
-
-                st.session_state.tasks_settings.clear()
-
-                st.session_state.crew_settings.clear()
+                st.session_state.crew_model.clear()
 
                 st.session_state['current_crew'] = ''
 
@@ -146,35 +142,19 @@ def show_remove_dialog(remove_type, agent_id, task_number, message):
 
             elif remove_type == 'Agent':
 
-                for agent_settings in st.session_state.agents_settings:
-
-                    for task_settings in st.session_state.tasks_settings:
-
-                        if task_settings['agent_id'] == str(agent_id):
-
-                            st.session_state.tasks_settings.remove(task_settings)
-
-                    if agent_settings['agent_id'] == str(agent_id):
+                st.session_state.crew_model.remove_agent(agent_id)
 
-                        if len(st.session_state.agents_settings) == 1:
+                if len(st.session_state.crew_model) == 0:
 
-                            st.session_state.tasks_settings.clear()
+                    st.session_state.crew_model.clear()
 
-                            st.session_state.crew_settings.clear()
-
-                            st.session_state['current_crew'] = ''
-
-                        st.session_state.agents_settings.remove(agent_settings)
+                    st.session_state['current_crew'] = ''
             
                 st.rerun()
 
             else:
 
-                for task_settings in st.session_state.tasks_settings:
-
-                    if task_settings['agent_id'] == str(agent_id) and task_settings['task_number'] == int(task_number):
-
-                        st.session_state.tasks_settings.remove(task_settings)
+                st.session_state.crew_model.remove_task(agent_id, task_number)
             
                 st.rerun()                
 
@@ -185,21 +165,28 @@ def show_remove_dialog(remove_type, agent_id, task_number, message):
             st.rerun()
 
 @st.experimental_dialog('Load Crew') 
-def show_load_crew_dialog(files, saved_crews_directory):
+def show_load_crew_dialog(crew_catalogue):
   
-    if len(st.session_state.agents_settings) > 0:
+    if len(st.session_state.crew_model) > 0:
       
         st.warning('Note that the current unsaved crew you\'re working on will be lost when you load an existing crew')  
 
     st.write('Select the crew file you wish to load:') 
 
+    crews = {crew['crew_file_name']: crew for crew in get_crew_catalogue_page(crew_catalogue, 'load_crew', llm_filter = True)}
+
     with st.container(height = 150, border = True):  
 
         selected_file = st.radio('Select a crew file to load', 
-                                 options = [f"📜 {file.replace('.ancr', '')}" for file in files if os.path.isfile(os.path.join(saved_crews_directory, file)) and file.endswith('.ancr')],
+                                 options = list(crews),
+                                 format_func = lambda crew_file_name: get_crew_label(crews[crew_file_name]),
                                  index = None,
                                  label_visibility = 'collapsed') 
 
+    if selected_file:
+
+        show_crew_preview(crew_catalogue, crews[selected_file])
+
     error_message_container = st.empty()
 
     dialog_buttons_columns =  st.columns((1, 1), gap = 'small')
@@ -210,27 +197,19 @@ def show_load_crew_dialog(files, saved_crews_directory):
 
             if selected_file:
 
-                crew_file = selected_file.replace('📜 ', '')
+                crew_file = selected_file
 
                 try:
 
-                    with open(os.path.join(saved_crews_directory, str(crew_file) + '.ancr'), 'r') as file:
-
-                        crew_data = json.load(file)
+                    crew_data = crew_file_format.load_crew_file(crew_file_format.get_crew_file_path(crew_catalogue.saved_crews_directory, crew_file))
 
-                        st.session_state.agents_settings.clear()
+                    migrate_crew_file(crew_catalogue, crew_file)
 
-                        st.session_state.tasks_settings.clear()
+                    st.session_state.crew_model.load(crew_data['agents_settings'], crew_data['tasks_settings'], crew_data['crew_settings'])
 
-                        st.session_state.crew_settings.clear()  
-                        
-                        st.session_state.agents_settings = crew_data['agents_settings']
+                    st.session_state['current_crew'] = crew_file  
 
-                        st.session_state.tasks_settings = crew_data['tasks_settings']
-
-                        st.session_state.crew_settings = crew_data['crew_settings']
-
-                        st.session_state['current_crew'] = crew_file  
+                    st.session_state.crew_autosaver.reset(crew_file)
 
                     st.rerun()  
 
@@ -254,6 +233,108 @@ def show_load_crew_dialog(files, saved_crews_directory):
 
             st.rerun()
 
+def get_crew_catalogue_page(crew_catalogue, key_prefix, llm_filter = False):
+
+    """
+    This function shows the search, LLM filter and page inputs of a saved crews listing.
+    Returns:
+        The saved crews on the selected page.
+    """
+
+    filter_columns = st.columns((2, 1) if llm_filter else (1,), gap = 'small')
+
+    with filter_columns[0]:
+
+        search = st.text_input('Search',
+                               placeholder = 'Search saved crews',
+                               key = f'{key_prefix}_search',
+                               label_visibility = 'collapsed')
+
+    llm = None
+
+    if llm_filter:
+
+        with filter_columns[1]:
+
+            llm = st.selectbox('LLM',
+                               [None] + crew_catalogue.get_llms(),
+                               format_func = lambda llm: llm or 'All LLMs',
+                               key = f'{key_prefix}_llm',
+                               label_visibility = 'collapsed')
+
+    page_key = f'{key_prefix}_page'
+
+    page = st.session_state.get(page_key, 1)
+
+    crews, number_of_crews = crew_catalogue.list_crews(search.strip(), llm, (page - 1) * crew_catalogue_page_size, crew_catalogue_page_size)
+
+    number_of_pages = max(1, math.ceil(number_of_crews / crew_catalogue_page_size))
+
+    # A narrower search can leave the selected page past the last one
+
+    if page > number_of_pages:
+
+        page = number_of_pages
+
+        crews, number_of_crews = crew_catalogue.list_crews(search.strip(), llm, (page - 1) * crew_catalogue_page_size, crew_catalogue_page_size)
+
+        st.session_state[page_key] = page
+
+    if number_of_pages > 1:
+
+        st.number_input(f'Page (of {number_of_pages}, {number_of_crews} crews)',
+                        min_value = 1,
+                        max_value = number_of_pages,
+                        step = 1,
+                        key = page_key)
+
+    return crews
+
+def show_crew_preview(crew_catalogue, crew):
+
+    if crew['error']:
+
+        return
+
+    if crew['crew_description']:
+
+        st.caption(crew['crew_description'][:300])
+
+    # Large texts are left unread, since the preview only shows the agents' names, roles and LLMs
+
+    try:
+
+        crew_data = crew_file_format.load_crew_file(crew_file_format.get_crew_file_path(crew_catalogue.saved_crews_directory, crew['crew_file_name']), load_texts = False)
+
+    except Exception:
+
+        return
+
+    st.caption(' · '.join(f"{agent_settings.get('agent_name') or agent_settings.get('agent_role')} ({agent_settings.get('agent_llm')})" for agent_settings in crew_data['agents_settings'][:10]) +
+               (' . . .' if len(crew_data['agents_settings']) > 10 else ''))
+
+def migrate_crew_file(crew_catalogue, crew_file_name):
+
+    # Crews saved in an older format are rewritten in the current one when they are loaded. A crew that cannot be rewritten still loads
+
+    try:
+
+        if crew_file_format.migrate_crew_file(crew_file_format.get_crew_file_path(crew_catalogue.saved_crews_directory, crew_file_name)):
+
+            crew_catalogue.update_crew(crew_file_name)
+
+    except OSError as exception:
+
+        st.session_state.logger.warning(f'There wan an error migrating crew: {str(exception)}')
+
+def get_crew_label(crew):
+
+    if crew['error']:
+
+        return f"📜 {crew['crew_file_name']} (unreadable)"
+
+    return f"📜 {crew['crew_file_name']} · {crew['number_of_agents']} agents, {crew['number_of_tasks']} tasks · {', '.join(crew['llms'])}"
+
 def format_filename(file_name):
 
     file_name = file_name.strip()
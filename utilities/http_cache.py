@@ -0,0 +1,268 @@
+import aiohttp
+import asyncio
+from contextlib import asynccontextmanager, nullcontext
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+from utilities.async_io_runner import AsyncIORunner, get_async_io_runner
+import utilities.metrics as metrics
+from utilities.sqlite_store import SQLiteStore
+
+class HostRequestLimiter:
+
+    """
+    Keeps a batch of requests polite: at most requests_per_host requests to a host at a time, started at least host_delay seconds apart.
+    A limiter belongs to the event loop it is first used on.
+    """
+
+    def __init__(self, requests_per_host: int = 2, host_delay: float = 0.5):
+
+        self.requests_per_host = requests_per_host
+
+        self.host_delay = host_delay
+
+        self.semaphores = {}
+
+        self.next_request_at = {}
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+
+        host = urlsplit(url).netloc
+
+        semaphore = self.semaphores.setdefault(host, asyncio.Semaphore(self.requests_per_host))
+
+        async with semaphore:
+
+            now = asyncio.get_running_loop().time()
+
+            request_at = max(now, self.next_request_at.get(host, now))
+
+            self.next_request_at[host] = request_at + self.host_delay
+
+            await asyncio.sleep(request_at - now)
+
+            yield
+
+class HTTPCache:
+
+    """
+    Caches what is extracted from HTTP responses, rather than the raw responses, in an SQLite store.
+    Extracted content is fresh for ttl seconds. Stale content is revalidated with its ETag or Last-Modified date,
+    so an unchanged page costs a 304 response instead of a download and another extraction.
+    Failed requests are remembered for negative_ttl seconds so a broken URL is not requested again by every task.
+    When revalidating stale content fails, the stale content is served instead, and revalidated again after negative_ttl seconds.
+    Requests are made with the pooled client of an AsyncIORunner, and the store and extraction run off its event loop.
+    Response bodies are streamed and cut off after max_content_bytes.
+    """
+
+    def __init__(self, sqlite_store: SQLiteStore, ttl: float = 3600, negative_ttl: float = 300, stale_ttl: float = 7 * 24 * 60 * 60, async_io_runner: AsyncIORunner = None, max_content_bytes: int = 2 * 1024 * 1024):
+
+        self.sqlite_store = sqlite_store
+
+        self.max_content_bytes = max_content_bytes
+
+        self.async_io_runner = async_io_runner
+
+        self.ttl = ttl
+
+        self.negative_ttl = negative_ttl
+
+        self.stale_ttl = stale_ttl
+
+        self.stats_lock = threading.Lock()
+
+        self.stats = {'hits': 0,
+                      'revalidations': 0,
+                      'misses': 0,
+                      'negative_hits': 0,
+                      'stale_hits': 0,
+                      'failures': 0,
+                      'bytes_downloaded': 0}
+
+    def get_async_io_runner(self) -> AsyncIORunner:
+
+        return self.async_io_runner or get_async_io_runner()
+
+    async def get(self, url: str, extract_function, namespace: str = 'text', headers: dict = None, host_request_limiter: HostRequestLimiter = None):
+
+        """
+        This function returns the content extracted from a URL, from the cache when possible.
+        Args:
+            url: The URL to request.
+            extract_function: A function that extracts JSON serializable content from the body of a successful response.
+            namespace: The name of the extraction, so different extractions of the same URL are cached separately.
+            headers: Optional request headers.
+            host_request_limiter: An optional limiter the request waits for. Cache hits do not wait.
+        Returns:
+            The extracted content.
+        Raises:
+            aiohttp.ClientError: The request failed now or within the last negative_ttl seconds, and no content was cached.
+            asyncio.TimeoutError: The request timed out, and no content was cached.
+        """
+
+        async_io_runner = self.get_async_io_runner()
+
+        key = f'{namespace}:{url}'
+
+        cached_entry = await async_io_runner.run_blocking(self.sqlite_store.get, key)
+
+        cached_entry = json.loads(cached_entry) if cached_entry is not None else None
+
+        if cached_entry is not None and cached_entry['status'] == 'Failed':
+
+            self.count('negative_hits')
+
+            raise aiohttp.ClientError(cached_entry['error'])
+
+        if cached_entry is not None and time.time() - cached_entry['fetched_at'] < self.ttl:
+
+            self.count('hits')
+
+            return cached_entry['content']
+
+        if cached_entry is not None and time.time() < cached_entry.get('retry_at', 0):
+
+            self.count('stale_hits')
+
+            return cached_entry['content']
+
+        request_headers = dict(headers or {})
+
+        if cached_entry is not None:
+
+            if cached_entry.get('etag'):
+
+                request_headers['If-None-Match'] = cached_entry['etag']
+
+            if cached_entry.get('last_modified'):
+
+                request_headers['If-Modified-Since'] = cached_entry['last_modified']
+
+        try:
+
+            async with host_request_limiter.limit(url) if host_request_limiter else nullcontext(), async_io_runner.get_session().get(url, headers = request_headers) as response:
+
+                if response.status == 304 and cached_entry is not None:
+
+                    self.count('revalidations')
+
+                    cached_entry['fetched_at'] = time.time()
+
+                    await async_io_runner.run_blocking(self.sqlite_store.set, key, json.dumps(cached_entry), self.stale_ttl)
+
+                    return cached_entry['content']
+
+                response.raise_for_status()
+
+                body = await self.read_content(response)
+
+                response_headers = response.headers
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exception:
+
+            self.count('failures')
+
+            if cached_entry is None:
+
+                await async_io_runner.run_blocking(self.sqlite_store.set, key, json.dumps({'status': 'Failed', 'error': str(exception) or type(exception).__name__}), self.negative_ttl)
+
+                raise
+
+            # The content that could not be revalidated is kept until it would have expired anyway
+
+            self.count('stale_hits')
+
+            cached_entry['retry_at'] = time.time() + self.negative_ttl
+
+            await async_io_runner.run_blocking(self.sqlite_store.set, key, json.dumps(cached_entry), max(1, cached_entry['fetched_at'] + self.stale_ttl - time.time()))
+
+            return cached_entry['content']
+
+        content = await async_io_runner.run_blocking(extract_function, body)
+
+        self.count('misses')
+
+        self.count('bytes_downloaded', len(body))
+
+        if 'no-store' not in response_headers.get('Cache-Control', ''):
+
+            cached_entry = {'status': 'Succeeded',
+                            'content': content,
+                            'etag': response_headers.get('ETag'),
+                            'last_modified': response_headers.get('Last-Modified'),
+                            'fetched_at': time.time()}
+
+            await async_io_runner.run_blocking(self.sqlite_store.set, key, json.dumps(cached_entry), self.stale_ttl)
+
+        return content
+
+    async def read_content(self, response: aiohttp.ClientResponse) -> bytes:
+
+        chunks = []
+
+        size = 0
+
+        async for chunk in response.content.iter_chunked(64 * 1024):
+
+            chunks.append(chunk[:self.max_content_bytes - size])
+
+            size += len(chunks[-1])
+
+            if size >= self.max_content_bytes:
+
+                break
+
+        return b''.join(chunks)
+
+    def count(self, name: str, amount: int = 1):
+
+        with self.stats_lock:
+
+            self.stats[name] += amount
+
+        if name == 'bytes_downloaded':
+
+            metrics.http_cache_downloaded_bytes.inc(amount)
+
+        else:
+
+            metrics.http_cache_requests.inc(amount, result = name)
+
+    def get_stats(self):
+
+        with self.stats_lock:
+
+            return dict(self.stats)
+
+    def clear(self):
+
+        self.sqlite_store.clear()
+
+http_cache = None
+
+http_cache_lock = threading.Lock()
+
+def get_http_cache() -> HTTPCache:
+
+    """
+    This function returns the process-wide HTTP cache, configured from the HTTP_Cache_TTL, HTTP_Cache_Negative_TTL (seconds),
+    HTTP_Cache_Max_Entries and HTTP_Cache_Max_Content_Bytes environment variables when it is first used.
+    """
+
+    global http_cache
+
+    with http_cache_lock:
+
+        if http_cache is None:
+
+            http_cache = HTTPCache(SQLiteStore('./cache/http_cache.sqlite',
+                                               table_name = 'http_responses',
+                                               max_entries = int(os.getenv('HTTP_Cache_Max_Entries', '5000'))),
+                                   ttl = float(os.getenv('HTTP_Cache_TTL', '3600')),
+                                   negative_ttl = float(os.getenv('HTTP_Cache_Negative_TTL', '300')),
+                                   max_content_bytes = int(os.getenv('HTTP_Cache_Max_Content_Bytes', str(2 * 1024 * 1024))))
+
+        return http_cache
@@ -0,0 +1,253 @@
+from collections import OrderedDict
+import httpx
+from langchain_community.llms import ollama
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+from langchain_openai import ChatOpenAI
+import threading
+from utilities.llm_response_cache import get_llm_response_cache
+from utilities.metrics import LLMMetricsCallbackHandler
+from utilities.mock_llm import build_mock_llm
+from utilities.rate_limiter import RateLimitCallbackHandler
+from utilities.run_profiler import ProfilingCallbackHandler
+
+class ChatModelRunTracker(BaseCallbackHandler):
+
+    """
+    Remembers the run each thread last started on a chat model, since streamed requests are sent without their run manager.
+    """
+
+    def __init__(self):
+
+        self.local = threading.local()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+
+        self.local.run_id = run_id
+
+    def get_run_id(self):
+
+        return getattr(self.local, 'run_id', None)
+
+class ProviderRequestMixin:
+
+    """
+    Calls the on_chat_model_request callback of a chat model's handlers when a request is actually sent to the provider.
+    Chat models start their callbacks before the response cache is looked up, so the metrics, profiling and rate limiting handlers
+    start a request from on_chat_model_request, and prompts answered from the cache are neither counted nor made to wait.
+    """
+
+    def _generate(self, messages, stop = None, run_manager = None, **kwargs):
+
+        start_provider_request(self, run_manager, messages)
+
+        return super()._generate(messages, stop = stop, run_manager = run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop = None, run_manager = None, **kwargs):
+
+        start_provider_request(self, run_manager, messages)
+
+        return await super()._agenerate(messages, stop = stop, run_manager = run_manager, **kwargs)
+
+    def _stream(self, messages, stop = None, run_manager = None, **kwargs):
+
+        start_provider_request(self, run_manager, messages)
+
+        yield from super()._stream(messages, stop = stop, run_manager = run_manager, **kwargs)
+
+    async def _astream(self, messages, stop = None, run_manager = None, **kwargs):
+
+        start_provider_request(self, run_manager, messages)
+
+        async for chunk in super()._astream(messages, stop = stop, run_manager = run_manager, **kwargs):
+
+            yield chunk
+
+def start_provider_request(llm, run_manager, messages):
+
+    if run_manager is not None:
+
+        # Clients set to stream call _stream from _generate, so a request is reported only once per run
+
+        if getattr(run_manager, 'provider_request_started', False):
+
+            return
+
+        run_manager.provider_request_started = True
+
+        handlers, run_id = run_manager.handlers, run_manager.run_id
+
+    else:
+
+        # Streamed requests, which crewAI agents make, skip the response cache and call _stream without its run manager, right after the run was started on the same thread
+
+        handlers = llm.callbacks or []
+
+        run_id = next((handler.get_run_id() for handler in handlers if isinstance(handler, ChatModelRunTracker)), None)
+
+        if run_id is None:
+
+            return
+
+    for handler in handlers:
+
+        if hasattr(handler, 'on_chat_model_request'):
+
+            handler.on_chat_model_request([messages], run_id = run_id)
+
+class RegistryChatNVIDIA(ProviderRequestMixin, ChatNVIDIA):
+
+    """
+    A ChatNVIDIA client that reports the requests it sends to the provider to its callbacks.
+    """
+
+class RegistryChatOpenAI(ProviderRequestMixin, ChatOpenAI):
+
+    """
+    A ChatOpenAI client that reports the requests it sends to the provider to its callbacks.
+    """
+
+class LLMRegistry:
+
+    """
+    A process-wide registry of LLM clients.
+    Clients are built on first use and cached by (provider, model, temperature, response caching)
+    with least recently used eviction, so they are shared by every crew run and session.
+    """
+
+    nvidia_base_url = 'https://integrate.api.nvidia.com/v1'
+
+    llm_catalogue = {'DBRX 132B': ('Ollama', 'dbrx'),
+                     'Gemma 7B': ('Ollama', 'gemma'),
+                     'Llama 3 8B': ('Ollama', 'llama3'),
+                     'Llama 3 8B Dolphin': ('Ollama', 'dolphin-llama3'),
+                     'Mistral 7B': ('Ollama', 'mistral'),
+                     'Mistral 7B Dolphin': ('Ollama', 'dolphin-mistral'),
+                     'Mixtral 8 X 7B': ('Ollama', 'mixtral'),
+                     'Mixtral 8 X 7B Dolphin': ('Ollama', 'dolphin-mixtral'),
+                     'Mock LLM': ('Mock', 'mock'),
+                     'NVIDIA Llama 3 70B Instruct': ('NVIDIA', 'meta/llama3-70b-instruct'),
+                     'NVIDIA Mistral Large': ('NVIDIA', 'mistralai/mistral-large'),
+                     'NVIDIA Mixtral 8 X 22B Instruct': ('NVIDIA', 'mistralai/mixtral-8x22b-instruct-v0.1'),
+                     'NVIDIA Nemotron 4 340B Instruct': ('NVIDIA', 'nvidia/nemotron-4-340b-instruct'),
+                     'OpenAI GPT 3.5 Turbo': ('OpenAI', 'gpt-3.5-turbo'),
+                     'OpenAI GPT 3.5 Turbo 0125': ('OpenAI', 'gpt-3.5-turbo-0125'),
+                     'OpenAI GPT 4': ('OpenAI', 'gpt-4'),
+                     'OpenAI GPT 4O': ('OpenAI', 'gpt-4o'),
+                     'Openhermes': ('Ollama', 'openhermes'),
+                     'Phi 3 Mini 3.8B': ('Ollama', 'phi3'),
+                     'WizardLM 2 7B': ('Ollama', 'wizardlm2'),
+                     'Zephyr 7B': ('Ollama', 'zephyr')}
+
+    def __init__(self, max_size: int = 32):
+
+        self.max_size = max_size
+
+        self.llms = OrderedDict()
+
+        self.lock = threading.Lock()
+
+        self.openai_http_client = None
+
+    def get_llm(self, selected_llm: str, selected_temperature: float, use_response_cache: bool = False):
+
+        """
+        This function returns a client for the selected LLM, building it only if it is not cached.
+        Args:
+            selected_llm: The LLM name as listed in the LLM catalogue.
+            selected_temperature: The LLM temperature.
+            use_response_cache: Whether the client answers repeated prompts from the on-disk LLM response cache.
+        Returns:
+            A copy of the cached LLM client with its own list of callbacks.
+        """
+
+        llm = self.get_cached_llm(selected_llm, selected_temperature, use_response_cache)
+
+        # crewAI adds the token counting handler of an agent to the callbacks of its LLM, so every agent gets a shallow copy of the cached client.
+        # The copy shares its connection pool and response cache, and the cached client keeps only the registry's callbacks.
+        # Fields left out of serialization, such as the callbacks and the OpenAI client, are left out of copies too, so every field is passed again
+
+        return llm.copy(update = dict(vars(llm), callbacks = list(llm.callbacks or [])))
+
+    def get_cached_llm(self, selected_llm: str, selected_temperature: float, use_response_cache: bool = False):
+
+        provider, model = self.llm_catalogue[selected_llm]
+
+        key = (provider, model, round(float(selected_temperature), 2), use_response_cache)
+
+        with self.lock:
+
+            if key in self.llms:
+
+                self.llms.move_to_end(key)
+
+                return self.llms[key]
+
+        llm = self.build_llm(provider, model, key[2], get_llm_response_cache(provider, model, key[2]) if use_response_cache else False)
+
+        with self.lock:
+
+            if key in self.llms:
+
+                self.llms.move_to_end(key)
+
+                return self.llms[key]
+
+            self.llms[key] = llm
+
+            while len(self.llms) > self.max_size:
+
+                self.llms.popitem(last = False)
+
+        return llm
+
+    def get_provider(self, selected_llm: str) -> str:
+
+        return self.llm_catalogue[selected_llm][0]
+
+    def build_llm(self, provider: str, model: str, temperature: float, cache):
+
+        # Every request is counted in the metrics, timed in the profile of its run and waits for the rate limiter shared by all agents, crews and sessions using the model.
+        # The metrics and profiling handlers come first so the time spent waiting is part of the call
+
+        callbacks = [LLMMetricsCallbackHandler(provider, model), ProfilingCallbackHandler(provider, model), RateLimitCallbackHandler(provider, model)]
+
+        if provider == 'Ollama':
+
+            return ollama.Ollama(model = model, temperature = temperature, cache = cache, callbacks = callbacks)
+
+        elif provider == 'NVIDIA':
+
+            return RegistryChatNVIDIA(model = model, temperature = temperature, base_url = self.nvidia_base_url, cache = cache, callbacks = [ChatModelRunTracker()] + callbacks)
+
+        elif provider == 'OpenAI':
+
+            return RegistryChatOpenAI(model_name = model, temperature = temperature, http_client = self.get_openai_http_client(), cache = cache, callbacks = [ChatModelRunTracker()] + callbacks)
+
+        elif provider == 'Mock':
+
+            return build_mock_llm(model, temperature, cache = cache, callbacks = callbacks)
+
+        else:
+
+            raise ValueError(f'Unknown LLM provider: {provider}')
+
+    def get_openai_http_client(self) -> httpx.Client:
+
+        # One connection pool is shared by every OpenAI client so evicting or adding a client does not drop open connections
+
+        with self.lock:
+
+            if self.openai_http_client is None:
+
+                self.openai_http_client = httpx.Client(limits = httpx.Limits(max_connections = 100, max_keepalive_connections = 20))
+
+            return self.openai_http_client
+
+    def clear(self):
+
+        with self.lock:
+
+            self.llms.clear()
+
+llm_registry = LLMRegistry()
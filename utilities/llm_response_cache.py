@@ -0,0 +1,94 @@
+import hashlib
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+import os
+import threading
+import utilities.metrics as metrics
+from utilities.sqlite_store import SQLiteStore
+
+class LLMResponseCache(BaseCache):
+
+    """
+    An on-disk cache of LLM responses for one provider, model and temperature.
+    Responses are keyed by a hash of the full prompt (the message list for chat models) and the LLM parameters, such as stop words.
+    """
+
+    def __init__(self, sqlite_store: SQLiteStore, provider: str, model: str, temperature: float):
+
+        self.sqlite_store = sqlite_store
+
+        self.provider = provider
+
+        self.model = model
+
+        self.temperature = temperature
+
+    def get_key(self, prompt: str, llm_string: str) -> str:
+
+        prompt_hash = hashlib.sha256((prompt + '\n' + llm_string).encode('utf-8')).hexdigest()
+
+        return f'{self.provider}:{self.model}:{self.temperature}:{prompt_hash}'
+
+    def lookup(self, prompt: str, llm_string: str):
+
+        cached_response = self.sqlite_store.get(self.get_key(prompt, llm_string))
+
+        metrics.llm_response_cache_lookups.inc(result = 'miss' if cached_response is None else 'hit')
+
+        if cached_response is None:
+
+            return None
+
+        return loads(cached_response)
+
+    def update(self, prompt: str, llm_string: str, return_val):
+
+        self.sqlite_store.set(self.get_key(prompt, llm_string), dumps(list(return_val)))
+
+    def clear(self, **kwargs):
+
+        self.sqlite_store.clear()
+
+llm_response_store = None
+
+llm_response_store_lock = threading.Lock()
+
+def get_llm_response_store() -> SQLiteStore:
+
+    """
+    This function returns the process-wide response store, configured from the LLM_Response_Cache_Max_Entries
+    and LLM_Response_Cache_TTL (seconds) environment variables when it is first used.
+    """
+
+    global llm_response_store
+
+    with llm_response_store_lock:
+
+        if llm_response_store is None:
+
+            llm_response_store = SQLiteStore('./cache/llm_responses.sqlite',
+                                             table_name = 'llm_responses',
+                                             max_entries = int(os.getenv('LLM_Response_Cache_Max_Entries', '10000')),
+                                             ttl = float(os.getenv('LLM_Response_Cache_TTL', str(7 * 24 * 60 * 60))))
+
+        return llm_response_store
+
+def get_llm_response_cache(provider: str, model: str, temperature: float) -> LLMResponseCache:
+
+    return LLMResponseCache(get_llm_response_store(), provider, model, temperature)
+
+def get_llm_response_cache_stats():
+
+    # Reading the counters does not open the store, so runs without a response cache leave no database behind
+
+    if llm_response_store is None:
+
+        return {'hits': 0, 'misses': 0}
+
+    return llm_response_store.get_stats()
+
+def get_llm_response_cache_stats_since(cache_stats):
+
+    current_cache_stats = get_llm_response_cache_stats()
+
+    return {name: current_cache_stats[name] - cache_stats[name] for name in current_cache_stats}
@@ -0,0 +1,230 @@
+import atexit
+import copy
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from utilities.run_profiler import current_run_profile
+
+current_session_id = ContextVar('current_session_id', default = None)
+
+def set_session_id(session_id: str):
+
+    """
+    This function sets the session ID stamped on the records logged by this thread, such as a Streamlit script thread.
+    """
+
+    current_session_id.set(session_id)
+
+class LogContextFilter(logging.Filter):
+
+    """
+    Stamps every record with the session ID, crew name and run ID of the context that logged it.
+    It runs in the logging thread, before the record is queued for the background writer.
+    """
+
+    def filter(self, record):
+
+        run_profile = current_run_profile.get()
+
+        record.session_id = getattr(record, 'session_id', None) or current_session_id.get()
+
+        record.crew_name = getattr(record, 'crew_name', None) or (run_profile.crew_name if run_profile else None)
+
+        record.run_id = getattr(record, 'run_id', None) or (run_profile.run_id if run_profile else None)
+
+        return True
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+
+    """
+    Queues records with their message and traceback already rendered, since their arguments may not outlive the call that logged them.
+    """
+
+    def prepare(self, record):
+
+        record = copy.copy(record)
+
+        record.msg = record.getMessage()
+
+        record.args = None
+
+        if record.exc_info:
+
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+
+            record.exc_info = None
+
+        return record
+
+class JSONFormatter(logging.Formatter):
+
+    """
+    Formats records as one JSON object per line, so the log can be searched with grep, zgrep and jq.
+    """
+
+    def format(self, record):
+
+        log_entry = {'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec = 'milliseconds'),
+                     'level': record.levelname,
+                     'logger': record.name,
+                     'message': record.getMessage(),
+                     'session_id': getattr(record, 'session_id', None),
+                     'crew_name': getattr(record, 'crew_name', None),
+                     'run_id': getattr(record, 'run_id', None)}
+
+        if record.exc_text:
+
+            log_entry['exception'] = record.exc_text
+
+        return json.dumps(log_entry, ensure_ascii = False)
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+
+    """
+    A file handler that rolls the log over once it reaches max_bytes or once it is interval seconds old,
+    and compresses the rolled over files with gzip as <file>.1.gz, <file>.2.gz, and so on.
+    """
+
+    def __init__(self, filename, max_bytes: int = 10 * 1024 * 1024, interval: float = 86400, backup_count: int = 14):
+
+        super().__init__(filename, maxBytes = max_bytes, backupCount = backup_count, encoding = 'utf-8', delay = True)
+
+        self.interval = interval
+
+        self.rollover_at = self.get_rollover_at()
+
+        self.namer = lambda name: name + '.gz'
+
+        self.rotator = self.compress
+
+    def get_rollover_at(self):
+
+        opened_at = os.path.getmtime(self.baseFilename) if os.path.exists(self.baseFilename) else time.time()
+
+        return opened_at + self.interval if self.interval else None
+
+    def shouldRollover(self, record):
+
+        if self.rollover_at is not None and time.time() >= self.rollover_at and os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+
+            return True
+
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+
+        super().doRollover()
+
+        self.rollover_at = time.time() + self.interval if self.interval else None
+
+    @staticmethod
+    def compress(source, destination):
+
+        with open(source, 'rb') as source_file, gzip.open(destination, 'wb') as destination_file:
+
+            shutil.copyfileobj(source_file, destination_file)
+
+        os.remove(source)
+
+class LogPipeline:
+
+    """
+    A queue of log records shared by every session, written to a rotating JSON lines file and to stdout by one background thread,
+    so logging never waits for disk I/O on a Streamlit script thread.
+    """
+
+    def __init__(self, log_file_path: str, level = logging.ERROR, max_bytes: int = 10 * 1024 * 1024, interval: float = 86400, backup_count: int = 14, stdout = True):
+
+        os.makedirs(os.path.dirname(log_file_path) or '.', exist_ok = True)
+
+        self.level = level
+
+        self.log_queue = queue.SimpleQueue()
+
+        self.queue_handler = RecordQueueHandler(self.log_queue)
+
+        self.queue_handler.addFilter(LogContextFilter())
+
+        file_handler = CompressingRotatingFileHandler(log_file_path, max_bytes = max_bytes, interval = interval, backup_count = backup_count)
+
+        file_handler.setFormatter(JSONFormatter())
+
+        handlers = [file_handler]
+
+        if stdout:
+
+            stdout_handler = logging.StreamHandler(sys.stdout)
+
+            stdout_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s: %(message)s'))
+
+            handlers.append(stdout_handler)
+
+        self.queue_listener = logging.handlers.QueueListener(self.log_queue, *handlers, respect_handler_level = True)
+
+        self.queue_listener.start()
+
+        self.is_stopped = False
+
+        atexit.register(self.stop)
+
+    def get_logger(self, name: str) -> logging.Logger:
+
+        logger = logging.getLogger(name)
+
+        if self.queue_handler not in logger.handlers:
+
+            logger.setLevel(self.level)
+
+            logger.propagate = False
+
+            logger.addHandler(self.queue_handler)
+
+        return logger
+
+    def stop(self):
+
+        # Records still queued are written before the listener thread ends
+
+        if not self.is_stopped:
+
+            self.is_stopped = True
+
+            self.queue_listener.stop()
+
+log_pipeline = None
+
+log_pipeline_lock = threading.Lock()
+
+def get_log_pipeline() -> LogPipeline:
+
+    """
+    This function returns the process-wide log pipeline, configured from the Log_File (./logs/platform_log.jsonl by default), Log_Level,
+    Log_Max_Bytes, Log_Rotation_Interval (seconds, 0 for size-based rotation only) and Log_Backup_Count environment variables when it is first used.
+    """
+
+    global log_pipeline
+
+    with log_pipeline_lock:
+
+        if log_pipeline is None:
+
+            log_pipeline = LogPipeline(os.getenv('Log_File', './logs/platform_log.jsonl'),
+                                       level = logging.getLevelName(os.getenv('Log_Level', 'ERROR').upper()),
+                                       max_bytes = int(os.getenv('Log_Max_Bytes', str(10 * 1024 * 1024))),
+                                       interval = float(os.getenv('Log_Rotation_Interval', '86400')),
+                                       backup_count = int(os.getenv('Log_Backup_Count', '14')))
+
+        return log_pipeline
+
+def get_logger(name: str) -> logging.Logger:
+
+    return get_log_pipeline().get_logger(name)
@@ -0,0 +1,552 @@
+import bisect
+import functools
+import http.server
+from langchain_core.callbacks import BaseCallbackHandler
+import os
+import threading
+import time
+
+# Latency buckets in seconds, from a cached tool call up to a long crew run
+
+default_buckets = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+def escape_label_value(value):
+
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(label_names, label_values, extra_labels = ()):
+
+    labels = list(zip(label_names, label_values)) + list(extra_labels)
+
+    if not labels:
+
+        return ''
+
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + '}'
+
+def format_value(value):
+
+    if value == float('inf'):
+
+        return '+Inf'
+
+    return repr(float(value))
+
+class Metric:
+
+    """
+    A metric with a value for every combination of its label values.
+    """
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, label_names = ()):
+
+        self.name = name
+
+        self.documentation = documentation
+
+        self.label_names = tuple(label_names)
+
+        self.values = {}
+
+        self.lock = threading.Lock()
+
+    def get_label_values(self, labels: dict):
+
+        return tuple(str(labels.get(label_name, '')) for label_name in self.label_names)
+
+    def get_samples(self):
+
+        with self.lock:
+
+            return [(self.name, label_values, (), value) for label_values, value in self.values.items()]
+
+    def render(self):
+
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+
+        for sample_name, label_values, extra_labels, value in self.get_samples():
+
+            lines.append(f'{sample_name}{format_labels(self.label_names, label_values, extra_labels)} {format_value(value)}')
+
+        return '\n'.join(lines)
+
+class Counter(Metric):
+
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+
+        label_values = self.get_label_values(labels)
+
+        with self.lock:
+
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get_snapshot(self):
+
+        with self.lock:
+
+            return dict(self.values)
+
+    def merge(self, snapshot):
+
+        for label_values, value in snapshot.items():
+
+            with self.lock:
+
+                self.values[tuple(label_values)] = self.values.get(tuple(label_values), 0) + value
+
+    @staticmethod
+    def get_delta(snapshot, previous_snapshot):
+
+        return {label_values: value - previous_snapshot.get(label_values, 0) for label_values, value in snapshot.items() if value != previous_snapshot.get(label_values, 0)}
+
+class Gauge(Metric):
+
+    """
+    A value that goes up and down. A gauge with a function reads its values when the metrics are rendered,
+    and the function returns either a number or a dictionary of label values to numbers.
+    """
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, label_names = (), function = None):
+
+        super().__init__(name, documentation, label_names)
+
+        self.function = function
+
+    def set_function(self, function):
+
+        self.function = function
+
+    def inc(self, amount: float = 1, **labels):
+
+        label_values = self.get_label_values(labels)
+
+        with self.lock:
+
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+
+        with self.lock:
+
+            self.values[self.get_label_values(labels)] = value
+
+    def get_samples(self):
+
+        if self.function is None:
+
+            return super().get_samples()
+
+        values = self.function()
+
+        if values is None:
+
+            return []
+
+        if not isinstance(values, dict):
+
+            values = {(): values}
+
+        return [(self.name, label_values if isinstance(label_values, tuple) else (label_values,), (), value) for label_values, value in values.items()]
+
+class Histogram(Metric):
+
+    """
+    Counts observations in cumulative buckets, with their sum and count.
+    """
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names = (), buckets = default_buckets):
+
+        super().__init__(name, documentation, label_names)
+
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+
+        label_values = self.get_label_values(labels)
+
+        with self.lock:
+
+            bucket_counts, total = self.values.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+
+            bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+
+            total[0] += value
+
+    def get_samples(self):
+
+        samples = []
+
+        with self.lock:
+
+            for label_values, (bucket_counts, total) in self.values.items():
+
+                cumulative_count = 0
+
+                for upper_bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+
+                    cumulative_count += bucket_count
+
+                    samples.append((f'{self.name}_bucket', label_values, (('le', format_value(upper_bound)),), cumulative_count))
+
+                samples.append((f'{self.name}_sum', label_values, (), total[0]))
+
+                samples.append((f'{self.name}_count', label_values, (), cumulative_count))
+
+        return samples
+
+    def get_snapshot(self):
+
+        with self.lock:
+
+            return {label_values: (list(bucket_counts), total[0]) for label_values, (bucket_counts, total) in self.values.items()}
+
+    def merge(self, snapshot):
+
+        for label_values, (bucket_counts, total) in snapshot.items():
+
+            with self.lock:
+
+                current_bucket_counts, current_total = self.values.setdefault(tuple(label_values), ([0] * (len(self.buckets) + 1), [0.0]))
+
+                for index, bucket_count in enumerate(bucket_counts):
+
+                    current_bucket_counts[index] += bucket_count
+
+                current_total[0] += total
+
+    @staticmethod
+    def get_delta(snapshot, previous_snapshot):
+
+        delta = {}
+
+        for label_values, (bucket_counts, total) in snapshot.items():
+
+            previous_bucket_counts, previous_total = previous_snapshot.get(label_values, ([0] * len(bucket_counts), 0.0))
+
+            if bucket_counts != previous_bucket_counts:
+
+                delta[label_values] = ([count - previous_count for count, previous_count in zip(bucket_counts, previous_bucket_counts)], total - previous_total)
+
+        return delta
+
+class MetricsRegistry:
+
+    """
+    The metrics of this process, rendered in the Prometheus text format.
+    Counters and histograms can be snapshot in a worker process and merged into the registry of the process that scrapes them.
+    """
+
+    def __init__(self):
+
+        self.metrics = {}
+
+        self.lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+
+        with self.lock:
+
+            if metric.name in self.metrics:
+
+                raise ValueError(f'Metric {metric.name} is already registered')
+
+            self.metrics[metric.name] = metric
+
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names = ()) -> Counter:
+
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names = (), function = None) -> Gauge:
+
+        return self.register(Gauge(name, documentation, label_names, function))
+
+    def histogram(self, name: str, documentation: str, label_names = (), buckets = default_buckets) -> Histogram:
+
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+
+        with self.lock:
+
+            metrics = list(self.metrics.values())
+
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+    def get_snapshot(self):
+
+        """
+        This function returns the values of the counters and histograms, which can be pickled and sent to another process.
+        """
+
+        with self.lock:
+
+            return {name: metric.get_snapshot() for name, metric in self.metrics.items() if isinstance(metric, (Counter, Histogram))}
+
+    def get_snapshot_since(self, previous_snapshot):
+
+        snapshot = self.get_snapshot()
+
+        with self.lock:
+
+            return {name: self.metrics[name].get_delta(values, previous_snapshot.get(name, {})) for name, values in snapshot.items()}
+
+    def merge(self, snapshot):
+
+        for name, values in (snapshot or {}).items():
+
+            metric = self.metrics.get(name)
+
+            if metric is not None:
+
+                metric.merge(values)
+
+metrics_registry = MetricsRegistry()
+
+# Sessions and crews. The gauges with functions are set by the modules that know their values
+
+active_sessions = metrics_registry.gauge('andalem_active_sessions', 'Streamlit sessions connected to the platform.')
+
+inline_crews_running = metrics_registry.gauge('andalem_inline_crews_running', 'Crews running in a Streamlit session.')
+
+scheduled_crews_running = metrics_registry.gauge('andalem_scheduled_crews_running', 'Crews running on the crew scheduler process pool.')
+
+scheduled_crews_queued = metrics_registry.gauge('andalem_scheduled_crews_queued', 'Crews queued on the crew scheduler, by priority.', ['priority'])
+
+scheduled_crews_running_per_provider = metrics_registry.gauge('andalem_scheduled_crews_running_per_provider', 'Crews running on the crew scheduler, by LLM provider.', ['provider'])
+
+crew_runs = metrics_registry.counter('andalem_crew_runs_total', 'Finished crew runs, by where they ran and their status.', ['mode', 'status'])
+
+crew_run_seconds = metrics_registry.histogram('andalem_crew_run_seconds', 'Crew run wall time, from kickoff to the final output.', ['mode'])
+
+# LLM requests
+
+llm_requests_in_flight = metrics_registry.gauge('andalem_llm_requests_in_flight', 'LLM requests sent and not yet answered, by provider.', ['provider'])
+
+llm_requests = metrics_registry.counter('andalem_llm_requests_total', 'Finished LLM requests, by provider, model and status.', ['provider', 'model', 'status'])
+
+llm_request_seconds = metrics_registry.histogram('andalem_llm_request_seconds', 'LLM request latency, including any rate limiter wait.', ['provider'])
+
+llm_tokens = metrics_registry.counter('andalem_llm_tokens_total', 'Tokens reported by LLM providers, by provider and type.', ['provider', 'type'])
+
+llm_rate_limit_wait_seconds = metrics_registry.histogram('andalem_llm_rate_limit_wait_seconds', 'Time LLM requests queued on the rate limiter, by provider.', ['provider'])
+
+llm_response_cache_lookups = metrics_registry.counter('andalem_llm_response_cache_lookups_total', 'LLM response cache lookups, by result.', ['result'])
+
+# Tools
+
+tool_calls = metrics_registry.counter('andalem_tool_calls_total', 'Tool calls, by tool and whether they raised.', ['tool', 'status'])
+
+tool_call_seconds = metrics_registry.histogram('andalem_tool_call_seconds', 'Tool call latency, by tool.', ['tool'])
+
+tool_errors = metrics_registry.counter('andalem_tool_errors_total', 'Errors tools handled and reported to the agent, by tool and operation.', ['tool', 'operation'])
+
+http_cache_requests = metrics_registry.counter('andalem_http_cache_requests_total', 'HTTP cache requests, by result.', ['result'])
+
+http_cache_downloaded_bytes = metrics_registry.counter('andalem_http_cache_downloaded_bytes_total', 'Bytes downloaded by the HTTP cache.')
+
+def count_tool_run(tool_name: str, tool_run):
+
+    """
+    This function wraps the _run method of a tool so every call is counted and timed.
+    """
+
+    @functools.wraps(tool_run)
+    def counted_tool_run(*args, **kwargs):
+
+        started_at = time.perf_counter()
+
+        status = 'Failed'
+
+        try:
+
+            output = tool_run(*args, **kwargs)
+
+            status = 'Succeeded'
+
+            return output
+
+        finally:
+
+            tool_calls.inc(tool = tool_name, status = status)
+
+            tool_call_seconds.observe(time.perf_counter() - started_at, tool = tool_name)
+
+    return counted_tool_run
+
+class LLMMetricsCallbackHandler(BaseCallbackHandler):
+
+    """
+    Counts and times every request of an LLM client, and the tokens the provider reports.
+    """
+
+    def __init__(self, provider: str, model: str):
+
+        self.provider = provider
+
+        self.model = model
+
+        self.started_at = {}
+
+        self.lock = threading.Lock()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+
+        self.start_request(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+
+        # Chat models call this before their response cache is looked up, so a request is started from on_chat_model_request instead
+
+        return
+
+    def on_chat_model_request(self, messages, *, run_id):
+
+        self.start_request(run_id)
+
+    def start_request(self, run_id):
+
+        with self.lock:
+
+            self.started_at[run_id] = time.perf_counter()
+
+        llm_requests_in_flight.inc(provider = self.provider)
+
+    def finish_request(self, run_id, status: str):
+
+        with self.lock:
+
+            started_at = self.started_at.pop(run_id, None)
+
+        if started_at is None:
+
+            return
+
+        llm_requests_in_flight.dec(provider = self.provider)
+
+        llm_requests.inc(provider = self.provider, model = self.model, status = status)
+
+        llm_request_seconds.observe(time.perf_counter() - started_at, provider = self.provider)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+
+        self.finish_request(run_id, 'Succeeded')
+
+        token_usage = (response.llm_output or {}).get('token_usage') or {}
+
+        for token_type in ('prompt_tokens', 'completion_tokens'):
+
+            if token_usage.get(token_type):
+
+                llm_tokens.inc(token_usage[token_type], provider = self.provider, type = token_type.removesuffix('_tokens'))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+
+        self.finish_request(run_id, 'Failed')
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+
+            self.send_error(404)
+
+            return
+
+        body = metrics_registry.render().encode('utf-8')
+
+        self.send_response(200)
+
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+
+        self.send_header('Content-Length', str(len(body)))
+
+        self.end_headers()
+
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+
+        pass
+
+def write_metrics_file(metrics_file_path: str):
+
+    # The file is replaced in one step, so a scraper never reads a partial file
+
+    temporary_file_path = f'{metrics_file_path}.{os.getpid()}.tmp'
+
+    with open(temporary_file_path, 'w') as metrics_file:
+
+        metrics_file.write(metrics_registry.render())
+
+    os.replace(temporary_file_path, metrics_file_path)
+
+def write_metrics_file_periodically(metrics_file_path: str, interval: float):
+
+    while True:
+
+        try:
+
+            write_metrics_file(metrics_file_path)
+
+        except OSError:
+
+            pass
+
+        time.sleep(interval)
+
+metrics_exporter_started = False
+
+metrics_exporter_lock = threading.Lock()
+
+def start_metrics_exporter():
+
+    """
+    This function exposes the metrics of this process once, as configured by the environment variables:
+    Metrics_Port serves them at http://Metrics_Host:Metrics_Port/metrics (127.0.0.1 by default),
+    and Metrics_File writes them to a file every Metrics_File_Interval seconds (15 by default), for a node exporter textfile collector.
+    Neither is started if the variables are not set.
+    """
+
+    global metrics_exporter_started
+
+    with metrics_exporter_lock:
+
+        if metrics_exporter_started:
+
+            return
+
+        metrics_exporter_started = True
+
+        if os.getenv('Metrics_Port'):
+
+            metrics_server = http.server.ThreadingHTTPServer((os.getenv('Metrics_Host', '127.0.0.1'), int(os.getenv('Metrics_Port'))), MetricsRequestHandler)
+
+            metrics_server.daemon_threads = True
+
+            threading.Thread(target = metrics_server.serve_forever, name = 'metrics-server', daemon = True).start()
+
+        if os.getenv('Metrics_File'):
+
+            metrics_file_path = os.getenv('Metrics_File')
+
+            os.makedirs(os.path.dirname(metrics_file_path) or '.', exist_ok = True)
+
+            threading.Thread(target = write_metrics_file_periodically,
+                             args = (metrics_file_path, float(os.getenv('Metrics_File_Interval', '15'))),
+                             name = 'metrics-file-writer',
+                             daemon = True).start()
@@ -0,0 +1,207 @@
+import hashlib
+import itertools
+import json
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.outputs import Generation, LLMResult
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, List, Optional
+
+mock_words = ('the', 'filing', 'market', 'notice', 'company', 'revenue', 'quarter', 'growth', 'risk', 'report', 'analysis', 'result',
+              'guidance', 'margin', 'regulator', 'disclosure', 'outlook', 'segment', 'demand', 'cost', 'summary', 'key', 'point', 'trend')
+
+class MockLLM(BaseLLM):
+
+    """
+    An offline LLM for load tests and benchmarks that answers in the ReAct format crewAI agents expect.
+    Responses are either scripted, and returned in order, or generated from a seed and the prompt, so the same prompt always gets the same response.
+    A generated response uses one of the tools offered in the prompt until the task has tool_calls_per_task observations, then gives a final answer.
+    latency and tokens_per_second simulate the time a real model takes to start and to generate its response.
+    """
+
+    model: str = 'mock'
+
+    temperature: float = 0.0
+
+    seed: int = 0
+
+    responses: Optional[List[str]] = None
+
+    tool_calls_per_task: int = 1
+
+    final_answer_words: int = 50
+
+    latency: float = 0.0
+
+    tokens_per_second: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+
+        return 'mock'
+
+    @property
+    def _identifying_params(self):
+
+        return {'model': self.model, 'temperature': self.temperature, 'seed': self.seed}
+
+    def _generate(self, prompts: List[str], stop: Optional[List[str]] = None, run_manager = None, **kwargs: Any) -> LLMResult:
+
+        generations = []
+
+        prompt_tokens = 0
+
+        completion_tokens = 0
+
+        for prompt in prompts:
+
+            started_at = time.monotonic()
+
+            response = self.get_response(prompt)
+
+            prompt_tokens += len(prompt) // 4 + 1
+
+            completion_tokens += len(response) // 4 + 1
+
+            if self.tokens_per_second:
+
+                time.sleep(max(0, self.latency + (len(response) // 4 + 1) / self.tokens_per_second - (time.monotonic() - started_at)))
+
+            elif self.latency:
+
+                time.sleep(self.latency)
+
+            generations.append([Generation(text = response)])
+
+        return LLMResult(generations = generations,
+                         llm_output = {'token_usage': {'prompt_tokens': prompt_tokens,
+                                                       'completion_tokens': completion_tokens,
+                                                       'total_tokens': prompt_tokens + completion_tokens},
+                                       'model_name': self.model})
+
+    def get_response(self, prompt: str) -> str:
+
+        if self.responses:
+
+            return get_scripted_responses(self.responses).next()
+
+        randomizer = random.Random(hashlib.sha256(f'{self.seed}:{self.temperature}:{prompt}'.encode('utf-8')).digest())
+
+        # crewAI asks the LLM to turn an action into a tool call it can validate, so the action in the prompt is answered as JSON
+
+        if 'Return a valid schema for the one tool you must use' in prompt or 'Use this text to inform a valid output schema' in prompt:
+
+            return self.get_tool_calling(prompt)
+
+        tool_names = get_tool_names(prompt)
+
+        if tool_names and prompt.count('Observation:') - prompt.count('Observation: the result') < self.tool_calls_per_task:
+
+            tool_name = randomizer.choice(tool_names)
+
+            return f'Thought: Do I need to use a tool? Yes\nAction: {tool_name}\nAction Input: {json.dumps(get_tool_arguments(prompt, tool_name, randomizer))}'
+
+        task_match = re.search(r'Current Task: (.*)', prompt)
+
+        task = task_match.group(1).strip()[:80] if task_match else 'the task'
+
+        answer = ' '.join(randomizer.choice(mock_words) for _ in range(self.final_answer_words))
+
+        return f'Thought: Do I need to use a tool? No\nFinal Answer: Mock answer to {task}: {answer}.'
+
+    def get_tool_calling(self, prompt: str) -> str:
+
+        action_match = re.search(r'Action:\s*(.*?)\s*\nAction Input:\s*(.*)', prompt)
+
+        if action_match is None:
+
+            return json.dumps({'tool_name': '', 'arguments': {}})
+
+        try:
+
+            arguments = json.loads(action_match.group(2).strip())
+
+        except json.JSONDecodeError:
+
+            arguments = {}
+
+        return json.dumps({'tool_name': action_match.group(1).strip(), 'arguments': arguments})
+
+class ScriptedResponses:
+
+    """
+    Cycles through a list of scripted responses. Clients with the same script share one position, so the script is followed across agents.
+    """
+
+    def __init__(self, responses):
+
+        self.responses = itertools.cycle(responses)
+
+        self.lock = threading.Lock()
+
+    def next(self):
+
+        with self.lock:
+
+            return next(self.responses)
+
+scripted_responses = {}
+
+scripted_responses_lock = threading.Lock()
+
+def get_scripted_responses(responses) -> ScriptedResponses:
+
+    with scripted_responses_lock:
+
+        return scripted_responses.setdefault(tuple(responses), ScriptedResponses(responses))
+
+def get_tool_names(prompt: str) -> List[str]:
+
+    tool_names_match = re.search(r'only one name of \[(.*?)\]', prompt)
+
+    if tool_names_match is None:
+
+        return []
+
+    return [tool_name.strip() for tool_name in tool_names_match.group(1).split(',') if tool_name.strip()]
+
+def get_tool_arguments(prompt: str, tool_name: str, randomizer: random.Random) -> dict:
+
+    # Tools are described as 'name: name(argument: type, ...) - description', and the first argument is given a value
+
+    argument_match = re.search(re.escape(tool_name) + r'\((\w+)', prompt)
+
+    if argument_match is None:
+
+        return {}
+
+    return {argument_match.group(1): ' '.join(randomizer.choice(mock_words) for _ in range(3))}
+
+def build_mock_llm(model: str, temperature: float, cache = None, callbacks = None) -> MockLLM:
+
+    """
+    This function builds a mock LLM configured from the Mock_LLM_Seed, Mock_LLM_Script (a JSON file with a list of responses),
+    Mock_LLM_Tool_Calls_Per_Task, Mock_LLM_Final_Answer_Words, Mock_LLM_Latency (seconds) and Mock_LLM_Tokens_Per_Second environment variables.
+    """
+
+    responses = None
+
+    if os.getenv('Mock_LLM_Script'):
+
+        with open(os.getenv('Mock_LLM_Script'), 'r') as script_file:
+
+            responses = json.load(script_file)
+
+    return MockLLM(model = model,
+                   temperature = temperature,
+                   seed = int(os.getenv('Mock_LLM_Seed', '0')),
+                   responses = responses,
+                   tool_calls_per_task = int(os.getenv('Mock_LLM_Tool_Calls_Per_Task', '1')),
+                   final_answer_words = int(os.getenv('Mock_LLM_Final_Answer_Words', '50')),
+                   latency = float(os.getenv('Mock_LLM_Latency', '0')),
+                   tokens_per_second = float(os.getenv('Mock_LLM_Tokens_Per_Second', '0')),
+                   cache = cache,
+                   callbacks = callbacks)
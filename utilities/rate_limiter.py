@@ -0,0 +1,311 @@
+import json
+from langchain_core.callbacks import BaseCallbackHandler
+import os
+import threading
+import time
+import utilities.metrics as metrics
+from utilities.run_profiler import get_run_profile
+from utilities.sqlite_store import SQLiteStore
+
+# A rough number of characters per token, used to reserve tokens before a request. The reservation is corrected with the reported usage
+
+characters_per_token = 4
+
+class InProcessState:
+
+    """
+    Bucket state shared by the threads of one process, with the same update interface as SQLiteStore.
+    """
+
+    def __init__(self):
+
+        self.values = {}
+
+        self.lock = threading.Lock()
+
+    def update(self, key: str, update_function):
+
+        with self.lock:
+
+            self.values[key], result = update_function(self.values.get(key))
+
+            return result
+
+class TokenBucketRateLimiter:
+
+    """
+    Limits the requests and tokens per minute sent to every provider and model with a pair of token buckets.
+    A caller reserves its request and tokens up front and then waits until the buckets are no longer in debt,
+    so callers are served in the order they arrive and queue instead of failing with rate limit errors.
+    The buckets live in a state object, which is shared across processes when it is an SQLiteStore.
+    """
+
+    def __init__(self, rate_limits: dict, state = None):
+
+        self.rate_limits = rate_limits
+
+        self.state = state or InProcessState()
+
+        self.stats_lock = threading.Lock()
+
+        self.stats = {}
+
+    def get_rate_limit(self, provider: str, model: str):
+
+        """
+        This function returns the (requests per minute, tokens per minute) limit of a model, falling back to the limit of its provider.
+        """
+
+        return self.rate_limits.get(f'{provider}:{model}') or self.rate_limits.get(provider)
+
+    def reserve(self, provider: str, model: str, requests: int, tokens: int) -> float:
+
+        """
+        This function takes requests and tokens from the buckets of a model, letting them go into debt.
+        Returns:
+            The number of seconds until the buckets are out of debt.
+        """
+
+        rate_limit = self.get_rate_limit(provider, model)
+
+        if rate_limit is None:
+
+            return 0
+
+        def take_from_buckets(value):
+
+            now = time.time()
+
+            buckets = json.loads(value) if value else {}
+
+            wait = 0
+
+            for bucket_name, amount, limit in (('requests', requests, rate_limit[0]), ('tokens', tokens, rate_limit[1])):
+
+                if not limit:
+
+                    continue
+
+                refill_per_second = limit / 60
+
+                level, updated_at = buckets.get(bucket_name, (limit, now))
+
+                level = min(limit, level + (now - updated_at) * refill_per_second)
+
+                # Tokens given back by adjust() are negative amounts, which fill a bucket no further than its limit, as refilling does
+
+                level = min(limit, level - amount)
+
+                buckets[bucket_name] = (level, now)
+
+                wait = max(wait, -level / refill_per_second)
+
+            return json.dumps(buckets), wait
+
+        return self.state.update(f'{provider}:{model}', take_from_buckets)
+
+    def acquire(self, provider: str, model: str, tokens: int) -> float:
+
+        """
+        This function waits until a model may be sent a request of about the given number of tokens.
+        Returns:
+            The number of seconds waited.
+        """
+
+        if self.get_rate_limit(provider, model) is None:
+
+            return 0
+
+        wait = self.reserve(provider, model, 1, tokens)
+
+        metrics.llm_rate_limit_wait_seconds.observe(max(0, wait), provider = provider)
+
+        stats = self.get_model_stats(f'{provider}:{model}')
+
+        with self.stats_lock:
+
+            stats['requests'] += 1
+
+            if wait > 0:
+
+                stats['delayed_requests'] += 1
+
+                stats['waiting'] += 1
+
+                stats['max_waiting'] = max(stats['max_waiting'], stats['waiting'])
+
+        if wait > 0:
+
+            try:
+
+                time.sleep(wait)
+
+            finally:
+
+                with self.stats_lock:
+
+                    stats['waiting'] -= 1
+
+                    stats['waited_seconds'] += wait
+
+                    stats['max_wait_seconds'] = max(stats['max_wait_seconds'], wait)
+
+        return wait
+
+    def adjust(self, provider: str, model: str, tokens: int):
+
+        """
+        This function corrects the tokens reserved for a request once its actual usage is known. Negative tokens are given back.
+        """
+
+        self.reserve(provider, model, 0, tokens)
+
+    def get_model_stats(self, key: str):
+
+        with self.stats_lock:
+
+            return self.stats.setdefault(key, {'waiting': 0,
+                                               'max_waiting': 0,
+                                               'requests': 0,
+                                               'delayed_requests': 0,
+                                               'waited_seconds': 0.0,
+                                               'max_wait_seconds': 0.0})
+
+    def get_stats(self):
+
+        """
+        This function returns the queue depth and waits of every model in this process.
+        """
+
+        with self.stats_lock:
+
+            return {key: dict(stats) for key, stats in self.stats.items()}
+
+class RateLimitCallbackHandler(BaseCallbackHandler):
+
+    """
+    Makes every request of an LLM client wait for the shared rate limiter, and reports the tokens the request actually used.
+    """
+
+    def __init__(self, provider: str, model: str):
+
+        self.provider = provider
+
+        self.model = model
+
+        self.reserved_tokens = {}
+
+        self.lock = threading.Lock()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+
+        self.wait_for_rate_limit(run_id, sum(len(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+
+        # Chat models call this before their response cache is looked up, so a request is started from on_chat_model_request instead
+
+        return
+
+    def on_chat_model_request(self, messages, *, run_id):
+
+        self.wait_for_rate_limit(run_id, sum(len(str(message.content)) for message_list in messages for message in message_list))
+
+    def wait_for_rate_limit(self, run_id, number_of_characters: int):
+
+        tokens = number_of_characters // characters_per_token + 1
+
+        with self.lock:
+
+            self.reserved_tokens[run_id] = tokens
+
+        wait_seconds = get_rate_limiter().acquire(self.provider, self.model, tokens)
+
+        run_profile = get_run_profile()
+
+        if wait_seconds and run_profile is not None:
+
+            run_profile.add_llm_wait(run_id, wait_seconds)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+
+        with self.lock:
+
+            reserved_tokens = self.reserved_tokens.pop(run_id, None)
+
+        token_usage = (response.llm_output or {}).get('token_usage') or {}
+
+        if reserved_tokens is not None and token_usage.get('total_tokens'):
+
+            get_rate_limiter().adjust(self.provider, self.model, token_usage['total_tokens'] - reserved_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+
+        with self.lock:
+
+            self.reserved_tokens.pop(run_id, None)
+
+def get_rate_limits(rate_limits_setting):
+
+    """
+    This function parses rate limits such as 'OpenAI=500/200000,OpenAI:gpt-4o=5000/800000,NVIDIA=40/none',
+    given as requests per minute/tokens per minute for a provider or a provider:model.
+    """
+
+    rate_limits = {}
+
+    for rate_limit in filter(None, [item.strip() for item in (rate_limits_setting or '').split(',')]):
+
+        name, limits = [part.strip() for part in rate_limit.split('=', 1)]
+
+        requests_per_minute, _, tokens_per_minute = limits.partition('/')
+
+        rate_limits[name] = tuple(None if limit.strip().lower() in ('', 'none', '0') else int(limit) for limit in (requests_per_minute, tokens_per_minute))
+
+    return rate_limits
+
+def get_rate_limiter_stats_since(rate_limiter_stats):
+
+    """
+    This function returns the number of requests that waited for the rate limiter, and for how long, since the given stats were taken.
+    """
+
+    current_rate_limiter_stats = get_rate_limiter().get_stats()
+
+    delayed_requests = sum(stats['delayed_requests'] for stats in current_rate_limiter_stats.values()) - sum(stats['delayed_requests'] for stats in rate_limiter_stats.values())
+
+    waited_seconds = sum(stats['waited_seconds'] for stats in current_rate_limiter_stats.values()) - sum(stats['waited_seconds'] for stats in rate_limiter_stats.values())
+
+    return {'delayed_requests': delayed_requests, 'waited_seconds': waited_seconds}
+
+rate_limiter = None
+
+rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> TokenBucketRateLimiter:
+
+    """
+    This function returns the process-wide rate limiter, configured from the LLM_Rate_Limits and LLM_Rate_Limiter_State_Path
+    environment variables when it is first used. The buckets are kept in ./cache/llm_rate_limits.sqlite by default,
+    so crews run by the scheduler's worker processes and other Streamlit servers share them. A path of 'none' keeps them in this process.
+    """
+
+    global rate_limiter
+
+    with rate_limiter_lock:
+
+        if rate_limiter is None:
+
+            rate_limits = get_rate_limits(os.getenv('LLM_Rate_Limits'))
+
+            state_path = os.getenv('LLM_Rate_Limiter_State_Path', './cache/llm_rate_limits.sqlite')
+
+            state = None
+
+            if rate_limits and state_path.lower() != 'none':
+
+                state = SQLiteStore(state_path, table_name = 'token_buckets')
+
+            rate_limiter = TokenBucketRateLimiter(rate_limits, state)
+
+        return rate_limiter
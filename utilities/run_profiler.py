@@ -0,0 +1,379 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+import functools
+import json
+from langchain_core.callbacks import BaseCallbackHandler
+import os
+import threading
+import time
+import uuid
+
+class RunProfile:
+
+    """
+    The timings of one crew run: every task, LLM call and tool call, with the agent that made it.
+    LLM calls also record the time spent waiting for the rate limiter, their tokens and their payload sizes.
+    """
+
+    def __init__(self, crew_name: str):
+
+        self.run_id = uuid.uuid4().hex[:12]
+
+        self.crew_name = crew_name
+
+        self.started_at = time.time()
+
+        self.finished_at = None
+
+        self.tasks = []
+
+        self.llm_calls = []
+
+        self.tool_calls = []
+
+        self.pending_llm_calls = {}
+
+        self.lock = threading.Lock()
+
+    def start_llm_call(self, run_id, provider: str, model: str, prompt_characters: int):
+
+        with self.lock:
+
+            self.pending_llm_calls[run_id] = {'agent': current_agent.get(),
+                                              'provider': provider,
+                                              'model': model,
+                                              'started_at': time.perf_counter(),
+                                              'wait_seconds': 0.0,
+                                              'prompt_characters': prompt_characters}
+
+    def add_llm_wait(self, run_id, wait_seconds: float):
+
+        with self.lock:
+
+            if run_id in self.pending_llm_calls:
+
+                self.pending_llm_calls[run_id]['wait_seconds'] += wait_seconds
+
+    def finish_llm_call(self, run_id, completion_characters: int, token_usage: dict, error: str = None):
+
+        with self.lock:
+
+            llm_call = self.pending_llm_calls.pop(run_id, None)
+
+            if llm_call is None:
+
+                return
+
+            llm_call['wall_seconds'] = time.perf_counter() - llm_call.pop('started_at')
+
+            llm_call['completion_characters'] = completion_characters
+
+            llm_call['prompt_tokens'] = token_usage.get('prompt_tokens')
+
+            llm_call['completion_tokens'] = token_usage.get('completion_tokens')
+
+            llm_call['error'] = error
+
+            self.llm_calls.append(llm_call)
+
+    def add_tool_call(self, tool_name: str, wall_seconds: float, input_characters: int, output_characters: int, error: str = None):
+
+        with self.lock:
+
+            self.tool_calls.append({'agent': current_agent.get(),
+                                    'tool': tool_name,
+                                    'wall_seconds': wall_seconds,
+                                    'input_characters': input_characters,
+                                    'output_characters': output_characters,
+                                    'error': error})
+
+    def add_task(self, agent: str, description: str, wall_seconds: float, error: str = None):
+
+        with self.lock:
+
+            self.tasks.append({'agent': agent,
+                               'task': description[:100],
+                               'wall_seconds': wall_seconds,
+                               'error': error})
+
+    def get_report(self):
+
+        """
+        This function returns the profile as a JSON serializable dictionary, with totals per agent, model and tool.
+        """
+
+        with self.lock:
+
+            by_agent = defaultdict(lambda: {'tasks': 0, 'task_seconds': 0.0, 'llm_calls': 0, 'llm_seconds': 0.0, 'llm_wait_seconds': 0.0,
+                                            'prompt_tokens': 0, 'completion_tokens': 0, 'tool_calls': 0, 'tool_seconds': 0.0})
+
+            by_model = defaultdict(lambda: {'llm_calls': 0, 'llm_seconds': 0.0, 'llm_wait_seconds': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                            'prompt_characters': 0, 'completion_characters': 0, 'errors': 0})
+
+            by_tool = defaultdict(lambda: {'tool_calls': 0, 'tool_seconds': 0.0, 'input_characters': 0, 'output_characters': 0, 'errors': 0})
+
+            for task in self.tasks:
+
+                agent_totals = by_agent[task['agent'] or 'Unknown']
+
+                agent_totals['tasks'] += 1
+
+                agent_totals['task_seconds'] += task['wall_seconds']
+
+            for llm_call in self.llm_calls:
+
+                for totals in (by_agent[llm_call['agent'] or 'Unknown'], by_model[f"{llm_call['provider']}:{llm_call['model']}"]):
+
+                    totals['llm_calls'] += 1
+
+                    totals['llm_seconds'] += llm_call['wall_seconds'] - llm_call['wait_seconds']
+
+                    totals['llm_wait_seconds'] += llm_call['wait_seconds']
+
+                    totals['prompt_tokens'] += llm_call['prompt_tokens'] or 0
+
+                    totals['completion_tokens'] += llm_call['completion_tokens'] or 0
+
+                model_totals = by_model[f"{llm_call['provider']}:{llm_call['model']}"]
+
+                model_totals['prompt_characters'] += llm_call['prompt_characters']
+
+                model_totals['completion_characters'] += llm_call['completion_characters']
+
+                model_totals['errors'] += llm_call['error'] is not None
+
+            for tool_call in self.tool_calls:
+
+                agent_totals = by_agent[tool_call['agent'] or 'Unknown']
+
+                agent_totals['tool_calls'] += 1
+
+                agent_totals['tool_seconds'] += tool_call['wall_seconds']
+
+                tool_totals = by_tool[tool_call['tool']]
+
+                tool_totals['tool_calls'] += 1
+
+                tool_totals['tool_seconds'] += tool_call['wall_seconds']
+
+                tool_totals['input_characters'] += tool_call['input_characters']
+
+                tool_totals['output_characters'] += tool_call['output_characters']
+
+                tool_totals['errors'] += tool_call['error'] is not None
+
+            return {'run_id': self.run_id,
+                    'crew_name': self.crew_name,
+                    'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec = 'seconds'),
+                    'wall_seconds': (self.finished_at or time.time()) - self.started_at,
+                    'by_agent': [dict(agent = agent, **totals) for agent, totals in by_agent.items()],
+                    'by_model': [dict(model = model, **totals) for model, totals in by_model.items()],
+                    'by_tool': [dict(tool = tool, **totals) for tool, totals in by_tool.items()],
+                    'tasks': list(self.tasks),
+                    'llm_calls': list(self.llm_calls),
+                    'tool_calls': list(self.tool_calls)}
+
+    def save(self, run_profiles_file_path: str):
+
+        os.makedirs(os.path.dirname(run_profiles_file_path) or '.', exist_ok = True)
+
+        # One write per run keeps the lines of runs finishing in other processes from interleaving
+
+        with open(run_profiles_file_path, 'a') as run_profiles_file:
+
+            run_profiles_file.write(json.dumps(self.get_report()) + '\n')
+
+current_run_profile = ContextVar('current_run_profile', default = None)
+
+current_agent = ContextVar('current_agent', default = None)
+
+active_run_profiles = set()
+
+active_run_profiles_lock = threading.Lock()
+
+def get_run_profile():
+
+    """
+    This function returns the profile of the run in progress in this context.
+    Threads started by crewAI do not inherit the context, so the only run in progress in the process is used for them.
+    """
+
+    run_profile = current_run_profile.get()
+
+    if run_profile is None:
+
+        with active_run_profiles_lock:
+
+            if len(active_run_profiles) == 1:
+
+                run_profile = next(iter(active_run_profiles))
+
+    return run_profile
+
+@contextmanager
+def profile_run(crew_name: str):
+
+    """
+    This function profiles the crew run in its block, and appends the profile to the file set by Run_Profiles_File
+    (./logs/run_profiles.jsonl by default) at the end of the block.
+    """
+
+    run_profile = RunProfile(crew_name)
+
+    token = current_run_profile.set(run_profile)
+
+    with active_run_profiles_lock:
+
+        active_run_profiles.add(run_profile)
+
+    try:
+
+        yield run_profile
+
+    finally:
+
+        run_profile.finished_at = time.time()
+
+        with active_run_profiles_lock:
+
+            active_run_profiles.discard(run_profile)
+
+        current_run_profile.reset(token)
+
+        run_profiles_file_path = os.getenv('Run_Profiles_File', './logs/run_profiles.jsonl')
+
+        if run_profiles_file_path.lower() != 'none':
+
+            run_profile.save(run_profiles_file_path)
+
+@contextmanager
+def profile_task(agent: str, description: str):
+
+    token = current_agent.set(agent)
+
+    started_at = time.perf_counter()
+
+    error = None
+
+    try:
+
+        yield
+
+    except Exception as exception:
+
+        error = str(exception)
+
+        raise
+
+    finally:
+
+        current_agent.reset(token)
+
+        run_profile = get_run_profile()
+
+        if run_profile is not None:
+
+            run_profile.add_task(agent, description, time.perf_counter() - started_at, error)
+
+def profile_tool_run(tool_name: str, tool_run):
+
+    """
+    This function wraps the _run method of a tool so every call is timed in the profile of the run in progress.
+    """
+
+    @functools.wraps(tool_run)
+    def profiled_tool_run(*args, **kwargs):
+
+        run_profile = get_run_profile()
+
+        if run_profile is None:
+
+            return tool_run(*args, **kwargs)
+
+        started_at = time.perf_counter()
+
+        try:
+
+            output = tool_run(*args, **kwargs)
+
+        except Exception as exception:
+
+            run_profile.add_tool_call(tool_name, time.perf_counter() - started_at, len(str(args)) + len(str(kwargs)), 0, str(exception))
+
+            raise
+
+        run_profile.add_tool_call(tool_name, time.perf_counter() - started_at, len(str(args)) + len(str(kwargs)), len(str(output)))
+
+        return output
+
+    return profiled_tool_run
+
+def get_token_usage(response):
+
+    """
+    This function returns the prompt and completion tokens of an LLM response, as reported by OpenAI style clients or by Ollama.
+    """
+
+    token_usage = (response.llm_output or {}).get('token_usage')
+
+    if token_usage:
+
+        return token_usage
+
+    generation_info = (response.generations[0][0].generation_info or {}) if response.generations and response.generations[0] else {}
+
+    return {'prompt_tokens': generation_info.get('prompt_eval_count'), 'completion_tokens': generation_info.get('eval_count')}
+
+class ProfilingCallbackHandler(BaseCallbackHandler):
+
+    """
+    Times every request of an LLM client in the profile of the run in progress.
+    """
+
+    def __init__(self, provider: str, model: str):
+
+        self.provider = provider
+
+        self.model = model
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+
+        self.start_llm_call(run_id, sum(len(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+
+        # Chat models call this before their response cache is looked up, so a request is started from on_chat_model_request instead
+
+        return
+
+    def on_chat_model_request(self, messages, *, run_id):
+
+        self.start_llm_call(run_id, sum(len(str(message.content)) for message_list in messages for message in message_list))
+
+    def start_llm_call(self, run_id, prompt_characters: int):
+
+        run_profile = get_run_profile()
+
+        if run_profile is not None:
+
+            run_profile.start_llm_call(run_id, self.provider, self.model, prompt_characters)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+
+        run_profile = get_run_profile()
+
+        if run_profile is not None:
+
+            completion_characters = sum(len(generation.text) for generation_list in response.generations for generation in generation_list)
+
+            run_profile.finish_llm_call(run_id, completion_characters, get_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+
+        run_profile = get_run_profile()
+
+        if run_profile is not None:
+
+            run_profile.finish_llm_call(run_id, 0, {}, str(error))
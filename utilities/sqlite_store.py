@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import threading
+import time
+
+class SQLiteStore:
+
+    """
+    A key-value store in an SQLite database, shared by every thread and process that opens the same file.
+    Entries expire after their time to live, and the least recently used entries are evicted once the store holds more than max_entries.
+    """
+
+    def __init__(self, database_path: str, table_name: str = 'entries', max_entries: int = 10000, ttl: float = None):
+
+        self.database_path = database_path
+
+        self.table_name = table_name
+
+        self.max_entries = max_entries
+
+        self.ttl = ttl
+
+        self.local = threading.local()
+
+        self.stats_lock = threading.Lock()
+
+        self.hits = 0
+
+        self.misses = 0
+
+        self.writes_since_eviction = 0
+
+        database_directory = os.path.dirname(database_path)
+
+        if database_directory:
+
+            os.makedirs(database_directory, exist_ok = True)
+
+        with self.get_connection() as connection:
+
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {self.table_name} (key TEXT PRIMARY KEY, value TEXT, created_at REAL, accessed_at REAL, expires_at REAL)')
+
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {self.table_name}_accessed_at ON {self.table_name} (accessed_at)')
+
+    def get_connection(self):
+
+        # SQLite connections cannot be shared between threads, so each thread opens its own
+
+        connection = getattr(self.local, 'connection', None)
+
+        if connection is None:
+
+            connection = sqlite3.connect(self.database_path, timeout = 30)
+
+            connection.execute('PRAGMA journal_mode=WAL')
+
+            self.local.connection = connection
+
+        return connection
+
+    def get(self, key: str, default = None):
+
+        now = time.time()
+
+        with self.get_connection() as connection:
+
+            row = connection.execute(f'SELECT value, expires_at FROM {self.table_name} WHERE key = ?', (key,)).fetchone()
+
+            if row is not None and row[1] is not None and row[1] <= now:
+
+                connection.execute(f'DELETE FROM {self.table_name} WHERE key = ?', (key,))
+
+                row = None
+
+            if row is not None:
+
+                connection.execute(f'UPDATE {self.table_name} SET accessed_at = ? WHERE key = ?', (now, key))
+
+        self.count_lookup(row is not None)
+
+        return default if row is None else row[0]
+
+    def set(self, key: str, value: str, ttl: float = None):
+
+        now = time.time()
+
+        ttl = self.ttl if ttl is None else ttl
+
+        expires_at = now + ttl if ttl else None
+
+        with self.get_connection() as connection:
+
+            connection.execute(f'INSERT OR REPLACE INTO {self.table_name} (key, value, created_at, accessed_at, expires_at) VALUES (?, ?, ?, ?, ?)', (key, value, now, now, expires_at))
+
+        with self.stats_lock:
+
+            self.writes_since_eviction += 1
+
+            evict = self.writes_since_eviction >= max(1, self.max_entries // 100)
+
+            if evict:
+
+                self.writes_since_eviction = 0
+
+        if evict:
+
+            self.evict()
+
+    def update(self, key: str, update_function):
+
+        """
+        This function replaces the value of a key in one transaction, so no other thread or process can change it in between.
+        Args:
+            key: The key to update.
+            update_function: A function that takes the current value, or None, and returns a tuple of the new value and a result.
+        Returns:
+            The result returned by update_function.
+        """
+
+        now = time.time()
+
+        connection = self.get_connection()
+
+        connection.execute('BEGIN IMMEDIATE')
+
+        try:
+
+            row = connection.execute(f'SELECT value FROM {self.table_name} WHERE key = ?', (key,)).fetchone()
+
+            value, result = update_function(row[0] if row is not None else None)
+
+            connection.execute(f'INSERT OR REPLACE INTO {self.table_name} (key, value, created_at, accessed_at, expires_at) VALUES (?, ?, ?, ?, ?)', (key, value, now, now, None))
+
+            connection.commit()
+
+        except Exception:
+
+            connection.rollback()
+
+            raise
+
+        return result
+
+    def delete(self, key: str):
+
+        with self.get_connection() as connection:
+
+            connection.execute(f'DELETE FROM {self.table_name} WHERE key = ?', (key,))
+
+    def evict(self):
+
+        with self.get_connection() as connection:
+
+            connection.execute(f'DELETE FROM {self.table_name} WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),))
+
+            connection.execute(f'DELETE FROM {self.table_name} WHERE key IN (SELECT key FROM {self.table_name} ORDER BY accessed_at LIMIT MAX(0, (SELECT COUNT(*) FROM {self.table_name}) - ?))', (self.max_entries,))
+
+    def clear(self):
+
+        with self.get_connection() as connection:
+
+            connection.execute(f'DELETE FROM {self.table_name}')
+
+    def count_lookup(self, hit: bool):
+
+        with self.stats_lock:
+
+            if hit:
+
+                self.hits += 1
+
+            else:
+
+                self.misses += 1
+
+    def get_stats(self):
+
+        with self.stats_lock:
+
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def get_number_of_entries(self):
+
+        return self.get_connection().execute(f'SELECT COUNT(*) FROM {self.table_name}').fetchone()[0]
@@ -0,0 +1,187 @@
+from collections import deque
+import re
+import threading
+import time
+from utilities.ansi_rendering import convert_ansi, get_open_ansi_style
+
+class VerboseOutputStream:
+
+    """
+    Coalesces verbose output writes and renders them as a single growing HTML element.
+    Writes are buffered until flush_size characters are pending or flush_interval seconds have passed,
+    complete lines are converted once, and only the last max_lines lines are kept.
+    A line still being written, such as a streamed LLM answer, is shown as well and replaced at every flush until it is complete.
+    Only its last flush_size characters are converted again at every flush, the rest is converted once like a complete line.
+    ANSI styles still open at the end of a chunk are carried over to the next one, so a color can span several flushes.
+    The HTML relies on the ANSI stylesheet being on the page.
+    """
+
+    def __init__(self, render_function = None, max_lines: int = 2000, flush_size: int = 4096, flush_interval: float = 0.5, timer_initializer = None):
+
+        self.render_function = render_function
+
+        self.max_lines = max_lines
+
+        self.flush_size = flush_size
+
+        self.flush_interval = flush_interval
+
+        self.timer_initializer = timer_initializer
+
+        self.pending = []
+
+        self.pending_size = 0
+
+        self.partial_line = ''
+
+        self.converted_partial_line = ''
+
+        self.open_ansi_style = ''
+
+        self.converted_chunks = deque()
+
+        self.number_of_lines = 0
+
+        self.last_flushed_at = time.monotonic()
+
+        self.timer = None
+
+        self.lock = threading.RLock()
+
+    def write(self, string):
+
+        with self.lock:
+
+            self.pending.append(string)
+
+            self.pending_size += len(string)
+
+            if self.pending_size >= self.flush_size or time.monotonic() - self.last_flushed_at >= self.flush_interval:
+
+                self.flush()
+
+            else:
+
+                self.start_timer()
+
+        return len(string)
+
+    def start_timer(self):
+
+        # Pending output is flushed after the interval even when no further write arrives, e.g. while the LLM is thinking
+
+        if self.timer is None and self.render_function is not None:
+
+            self.timer = threading.Timer(self.flush_interval, self.flush)
+
+            self.timer.daemon = True
+
+            if self.timer_initializer is not None:
+
+                self.timer_initializer(self.timer)
+
+            self.timer.start()
+
+    def flush(self, final: bool = False):
+
+        with self.lock:
+
+            if self.timer is not None:
+
+                self.timer.cancel()
+
+                self.timer = None
+
+            text = self.partial_line + ''.join(self.pending)
+
+            self.pending = []
+
+            self.pending_size = 0
+
+            self.last_flushed_at = time.monotonic()
+
+            if final:
+
+                self.partial_line = ''
+
+            else:
+
+                line_end = text.rfind('\n') + 1
+
+                text, self.partial_line = text[:line_end], text[line_end:]
+
+                if len(self.partial_line) > self.flush_size:
+
+                    partial_line_start = self.get_partial_line_start()
+
+                    text, self.partial_line = text + self.partial_line[:partial_line_start], self.partial_line[partial_line_start:]
+
+            open_ansi_style = get_open_ansi_style(text, self.open_ansi_style)
+
+            converted_partial_line = convert_ansi(open_ansi_style + self.partial_line) if self.partial_line else ''
+
+            if not text and converted_partial_line == self.converted_partial_line:
+
+                return
+
+            if text:
+
+                self.append_converted_chunk(convert_ansi(self.open_ansi_style + text), text.count('\n') or 1)
+
+            self.open_ansi_style = open_ansi_style
+
+            self.converted_partial_line = converted_partial_line
+
+            if self.render_function is not None:
+
+                self.render_function(self.get_html())
+
+    def get_partial_line_start(self):
+
+        # The last flush_size characters stay in the partial line, without cutting an escape code in half
+
+        partial_line_start = len(self.partial_line) - self.flush_size
+
+        escape_start = self.partial_line.rfind('\x1b', 0, partial_line_start)
+
+        if escape_start != -1:
+
+            escape = re.match(r'\x1b\[[0-9;]*[A-Za-z]', self.partial_line[escape_start:])
+
+            if escape is None or escape_start + escape.end() > partial_line_start:
+
+                return escape_start
+
+        return partial_line_start
+
+    def append_converted_chunk(self, converted_chunk, number_of_lines):
+
+        self.converted_chunks.append((converted_chunk, number_of_lines))
+
+        self.number_of_lines += number_of_lines
+
+        # Whole chunks are dropped so the HTML of the lines that are kept stays balanced
+
+        while self.number_of_lines > self.max_lines and len(self.converted_chunks) > 1:
+
+            _, dropped_number_of_lines = self.converted_chunks.popleft()
+
+            self.number_of_lines -= dropped_number_of_lines
+
+    def get_html(self):
+
+        with self.lock:
+
+            return '<pre class="ansi2html-content">' + ''.join(converted_chunk for converted_chunk, _ in self.converted_chunks) + self.converted_partial_line + '</pre>'
+
+    def close(self):
+
+        self.flush(final = True)
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+
+        self.close()